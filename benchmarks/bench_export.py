@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.mark.benchmark(group='to_dtb')
+def test_to_dtb(benchmark, fdt_obj):
+    benchmark(fdt_obj.to_dtb, 17)
+
+
+@pytest.mark.benchmark(group='to_dts')
+def test_to_dts(benchmark, fdt_obj):
+    benchmark(fdt_obj.to_dts)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Memory benchmark for FDT items
+
+Measures the heap cost of every item class and compares it with the same classes of other revision of fdt package
+checked out from git (for example the revision before items were moved to __slots__). Without revision the reference
+is synthetic object with instance dictionary, which only approximates the old layout. Usage:
+
+    python benchmarks/bench_memory.py [-n COUNT] [-r REVISION]
+"""
+
+import os
+import sys
+import tarfile
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+import importlib.util
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+
+import fdt
+
+
+########################################################################################################################
+# Reference layouts
+########################################################################################################################
+
+class _SyntheticItem:
+    """ Synthetic item with instance dictionary (not the real class of any revision) """
+
+    def __init__(self, name, **kwargs):
+        self._name = name
+        self._label = None
+        self._parent = None
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+
+class _SyntheticModule:
+    """ The factories of synthetic items with the same signatures as fdt item classes """
+
+    @staticmethod
+    def Property(name):
+        return _SyntheticItem(name)
+
+    @staticmethod
+    def PropStrings(name, *args):
+        return _SyntheticItem(name, data=list(args))
+
+    @staticmethod
+    def PropWords(name, *args):
+        return _SyntheticItem(name, data=list(args), word_size=32)
+
+    @staticmethod
+    def PropBytes(name, *args):
+        return _SyntheticItem(name, data=bytearray(args))
+
+    @staticmethod
+    def PropIncBin(name, data=None, file_name=None):
+        return _SyntheticItem(name, data=bytearray(data), file_name=file_name, relative_path=None)
+
+    @staticmethod
+    def Node(name):
+        return _SyntheticItem(name, _props=[], _nodes=[])
+
+
+def load_revision(revision: str, temp_dir: str):
+    """
+    Return fdt package of git revision imported as module "fdt_<revision>"
+
+    :param revision: The git revision, for example: commit hash or tag
+    :param temp_dir: The directory for extracted package
+    """
+    archive = subprocess.run(['git', 'archive', '--format=tar', revision, 'fdt'], cwd=ROOT_DIR,
+                             stdout=subprocess.PIPE, check=True).stdout
+    archive_path = os.path.join(temp_dir, 'fdt.tar')
+    with open(archive_path, 'wb') as f:
+        f.write(archive)
+    with tarfile.open(archive_path) as tar:
+        # the extraction filter is available since python 3.12 (and in security updates of older versions)
+        tar.extractall(temp_dir, **({'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}))
+    package_dir = os.path.join(temp_dir, 'fdt')
+    name = 'fdt_' + ''.join(c if c.isalnum() else '_' for c in revision)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(package_dir, '__init__.py'),
+                                                  submodule_search_locations=[package_dir])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+CASES = (
+    # (title, factory(module, index))
+    ('Property', lambda m, i: m.Property('prop')),
+    ('PropStrings', lambda m, i: m.PropStrings('prop', 'okay')),
+    ('PropWords', lambda m, i: m.PropWords('prop', i & 0xFFFF, 0x10)),
+    ('PropBytes', lambda m, i: m.PropBytes('prop', 0x01, 0x02)),
+    ('PropIncBin', lambda m, i: m.PropIncBin('prop', b'\x01\x02', 'file.bin')),
+    ('Node', lambda m, i: m.Node('node')),
+)
+
+
+def measure(factory, count: int) -> float:
+    """
+    Return average count of allocated bytes per one object created by factory
+
+    :param factory: The object factory
+    :param count: Count of created objects
+    """
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objects = [factory(i) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    # exclude the list holding the objects
+    used -= sys.getsizeof(objects)
+    del objects
+    return used / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory footprint of FDT items")
+    parser.add_argument('-n', dest='count', type=int, default=100000, help='Count of objects per class')
+    parser.add_argument('-r', dest='revision', type=str,
+                        help='Git revision of reference fdt package (default: synthetic instance dictionary layout)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if args.revision:
+            reference, title = load_revision(args.revision, temp_dir), args.revision[:12]
+        else:
+            reference, title = _SyntheticModule, 'synthetic'
+
+        print(" {:<12} {:>12} {:>16} {:>9}".format('Item', 'current [B]', title + ' [B]', 'saved'))
+        for name, factory in CASES:
+            new_size = measure(lambda i: factory(fdt, i), args.count)
+            old_size = measure(lambda i: factory(reference, i), args.count)
+            print(" {:<12} {:>12.1f} {:>16.1f} {:>8.1f}%".format(
+                name, new_size, old_size, 100.0 * (old_size - new_size) / old_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+import fdt
+import pytest
+
+
+@pytest.mark.benchmark(group='parse_dtb')
+def test_parse_dtb(benchmark, dtb_data):
+    benchmark(fdt.parse_dtb, dtb_data)
+
+
+@pytest.mark.benchmark(group='parse_dts')
+def test_parse_dts(benchmark, dts_text):
+    benchmark(fdt.parse_dts, dts_text)
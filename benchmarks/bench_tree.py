@@ -0,0 +1,35 @@
+import fdt
+import pytest
+
+
+@pytest.mark.benchmark(group='diff')
+def test_diff(benchmark, fdt_obj, fdt_variant):
+    benchmark(fdt.diff, fdt_obj, fdt_variant)
+
+
+@pytest.mark.benchmark(group='merge')
+def test_merge(benchmark, dtb_data, fdt_variant):
+    # merge modifies the tree, so every round works with fresh one
+    def setup():
+        return (fdt.parse_dtb(dtb_data),), {}
+
+    benchmark.pedantic(lambda fdt_obj: fdt_obj.merge(fdt_variant), setup=setup, rounds=5)
+
+
+@pytest.mark.benchmark(group='search')
+@pytest.mark.parametrize('name, itype', [
+    ('compatible', fdt.ItemType.ALL),
+    ('compatible', fdt.ItemType.PROP_STRINGS),
+    ('', fdt.ItemType.NODE),
+], ids=['name', 'name-type', 'nodes'])
+def test_search(benchmark, fdt_obj, name, itype):
+    benchmark(fdt_obj.search, name, itype)
+
+
+@pytest.mark.benchmark(group='update_phandles')
+def test_update_phandles(benchmark, dtb_data):
+    # update_phandles modifies the tree, so every round works with fresh one
+    def setup():
+        return (fdt.parse_dtb(dtb_data),), {}
+
+    benchmark.pedantic(lambda fdt_obj: fdt_obj.update_phandles(), setup=setup, rounds=5)
@@ -0,0 +1,55 @@
+import os
+import fdt
+import pytest
+from fdt.testing import generate_tree
+
+
+def pytest_addoption(parser):
+    parser.addoption('--scales', default='1,10,100', help='Comma separated scales of benchmarked trees (default: 1,10,100)')
+
+
+# The size of synthetic tree at scale 1x (approx. the size of tests/data/imx7d-sdb.dtb)
+BASE_NODES = 280
+BASE_PROPS_PER_NODE = 5
+
+
+def pytest_generate_tests(metafunc):
+    if 'tree' in metafunc.fixturenames:
+        trees = ['imx7d-sdb'] + ['{}x'.format(scale) for scale in metafunc.config.getoption('scales').split(',')]
+        metafunc.parametrize('tree', trees, scope='session')
+
+
+@pytest.fixture(scope="session")
+def data_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'data')
+
+
+@pytest.fixture(scope="session")
+def dtb_data(data_dir, tree):
+    if tree == 'imx7d-sdb':
+        with open(os.path.join(data_dir, 'imx7d-sdb.dtb'), 'rb') as f:
+            return f.read()
+    scale = int(tree.rstrip('x'))
+    return generate_tree(nodes=BASE_NODES * scale, props_per_node=BASE_PROPS_PER_NODE, depth=5, output='dtb')
+
+
+@pytest.fixture(scope="session")
+def dts_text(dtb_data):
+    return fdt.parse_dtb(dtb_data).to_dts()
+
+
+@pytest.fixture()
+def fdt_obj(dtb_data):
+    return fdt.parse_dtb(dtb_data)
+
+
+@pytest.fixture(scope="session")
+def fdt_variant(dtb_data):
+    """ The tree with few modified, added and removed items """
+    fdt_obj = fdt.parse_dtb(dtb_data)
+    for index, (path, nodes, props) in enumerate(fdt_obj.walk()):
+        if index % 10 == 0 and props:
+            props[0].set_name(props[0].name + '-variant')
+        if index % 20 == 0:
+            fdt_obj.set_property('variant-prop', index, path)
+    return fdt_obj
@@ -13,10 +13,22 @@
 # limitations under the License.
 
 import os
+import re
+import sys
+import mmap
+from array import array
+from bisect import bisect_right
+from collections import deque
 
 from .header import Header, DTB_BEGIN_NODE, DTB_END_NODE, DTB_PROP, DTB_END, DTB_NOP
-from .items import new_property, Property, PropBytes, PropWords, PropStrings, PropIncBin, Node
-from .misc import strip_comments, split_to_lines, get_version_info, extract_string
+from .items import _walk, _join_chunks, _typed_property, WORD_SIZES, WORD_TYPECODES, new_property, _new_property, StringsTable, NameIndex, Property, PropBytes, PropWords, PropStrings, PropIncBin, Node
+from .misc import strip_comments, get_version_info, extract_string, is_printable
+from .profiler import profiler
+from .include import split_includes, expand_includes
+from .check import check_dtb, DtbError
+from .index import build_index, DtbIndex
+from .batch import Batch
+from .schema import validate, validate_files, compile_schemas, load_schemas, SchemaError
 
 __author__  = "Martin Olejar"
 __contact__ = "martin.olejar@gmail.com"
@@ -37,9 +49,16 @@ __all__     = [
     # core methods
     'parse_dts',
     'parse_dtb',
+    'scan_dtbs',
+    'check_dtb',
+    'build_index',
+    'validate',
     'diff'
 ]
 
+# /incbin/("file path"[, offset, size])
+INCBIN_PATTERN = re.compile(r'/incbin/\(\s*"([^"]*)"\s*(?:,\s*(\w+)\s*,\s*(\w+)\s*)?\)')
+
 
 class ItemType:
     NODE = 0
@@ -53,6 +72,15 @@ class ItemType:
     ALL = 100
 
 
+# Property classes by item type
+PROP_CLASSES = {
+    ItemType.PROP_BASE: Property,
+    ItemType.PROP_BYTES: PropBytes,
+    ItemType.PROP_WORDS: PropWords,
+    ItemType.PROP_STRINGS: PropStrings
+}
+
+
 class FDT:
     """ Flattened Device Tree Class """
 
@@ -72,6 +100,8 @@ class FDT:
         self.last_handle = 0
         self.label_to_handle = {}
         self.handle_to_label = {}
+        # the label references parsed from DTS: (property, cell or string index, label or {/path})
+        self.references = []
 
 
     def __str__(self):
@@ -80,10 +110,107 @@ class FDT:
 
     def info(self):
         """ Return object info in human readable format """
-        msg = "FDT Content:\n"
+        lines = ["FDT Content:"]
         for path, nodes, props in self.walk():
-            msg += "{} [{}N, {}P]\n".format(path, len(nodes), len(props))
-        return msg
+            lines.append("{} [{}N, {}P]".format(path, len(nodes), len(props)))
+        return '\n'.join(lines) + '\n'
+
+    def stats(self) -> dict:
+        """
+        Return tree statistics collected in single traversal as dictionary with following keys:
+
+            nodes           - The count of nodes
+            props           - The count of properties
+            props_by_type   - The count of properties by type name: Property, PropStrings, PropWords, ...
+            max_depth       - The max depth of nodes (root node has depth 0)
+            payload_size    - The total size of property values in bytes (DTB encoding)
+            strings_size    - The size of DTB strings block in bytes
+            dtb_size        - The estimated size of DTB in bytes (without padding)
+            heap_size       - The estimated python heap footprint of nodes and properties in bytes
+        """
+        stats = {
+            'nodes': 0,
+            'props': 0,
+            'props_by_type': {},
+            'max_depth': 0,
+            'payload_size': 0,
+            'strings_size': 0,
+            'dtb_size': 0,
+            'heap_size': 0
+        }
+        props_by_type = stats['props_by_type']
+        prop_names = set()
+        seen = set()
+        struct_size = 4
+        heap_size = 0
+
+        def heap(obj):
+            # the objects held by tree (names, strings, words in list) can be shared, so are counted only once
+            if id(obj) in seen:
+                return 0
+            seen.add(id(obj))
+            return sys.getsizeof(obj)
+
+        stack = [(self.root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            stats['nodes'] += 1
+            if depth > stats['max_depth']:
+                stats['max_depth'] = depth
+            # begin tag + name + end tag
+            struct_size += 8 + ((len(node.name) + 4) & ~3 if node.name != '/' else 4)
+            heap_size += sys.getsizeof(node) + heap(node.name) + sys.getsizeof(node.props) + sys.getsizeof(node.nodes)
+            for prop in node.props:
+                stats['props'] += 1
+                type_name = type(prop).__name__
+                props_by_type[type_name] = props_by_type.get(type_name, 0) + 1
+                heap_size += sys.getsizeof(prop) + heap(prop.name)
+                if isinstance(prop, PropStrings):
+                    size = sum(len(item) + 1 for item in prop.data)
+                    heap_size += sys.getsizeof(prop.data) + sum(heap(item) for item in prop.data)
+                elif isinstance(prop, PropWords):
+                    size = len(prop.data) * prop.word_size // 8
+                    heap_size += sys.getsizeof(prop.data)
+                    # the array keeps raw words, its items are temporary objects created on access
+                    if not isinstance(prop.data, array):
+                        heap_size += sum(heap(item) for item in prop.data)
+                elif isinstance(prop, PropIncBin) and not prop.loaded:
+                    # the included file is not loaded, so it occupies no heap
+                    size = len(prop)
+                elif isinstance(prop, PropBytes):
+                    size = len(prop.data)
+                    heap_size += sys.getsizeof(prop.data)
+                else:
+                    size = 0
+                stats['payload_size'] += size
+                struct_size += 12 + ((size + 3) & ~3)
+                prop_names.add(prop.name)
+            stack += [(sub_node, depth + 1) for sub_node in node.nodes]
+
+        header_size = Header.MAX_SIZE if self.header.version is None else self.header.size
+        # the name which is suffix of other name shares its place in strings block
+        suffixes = set(name[i:] for name in prop_names for i in range(1, len(name)))
+        stats['strings_size'] = sum(len(name) + 1 for name in prop_names if name not in suffixes)
+        stats['dtb_size'] = header_size + 16 * (len(self.entries) + 1) + struct_size + stats['strings_size']
+        stats['heap_size'] = heap_size
+        return stats
+
+    def freeze(self):
+        """
+        Return immutable snapshot of this object (FrozenFDT) which can be shared by more threads without locks. The
+        snapshot has tuple backed sub-nodes and properties, cached hashes and eagerly built path and name indexes.
+        """
+        from .frozen import FrozenFDT
+        return FrozenFDT(self)
+
+    def batch(self, update_phandles: bool = False) -> Batch:
+        """
+        Return batch (transaction) of modifications, which are applied at once by commit() or at the end of "with"
+        block. If any modification fails, the tree stays unchanged.
+
+        :param update_phandles: Update phandles after commit
+        """
+        return Batch(self, update_phandles)
 
     def get_node(self, path: str, create: bool = False) -> Node:
         """ 
@@ -130,6 +257,85 @@ class FDT:
         """
         self.get_node(path, create).set_property(name, value)
 
+    @profiler.timed('apply_properties')
+    def apply_properties(self, properties: dict, types: dict = None, create: bool = True):
+        """
+        Set more properties at once: every path is resolved once and the existing properties are replaced in place.
+        The values are validated before the tree is modified.
+
+        :param properties: The dictionary: node path -> {property name: value}
+        :param types: The property classes by property name (Property, PropWords, PropStrings or PropBytes), the class
+                      of other properties is inferred from value: None, int, str, list of int or str, bytes
+        :param create: If True, not existing nodes will be created
+        """
+        types = types or {}
+        names = set()
+        # create (and validate) all properties first
+        node_props = []
+        for path, values in properties.items():
+            assert isinstance(path, str), "Node path must be a string type !"
+            props = []
+            for name, value in values.items():
+                if name not in names:
+                    assert isinstance(name, str) and is_printable(name), "Invalid property name: {}".format(name)
+                    names.add(name)
+                props.append(_typed_property(name, value, types.get(name)))
+            node_props.append((path.lstrip('/'), props))
+
+        # resolve paths and validate names of missing nodes first, the tree isn't modified on error
+        index = self.root._index
+        sub_nodes = {}
+        nodes = {'': self.root}
+        missing = []
+        for path, _ in node_props:
+            if path in nodes:
+                continue
+            node, node_path = self.root, ''
+            for name in path.split('/'):
+                parent_path = node_path
+                node_path = node_path + '/' + name if node_path else name
+                if node_path in nodes:
+                    node = nodes[node_path]
+                    continue
+                if node is not None:
+                    children = sub_nodes.get(id(node))
+                    if children is None:
+                        children = sub_nodes[id(node)] = {n.name: n for n in node.nodes}
+                    node = children.get(name)
+                if node is None:
+                    if not create:
+                        raise ValueError("Path \"{}\" doesn't exists".format(path))
+                    assert name and is_printable(name), "Invalid node name: {}".format(name)
+                    missing.append((parent_path, node_path, name))
+                nodes[node_path] = node
+
+        # create missing nodes
+        for parent_path, node_path, name in missing:
+            node = Node._new(name)
+            nodes[parent_path]._append(node)
+            nodes[node_path] = node
+            if index is not None:
+                index.add(node)
+
+        # replace or append properties
+        for path, props in node_props:
+            node = nodes[path]
+            positions = {prop.name: i for i, prop in enumerate(node.props)}
+            for prop in props:
+                pos = positions.get(prop.name)
+                prop._parent = node
+                if pos is None:
+                    positions[prop.name] = len(node.props)
+                    node.props.append(prop)
+                else:
+                    old_prop = node.props[pos]
+                    node.props[pos] = prop
+                    old_prop._parent = None
+                    if index is not None:
+                        index.remove(old_prop)
+                if index is not None:
+                    index.add(prop)
+
     def exist_node(self, path: str) -> bool:
         """ 
         Check if <path>/node exist and return True
@@ -204,54 +410,85 @@ class FDT:
         assert isinstance(name, str), "Property name must be a string type !"
 
         node = self.get_node(path)
-        nodes = []
+        with_nodes = itype in (ItemType.NODE, ItemType.ALL)
+        with_props = itype != ItemType.NODE
+        prop_class = PROP_CLASSES.get(itype)
+
+        def select(item):
+            if isinstance(item, Node):
+                return with_nodes
+            return with_props and (prop_class is None or type(item) is prop_class)
+
+        if name and recursive:
+            # the items are served from name index, filtered by path
+            items = [item for item in self.get_index().get(name) if select(item)]
+            if node is self.root:
+                return items
+            subtree_items = []
+            for item in items:
+                parent = item if isinstance(item, Node) else item.parent
+                while parent is not None and parent is not node:
+                    parent = parent.parent
+                if parent is node:
+                    subtree_items.append(item)
+            return subtree_items
+
         items = []
-        pclss = {
-            ItemType.PROP_BASE: Property,
-            ItemType.PROP_BYTES: PropBytes,
-            ItemType.PROP_WORDS: PropWords,
-            ItemType.PROP_STRINGS: PropStrings
-        }
-        while True:
-            nodes += node.nodes
-            if itype == ItemType.NODE or itype == ItemType.ALL:
-                if not name or node.name == name:
-                    items.append(node)
-            if itype != ItemType.NODE or itype == ItemType.ALL:
-                for p in node.props:
-                    if name and p.name != name:
-                        continue
-                    if itype in pclss and type(p) is not pclss[itype]:
-                        continue
-                    items.append(p)
-            if not recursive or not nodes:
-                break
+        nodes = [node]
+        while nodes:
             node = nodes.pop()
+            if not name or node.name == name:
+                if with_nodes:
+                    items.append(node)
+            if with_props:
+                items += [p for p in node.props if (not name or p.name == name) and select(p)]
+            if recursive:
+                nodes += reversed(node.nodes)
 
         return items
 
-    def walk(self, path: str = '', relative: bool = False) -> list:
+    def get_index(self) -> NameIndex:
+        """ Return the name index of items, the index is built at first call and then updated by Node methods """
+        if self.root._index is None:
+            self.root._index = NameIndex(self.root)
+        return self.root._index
+
+    def walk(self, path: str = '', relative: bool = False, order: str = 'document', prune=None, max_depth: int = None):
         """ 
-        Walk trough nodes and return relative/absolute path with list of sub-nodes and properties
+        Walk trough nodes and return relative/absolute path with list of sub-nodes and properties. The not materialized
+        copy-on-write nodes (see Node.copy) are walked over their shared read-only content.
         
         :param path: The path to root node
-        :param relative: True for relative or False for absolute return path
+        :param relative: True for path relative to the path argument (ignored if it's empty) or False for absolute
+        :param order: The order of nodes: 'document' (depth-first as in DTS) or 'bfs' (breadth-first)
+        :param prune: The callback prune(node), if returns True the sub-nodes of node are skipped
+        :param max_depth: The max depth of returned nodes relative to root node (root node has depth 0)
         """
-        all_nodes = []
+        assert order in ('document', 'bfs'), "Not supported order: {}".format(order)
 
         node = self.get_node(path)
-        while True:
-            all_nodes += node.nodes
-            current_path = "{}/{}".format(node.path, node.name)
-            current_path = current_path.replace('///', '/')
-            current_path = current_path.replace('//', '/')
-            if path and relative:
-                current_path = current_path.replace(path, '').lstrip('/')
-            yield current_path, node.nodes, node.props
-            if not all_nodes:
-                break
-            node = all_nodes.pop()
-
+        if relative and path:
+            node_path = ''
+        elif node.name == '/':
+            node_path = '/'
+        else:
+            node_path = node.path.rstrip('/') + '/' + node.name
+
+        # the paths are built incrementally from parent path
+        queue = deque([(node, node_path, 0)])
+        pop = queue.pop if order == 'document' else queue.popleft
+        while queue:
+            node, node_path, depth = pop()
+            if node._source is not None:
+                node = node._source
+            yield node_path, node.nodes, node.props
+            if (max_depth is not None and depth >= max_depth) or (prune is not None and prune(node)):
+                continue
+            prefix = node_path if node_path.endswith('/') or not node_path else node_path + '/'
+            sub_nodes = [(sub_node, prefix + sub_node.name, depth + 1) for sub_node in node.nodes]
+            queue.extend(reversed(sub_nodes) if order == 'document' else sub_nodes)
+
+    @profiler.timed('merge')
     def merge(self, fdt_obj, replace: bool = True):
         """
         Merge external FDT object into this object.
@@ -279,34 +516,115 @@ class FDT:
 
         self.root.merge(fdt_obj.get_node('/'), replace)
 
+    @profiler.timed('update_phandles')
     def update_phandles(self):
-        all_nodes = []
-        no_phandle_nodes = []
+        """
+        Assign unique phandle to every node without it and resolve all label references.
 
-        node = self.root
-        all_nodes += self.root.nodes
-        while all_nodes:
-            props = (node.get_property('phandle'), node.get_property('linux,phandle'))
+        The existing phandles are kept, the duplicated phandles raise ValueError (the tree isn't modified). The new
+        phandles are the lowest values not used in tree.
+        """
+        used = {}
+        missing = []
+        linux_only = []
+        for node, _, enter in _walk(self.root):
+            if not enter or node is self.root:
+                continue
+            phandle = linux_phandle = None
+            for prop in node.props:
+                if prop.name == 'phandle':
+                    phandle = prop
+                elif prop.name == 'linux,phandle':
+                    linux_phandle = prop
             value = None
-            for i, p in enumerate(props):
-                if isinstance(p, PropWords) and isinstance(p.value, int):
-                    value = None if i == 1 and p.value != value else p.value
+            for prop in (phandle, linux_phandle):
+                if isinstance(prop, PropWords) and len(prop.data) == 1:
+                    value = prop.data[0]
+                    break
             if value is None:
-                no_phandle_nodes.append(node)
-            # ...
-            node = all_nodes.pop()
-            all_nodes += node.nodes
-
-        for node in no_phandle_nodes:
-            if node.name != '/':
-                if node.path == '/':   
-                    phandle_value = self.add_label(node.name)
-                else:
-                    phandle_value = self.add_label(node.path+'/'+node.name)
-                node.set_property('linux,phandle', phandle_value)
-                node.set_property('phandle', phandle_value)
-
+                missing.append(node)
+                continue
+            if value in used:
+                raise ValueError("Duplicated phandle 0x{:X} in nodes: {}/{} and {}/{}".format(
+                    value, used[value].path.rstrip('/'), used[value].name, node.path.rstrip('/'), node.name))
+            used[value] = node
+            if phandle is None:
+                linux_only.append((node, value))
+
+        for node, value in linux_only:
+            node.set_property('phandle', value)
+
+        free = 1
+        for node in missing:
+            while free in used:
+                free += 1
+            used[free] = node
+            label = node.label
+            if label is None:
+                label = node.name if node.path == '/' else node.path + '/' + node.name
+            self.label_to_handle[label] = free
+            self.handle_to_label[free] = label
+            node.set_property('linux,phandle', free)
+            node.set_property('phandle', free)
+        if used:
+            self.last_handle = max(self.last_handle, max(used))
+
+        self.resolve_references()
+
+    def resolve_references(self, labels: dict = None):
+        """
+        Resolve all label references (&label and &{/path}) parsed from DTS in one pass. The cells are set to phandle
+        of referenced node (the phandle is allocated if node has none) and the strings to path of referenced node.
 
+        :param labels: The additional labels of nodes: label -> node
+        """
+        if not self.references:
+            return
+
+        nodes = {}
+        paths = {}
+        used = set()
+        names = []
+        for node, depth, enter in _walk(self.root):
+            if not enter:
+                continue
+            # the node path is built from names of parent nodes
+            del names[depth:]
+            names.append(node.name if depth else '')
+            path = '/'.join(names) or '/'
+            paths[id(node)] = path
+            nodes['{' + path + '}'] = node
+            if node.label is not None:
+                nodes[node.label] = node
+            phandle = node.get_property('phandle')
+            if isinstance(phandle, PropWords) and len(phandle.data) == 1:
+                used.add(phandle.data[0])
+        if labels:
+            nodes.update((label, node) for label, node in labels.items() if id(node) in paths)
+
+        free = 1
+        for prop, index, target in self.references:
+            node = nodes.get(target)
+            if node is None:
+                raise Exception("Reference to non-existent node or label: &{}".format(target))
+            if isinstance(prop, PropStrings):
+                prop.data[index] = paths[id(node)]
+                continue
+            phandle = node.get_property('phandle')
+            if isinstance(phandle, PropWords) and len(phandle.data) == 1:
+                value = phandle.data[0]
+            else:
+                while free in used:
+                    free += 1
+                value = free
+                used.add(value)
+                node.set_property('phandle', value)
+            prop.data[index] = value
+            self.label_to_handle[target] = value
+            self.handle_to_label[value] = target
+            self.last_handle = max(self.last_handle, value)
+
+    @profiler.timed('to_dts')
     def to_dts(self, tabsize: int = 4) -> str:
         """
         Store FDT Object into string format (DTS)
@@ -330,6 +648,7 @@ class FDT:
             result += self.root.to_dts(tabsize)
         return result
 
+    @profiler.timed('to_dtb')
     def to_dtb(self, version: int = None, last_comp_version: int = None, boot_cpuid_phys: int = None, strings: str = None, padding: int = 0) -> bytes:
         """
         Export FDT Object into Binary Blob format (DTB)
@@ -364,49 +683,203 @@ class FDT:
         if self.root is None:
             return b''
 
+        chunks = self._dtb_chunks(version, last_comp_version, boot_cpuid_phys, strings, padding)
+        return _join_chunks(chunks)
+
+    def write_dtb(self, file, version: int = None, last_comp_version: int = None, boot_cpuid_phys: int = None,
+                  strings: str = None, padding: int = 0) -> int:
+        """
+        Export FDT Object into Binary Blob format (DTB) and write it into file. Return the count of written bytes.
+
+        The content of not loaded /incbin/ properties is copied straight from included files in chunks (by
+        os.copy_file_range() or os.sendfile() if available), so the memory usage doesn't depend on their size.
+
+        :param file: The path to output file or file object opened in binary mode
+        :param version:
+        :param last_comp_version:
+        :param boot_cpuid_phys:
+        :param strings:
+        :param padding:
+        """
+        if isinstance(file, (str, bytes, os.PathLike)):
+            with open(file, 'wb') as f:
+                return self.write_dtb(f, version, last_comp_version, boot_cpuid_phys, strings, padding)
+
+        if self.root is None:
+            return 0
+
+        size = 0
+        chunks = self._dtb_chunks(version, last_comp_version, boot_cpuid_phys, strings, padding)
+        with profiler.stage('write_dtb'):
+            for chunk in chunks:
+                if isinstance(chunk, bytes):
+                    file.write(chunk)
+                    size += len(chunk)
+                else:
+                    size += _copy_incbin(chunk, file)
+        return size
+
+    def _dtb_header(self) -> Header:
+        """ Return the header which is updated by DTB export """
+        return self.header
+
+    def _dtb_chunks(self, version, last_comp_version, boot_cpuid_phys, strings, padding) -> list:
+        """
+        Export FDT Object into list of DTB chunks, the not loaded PropIncBin data are in list as PropIncBin object
+        """
         from struct import pack
 
+        header = self._dtb_header()
         if version is not None:
-            self.header.version = version
+            header.version = version
         if padding < 0:
             raise Exception("DTB padding must be >= 0 !")
         if last_comp_version is not None:
-            self.header.last_comp_version = last_comp_version
+            header.last_comp_version = last_comp_version
         if boot_cpuid_phys is not None:
-            self.header.boot_cpuid_phys = boot_cpuid_phys
-        if self.header.version is None:
+            header.boot_cpuid_phys = boot_cpuid_phys
+        if header.version is None:
             raise Exception("DTB Version must be specified !")
-        if strings is None:
-            strings = ''
 
         blob_entries = bytes()
         if self.entries:
             for entry in self.entries:
                 blob_entries += pack('>QQ', entry['address'], entry['size'])
         blob_entries += pack('>QQ', 0, 0)
-        blob_data_start = self.header.size + len(blob_entries)
-        (blob_data, blob_strings, data_pos) = self.root.to_dtb(strings, blob_data_start, self.header.version)
-        blob_data += pack('>I', DTB_END)
-        self.header.size_dt_strings = len(blob_strings)
-        self.header.size_dt_struct = len(blob_data)
-        self.header.off_mem_rsvmap = self.header.size
-        self.header.off_dt_struct = blob_data_start
-        self.header.off_dt_strings = blob_data_start + len(blob_data)
-        self.header.total_size = blob_data_start + len(blob_data) + len(blob_strings) + padding
-        blob_header = self.header.export()
-        return blob_header + blob_entries + blob_data + blob_strings.encode('ascii') + (b'\x00' * padding)
-
-
-def parse_dts(text: str, root_dir: str = '') -> FDT:
+        blob_data_start = header.size + len(blob_entries)
+        blob_strings = StringsTable('' if strings is None else strings)
+        chunks = [b'', blob_entries]
+        with profiler.stage('to_dtb.struct'):
+            data_pos = self.root._to_dtb_chunks(blob_strings, blob_data_start, header.version, chunks)
+        chunks.append(pack('>I', DTB_END))
+        data_size = data_pos + 4 - blob_data_start
+        blob_strings = str(blob_strings)
+        header.size_dt_strings = len(blob_strings)
+        header.size_dt_struct = data_size
+        header.off_mem_rsvmap = header.size
+        header.off_dt_struct = blob_data_start
+        header.off_dt_strings = blob_data_start + data_size
+        header.total_size = blob_data_start + data_size + len(blob_strings) + padding
+        chunks[0] = header.export()
+        chunks.append(blob_strings.encode('ascii') + (b'\x00' * padding))
+        profiler.count('to_dtb.bytes', header.total_size)
+        return chunks
+
+
+def _copy_incbin(prop: PropIncBin, file) -> int:
+    """
+    Copy not loaded data of PropIncBin into output file, return the count of copied bytes
+
+    :param prop: The PropIncBin object
+    :param file: The output file object
+    """
+    size = len(prop)
+    copied = 0
+    with open(prop.file_path, 'rb') as f:
+        copy = getattr(os, 'copy_file_range', None) or getattr(os, 'sendfile', None)
+        try:
+            out_fd = file.fileno() if file.seekable() else None
+        except (AttributeError, OSError):
+            out_fd = None
+        if copy is not None and out_fd is not None:
+            file.flush()
+            out_pos = file.tell()
+            try:
+                while copied < size:
+                    if copy is os.sendfile:
+                        count = os.sendfile(out_fd, f.fileno(), prop.offset + copied, size - copied)
+                    else:
+                        count = copy(f.fileno(), out_fd, size - copied, prop.offset + copied, out_pos + copied)
+                    if count == 0:
+                        break
+                    copied += count
+            except OSError:
+                # not supported by file system, continue with chunked copy
+                pass
+            file.seek(out_pos + copied)
+        f.seek(prop.offset + copied)
+        while copied < size:
+            chunk = f.read(min(size - copied, prop.COPY_CHUNK_SIZE))
+            if not chunk:
+                raise Exception("Unexpected end of file: {}".format(prop.file_path))
+            file.write(chunk)
+            copied += len(chunk)
+    return size
+
+
+def _find_ref_node(fdt_obj: FDT, labels: dict, ref: str) -> Node:
+    """
+    Return node referenced by label or {/path} in DTS
+
+    :param fdt_obj: The FDT object
+    :param labels: The dictionary of labeled nodes: label -> node
+    :param ref: The label or {/path}
+    """
+    if ref.startswith('{') and ref.endswith('}'):
+        if fdt_obj.root is not None and fdt_obj.exist_node(ref[1:-1]):
+            return fdt_obj.get_node(ref[1:-1])
+    else:
+        node = labels.get(ref)
+        # the node could be deleted
+        root = node
+        while root is not None and root.parent is not None:
+            root = root.parent
+        if root is not None and root is fdt_obj.root:
+            return node
+    raise Exception("Reference to non-existent node or label: &{}".format(ref))
+
+
+def _parse_cells(value: str, prop: PropWords, references: list) -> list:
+    """
+    Parse cells value "<1 0x2 &label>, <...>" into list of words, the label references are added into references
+    list as (prop, cell index, label) and their cells are set to 0xFFFFFFFF
+
+    :param value: The cells value
+    :param prop: The property object
+    :param references: The list of label references
+    """
+    words = []
+    for cell in value.replace('<', ' ').replace('>', ' ').replace(',', ' ').split():
+        if cell.startswith('0x'):
+            words.append(int(cell, 16))
+        elif cell.startswith('0b'):
+            words.append(int(cell, 2))
+        elif cell.startswith('0'):
+            words.append(int(cell, 8))
+        elif cell.startswith('&'):
+            references.append((prop, len(words), cell[1:]))
+            words.append(0xFFFFFFFF)
+        else:
+            words.append(int(cell))
+    return words
+
+
+@profiler.timed('parse_dts')
+def parse_dts(text: str, root_dir: str = '', include_dirs=None) -> FDT:
     """
     Parse DTS text file and create FDT Object
 
+    The /include/ files are searched in root_dir (or directory of including file) and then in include_dirs, they are
+    read and preprocessed only once per process (see fdt.include.include_cache). The repeated root node blocks and
+    &label or &{/path} blocks are merged into previously defined nodes.
+
     :param text:
     :param root_dir: 
+    :param include_dirs: The list of directories with include files
     """
     ver = get_version_info(text)
-    text = strip_comments(text)
-    dts_lines = split_to_lines(text)
+    with profiler.stage('parse_dts.strip_comments'):
+        text = strip_comments(text)
+    # validate all chars at once, the items are then created over trusted path
+    assert is_printable(text), "The value must contain just printable chars !"
+    with profiler.stage('parse_dts.split_to_lines'):
+        dts_parts = split_includes(text)
+    with profiler.stage('parse_dts.include'):
+        # the directories of source files by index of line, the /incbin/ paths are relative to them
+        line_dirs = []
+        dts_lines = expand_includes(dts_parts, root_dir, include_dirs, dirs=line_dirs)
+        line_starts = [start for start, _ in line_dirs]
+    profiler.count('parse_dts.lines', len(dts_lines))
     fdt_obj = FDT()
     if 'version' in ver:
         fdt_obj.header.version = ver['version']
@@ -425,137 +898,209 @@ def parse_dts(text: str, root_dir: str = '') -> FDT:
             if len(line) != 3 :
                 raise Exception()
             fdt_obj.entries.append({'address': int(line[1], 0), 'size': int(line[2], 0)})
-    # parse nodes
-    curnode = None
-    fdt_obj.root = None
-    for line in dts_lines:
-        if line.endswith('{'):
-            # start node
-            if ':' in line:  #indicates the present of a label
-                label, rest = line.split(':')
-                node_name = rest.split()[0]
-                new_node = Node(node_name)
-                new_node.set_label(label)
-
-                
-            else:
-                node_name = line.split()[0]
-                new_node = Node(node_name)
-            if fdt_obj.root is None:
-                fdt_obj.root = new_node
-            if curnode is not None:
-                curnode.append(new_node)
-            curnode = new_node
-        elif line.endswith('}'):
-            # end node
-            if curnode is not None:
-                if curnode.get_property('phandle') is None:
-                    if curnode.label is not None:
-                        handle = fdt_obj.add_label(curnode.label)
-                        curnode.set_property('phandle', handle)
-                curnode = curnode.parent
-        else:
-            # properties
-            if line.find('=') == -1:
-                prop_name = line
-                prop_obj = Property(prop_name)
+    with profiler.stage('parse_dts.build_tree'):
+        # parse nodes
+        curnode = None
+        fdt_obj.root = None
+        # the open nodes: (node, fresh), the items of fresh node (created in current block) are appended without
+        # checks and their names are checked once the node is complete
+        stack = []
+        labels = {}
+        # the items created or reopened in current top-level block, id -> item
+        block_items = {}
+        for line_index, line in enumerate(dts_lines):
+            if line.endswith('{'):
+                # start node
+                # the node can have more labels: "label1: label2: name {"
+                node_labels = [label.strip() for label in line.split(':')]
+                node_name = node_labels.pop().split()[0]
+                label = node_labels[0] if node_labels else None
+                if curnode is None:
+                    # top-level block: root node or reference to existing node
+                    block_items = {}
+                    if node_name.startswith('&'):
+                        new_node = _find_ref_node(fdt_obj, labels, node_name[1:])
+                        fresh = False
+                    elif fdt_obj.root is None:
+                        new_node = Node._new(node_name, label)
+                        fdt_obj.root = new_node
+                        fresh = True
+                    else:
+                        new_node = fdt_obj.root
+                        fresh = False
+                elif stack[-1][1]:
+                    new_node = Node._new(node_name, label)
+                    curnode._append(new_node)
+                    fresh = True
+                else:
+                    new_node = curnode.get_subnode(node_name)
+                    if new_node is None:
+                        new_node = Node._new(node_name, label)
+                        curnode._append(new_node)
+                        fresh = True
+                    elif id(new_node) in block_items:
+                        raise Exception("{}: \"{}\" node already exists".format(curnode, node_name))
+                    else:
+                        fresh = False
+                    block_items[id(new_node)] = new_node
+                if label is not None and new_node.label is None:
+                    new_node._label = label
+                for node_label in node_labels:
+                    labels[node_label] = new_node
+                stack.append((new_node, fresh))
+                curnode = new_node
+            elif line.endswith('}') and '=' not in line:
+                # end node
+                if stack:
+                    node, fresh = stack.pop()
+                    if fresh:
+                        node._check_names()
+                    curnode = stack[-1][0] if stack else None
+            elif line.startswith('/delete-node/'):
+                name = line[len('/delete-node/'):].strip()
+                if name.startswith('&'):
+                    node = _find_ref_node(fdt_obj, labels, name[1:])
+                    if node.parent is not None:
+                        node.parent.remove_subnode(node.name)
+                elif curnode is not None:
+                    curnode.remove_subnode(name)
+            elif line.startswith('/delete-property/'):
+                if curnode is not None:
+                    curnode.remove_property(line[len('/delete-property/'):].strip())
             else:
-                line = line.split('=', maxsplit=1)
-                prop_name = line[0].rstrip(' ')
-                prop_value = line[1].lstrip(' ')
-                if prop_value.startswith('<'):
-                    prop_obj = PropWords(prop_name)
-                    prop_value = prop_value.replace('<', '').replace('>', '')
-                    # ['interrupts ' = ' <0 5 4>, <0 6 4>']
-                    # just change ',' to ' ' -- to concatenate the values into single array
-                    if ',' in prop_value:
-                        prop_value = prop_value.replace(',', ' ')
-                    
-                    # keep the orginal references for phandles as a phantom
-                    # property
-                    if "&" in prop_value:
-                        phantom_obj = PropStrings(prop_name+'_with_references')
-                        phantom_obj.append(line[1].lstrip(' '))
-                        if curnode is not None:
-                            curnode.append(phantom_obj)
-                    for prop in prop_value.split():
-                        if prop.startswith('0x'):
-                            prop_obj.append(int(prop, 16))
-                        elif prop.startswith('0b'):
-                            prop_obj.append(int(prop, 2))
-                        elif prop.startswith('0'):
-                            prop_obj.append(int(prop, 8))
-                        elif prop.startswith('&'):
-                            prop_obj.append(fdt_obj.add_label(prop[1:]))
-                        else:
-                            prop_obj.append(int(prop))
-                elif prop_value.startswith('['):
-                    prop_obj = PropBytes(prop_name)
-                    prop_value = prop_value.replace('[', '').replace(']', '')
-                    for prop in prop_value.split():
-                        prop_obj.append(int(prop, 16))
-                elif prop_value.startswith('/incbin/'):
-                    prop_value = prop_value.replace('/incbin/("', '').replace('")', '')
-                    prop_value = prop_value.split(',')
-                    file_path  = os.path.join(root_dir, prop_value[0].strip())
-                    file_offset = int(prop_value.strip(), 0) if len(prop_value) > 1 else 0
-                    file_size = int(prop_value.strip(), 0) if len(prop_value) > 2 else 0
-                    if file_path is None or not os.path.exists(file_path):
-                        raise Exception("File path doesn't exist: {}".format(file_path))
-                    with open(file_path, "rb") as f:
-                        f.seek(file_offset)
-                        prop_data = f.read(file_size) if file_size > 0 else f.read()
-                    prop_obj = PropIncBin(prop_name, prop_data, os.path.split(file_path)[1])
-                elif prop_value.startswith('/plugin/'):
-                    raise NotImplementedError("Not implemented property value: /plugin/")
-                elif prop_value.startswith('/bits/'):
-                    raise NotImplementedError("Not implemented property value: /bits/")
+                # properties
+                if line.find('=') == -1:
+                    prop_name = line
+                    prop_obj = Property._new(prop_name)
                 else:
-                    prop_obj = PropStrings(prop_name)
-                    expect_open = True
-                    in_prop = False
-                    prop = ''
-                    for c in prop_value:
-                        if c == '"' and not in_prop and expect_open:
-                            prop = ''
-                            in_prop = True
-                        elif c == '"' and in_prop:
-                            if not len(prop) > 0:
-                                raise ValueError('Empty string')
-                            prop_obj.append(prop)
-                            in_prop = False
-                            expect_open = False
-                        elif in_prop:
-                            prop += c
-                        elif c == ',' and not expect_open:
-                            expect_open = True
-                        elif c == ' ':
-                            continue
+                    line = line.split('=', maxsplit=1)
+                    prop_name = line[0].rstrip(' ')
+                    prop_value = line[1].lstrip(' ')
+                    if prop_value.startswith('<'):
+                        prop_obj = PropWords._new(prop_name)
+                        words = _parse_cells(prop_value, prop_obj, fdt_obj.references)
+                        assert not words or (min(words) >= 0 and max(words) <= 0xFFFFFFFF), \
+                            "Invalid word value in property \"{}\", use <0x0 - 0xFFFFFFFF>".format(prop_name)
+                        prop_obj.data = words
+                    elif prop_value.startswith('['):
+                        prop_value = prop_value.replace('[', '').replace(']', '')
+                        prop_obj = PropBytes._new(prop_name, bytearray(int(prop, 16) for prop in prop_value.split()))
+                    elif prop_value.startswith('/incbin/'):
+                        match = INCBIN_PATTERN.match(prop_value)
+                        if match is None:
+                            raise Exception("Invalid /incbin/ value: {}".format(prop_value))
+                        source_dir = line_dirs[bisect_right(line_starts, line_index) - 1][1]
+                        file_path = os.path.join(source_dir, match.group(1))
+                        file_offset = int(match.group(2), 0) if match.group(2) else 0
+                        file_size = int(match.group(3), 0) if match.group(3) else None
+                        if not os.path.exists(file_path):
+                            raise Exception("File path doesn't exist: {}".format(file_path))
+                        # the file content is loaded at first access of property data
+                        prop_obj = PropIncBin(prop_name, None, os.path.split(file_path)[1], file_path=file_path,
+                                              offset=file_offset, size=file_size)
+                    elif prop_value.startswith('/plugin/'):
+                        raise NotImplementedError("Not implemented property value: /plugin/")
+                    elif prop_value.startswith('/bits/'):
+                        word_size, prop_value = prop_value[len('/bits/'):].split(maxsplit=1)
+                        word_size = int(word_size, 0)
+                        if word_size not in WORD_SIZES or not prop_value.startswith('<'):
+                            raise Exception("Invalid /bits/ value in property \"{}\"".format(prop_name))
+                        prop_obj = PropWords._new(prop_name, word_size=word_size)
+                        references = []
+                        words = _parse_cells(prop_value, prop_obj, references)
+                        # the phandle is 32-bit, the references are allowed only in 32-bit cells
+                        if references and word_size != 32:
+                            raise Exception("Reference in {}-bit property \"{}\"".format(word_size, prop_name))
+                        fdt_obj.references += references
+                        assert not words or (min(words) >= 0 and max(words) < 2**word_size), \
+                            "Invalid word value in property \"{}\", use <0x0 - 0x{:X}>".format(
+                                prop_name, 2**word_size - 1)
+                        if word_size == 32:
+                            prop_obj.data = words
                         else:
-                            raise ValueError(f'Invalid char: {c}')
-
-                    if expect_open:
-                        raise ValueError('Expected string after ,')
-            if curnode is not None:
-                curnode.append(prop_obj)
-
+                            prop_obj.data = array(WORD_TYPECODES[word_size], words)
+                    else:
+                        prop_obj = PropStrings._new(prop_name)
+                        expect_open = True
+                        in_prop = False
+                        prop = ''
+                        ref = None
+                        for c in prop_value + ' ':
+                            if ref is not None and not in_prop:
+                                if c in ', ':
+                                    # &label or &{/path} is replaced by path of referenced node
+                                    fdt_obj.references.append((prop_obj, len(prop_obj.data), ref))
+                                    prop_obj.data.append('')
+                                    ref = None
+                                    expect_open = c == ','
+                                else:
+                                    ref += c
+                            elif c == '&' and not in_prop and expect_open:
+                                ref = ''
+                                expect_open = False
+                            elif c == '"' and not in_prop and expect_open:
+                                prop = ''
+                                in_prop = True
+                            elif c == '"' and in_prop:
+                                if not len(prop) > 0:
+                                    raise ValueError('Empty string')
+                                prop_obj.data.append(prop)
+                                in_prop = False
+                                expect_open = False
+                            elif in_prop:
+                                prop += c
+                            elif c == ',' and not expect_open:
+                                expect_open = True
+                            elif c == ' ':
+                                continue
+                            else:
+                                raise ValueError(f'Invalid char: {c}')
+
+                        if expect_open:
+                            raise ValueError('Expected string after ,')
+                if curnode is None:
+                    continue
+                if stack[-1][1]:
+                    curnode._append(prop_obj)
+                    continue
+                # the property of reopened node replaces the property defined in previous block
+                old_prop = curnode.get_property(prop_name)
+                if old_prop is None:
+                    curnode._append(prop_obj)
+                elif id(old_prop) in block_items:
+                    raise Exception("{}: \"{}\" property already exists".format(curnode, prop_name))
+                else:
+                    index = next(i for i, prop in enumerate(curnode.props) if prop is old_prop)
+                    curnode.props[index] = prop_obj
+                    prop_obj._parent = curnode
+                    old_prop._parent = None
+                block_items[id(prop_obj)] = prop_obj
+
+    with profiler.stage('parse_dts.resolve_references'):
+        fdt_obj.resolve_references(labels)
     return fdt_obj
 
 
+@profiler.timed('parse_dtb')
 def parse_dtb(data: bytes, offset: int = 0) -> FDT:
     """
     Parse FDT Binary Blob and create FDT Object
     
-    :param data: FDT Binary Blob in bytes
-    :param offset: The offset of input data
+    :param data: FDT Binary Blob in bytes, bytearray, mmap or memoryview
+    :param offset: The offset of FDT in input data
     """
-    assert isinstance(data, (bytes, bytearray)), "Invalid argument type"
+    assert isinstance(data, (bytes, bytearray, mmap.mmap, memoryview)), "Invalid argument type"
 
     from struct import unpack_from
 
     fdt_obj = FDT()
     # parse header
-    fdt_obj.header = Header.parse(data)
+    fdt_obj.header = Header.parse(data, offset)
+    profiler.count('parse_dtb.bytes', fdt_obj.header.total_size)
+    if not isinstance(data, (bytes, bytearray)):
+        # copy just the FDT from memory mapped or large image, the property values are copied anyway
+        data = bytes(data[offset:offset + fdt_obj.header.total_size])
+        offset = 0
     # parse entries
     index = fdt_obj.header.off_mem_rsvmap
     while True:
@@ -564,9 +1109,10 @@ def parse_dtb(data: bytes, offset: int = 0) -> FDT:
         if entrie['address'] == 0 and entrie['size'] == 0:
             break
         fdt_obj.entries.append(entrie)
-    # parse nodes
+    # parse nodes, the items are created over trusted path and the names are validated once per blob
     current_node = None
     fdt_obj.root = None
+    prop_names = {}
     index = fdt_obj.header.off_dt_struct
     while True:
         if len(data) < (offset + index + 4):
@@ -577,26 +1123,32 @@ def parse_dtb(data: bytes, offset: int = 0) -> FDT:
             node_name = extract_string(data, offset + index)
             index = ((index + len(node_name) + 4) & ~3)
             if not node_name: node_name = '/'
-            new_node = Node(node_name)
+            assert is_printable(node_name), "The value must contain just printable chars !"
+            new_node = Node._new(node_name)
             if fdt_obj.root is None:
                 fdt_obj.root = new_node
             if current_node is not None:
-                current_node.append(new_node)
+                current_node._append(new_node)
             current_node = new_node
         elif tag == DTB_END_NODE:
             if current_node is not None:
+                current_node._check_names()
                 current_node = current_node.parent
         elif tag == DTB_PROP:
             prop_size, prop_string_pos, = unpack_from(">II", data, offset + index)
             prop_start = index + 8
             if fdt_obj.header.version < 16 and prop_size >= 8:
                 prop_start = ((prop_start + 7) & ~0x7)
-            prop_name = extract_string(data, fdt_obj.header.off_dt_strings + prop_string_pos)
+            prop_name = prop_names.get(prop_string_pos)
+            if prop_name is None:
+                prop_name = extract_string(data, offset + fdt_obj.header.off_dt_strings + prop_string_pos)
+                assert is_printable(prop_name), "The value must contain just printable chars !"
+                prop_names[prop_string_pos] = prop_name
             prop_raw_value = data[offset + prop_start : offset + prop_start + prop_size]
             index = prop_start + prop_size
             index = ((index + 3) & ~0x3)
             if current_node is not None:
-                current_node.append(new_property(prop_name, prop_raw_value))
+                current_node._append(_new_property(prop_name, prop_raw_value))
         elif tag == DTB_END:
             break
         else:
@@ -605,6 +1157,68 @@ def parse_dtb(data: bytes, offset: int = 0) -> FDT:
     return fdt_obj
 
 
+def _probe_dtb(data, offset: int):
+    """ Return FDT header at offset if it looks valid or None, just the header fields and the first tag are checked """
+    from struct import unpack_from
+
+    if offset + Header.MIN_SIZE > len(data):
+        return None
+    (_, total_size, off_struct, off_strings, off_rsvmap, version, last_comp_version) = unpack_from('>7I', data, offset)
+    if not 1 <= version <= Header.MAX_VERSION or last_comp_version > min(version, Header.MAX_VERSION - 1):
+        return None
+    header_size = Header.MIN_SIZE + 4 * ((version >= 2) + (version >= 3) + (version >= 17))
+    if offset + total_size > len(data) or total_size < header_size or off_rsvmap % 8 or off_struct % 4:
+        return None
+    if max(off_struct + 4, off_strings, off_rsvmap + 16) > total_size or min(off_struct, off_rsvmap) < header_size:
+        return None
+    if unpack_from('>I', data, offset + off_struct)[0] not in (DTB_BEGIN_NODE, DTB_NOP):
+        return None
+    return Header.parse(data, offset)
+
+
+def _find_magic(data, magic: bytes, start: int, chunk_size: int = 1024 * 1024) -> int:
+    """ Return the offset of magic in data from start position or -1 """
+    if not isinstance(data, memoryview):
+        return data.find(magic, start)
+    # memoryview has not find(), search in overlapping chunks
+    for pos in range(start, len(data), chunk_size):
+        index = bytes(data[pos:pos + chunk_size + len(magic) - 1]).find(magic)
+        if index >= 0:
+            return pos + index
+    return -1
+
+
+def scan_dtbs(source, start: int = 0, check: bool = False):
+    """
+    Scan firmware image for embedded FDT Binary Blobs and yield tuples: (offset, Header). The input file is memory
+    mapped and searched for magic number, every candidate is validated by its header (or by check_dtb if check is True).
+    The blobs nested in other blob (like FDTs in FIT image) are yielded too.
+
+    :param source: The path to image file or the image as bytes, bytearray, mmap or memoryview
+    :param start: The offset to start scan from
+    :param check: Validate whole candidate by check_dtb
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield from scan_dtbs(data, start, check)
+        finally:
+            data.close()
+        return
+
+    magic = Header.MAGIC_NUMBER.to_bytes(4, 'big')
+    offset = _find_magic(source, magic, start)
+    while offset >= 0:
+        header = _probe_dtb(source, offset)
+        if header is not None and not (check and check_dtb(source, offset, max_errors=1)):
+            yield offset, header
+        offset = _find_magic(source, magic, offset + 4)
+
+
+@profiler.timed('diff')
 def diff(fdt1: FDT, fdt2: FDT) -> tuple:
     """ 
     Compare two flattened device tree objects and return list of 3 objects (same in 1 and 2, specific for 1, specific for 2)
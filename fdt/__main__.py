@@ -18,17 +18,19 @@ import os
 import sys
 import fdt
 import argparse
+from fdt.profiler import profiler
 
 
 ########################################################################################################################
 # Helper Functions
 ########################################################################################################################
-def parse_fdt(file_path: str, file_type: str):
+def parse_fdt(file_path: str, file_type: str, include_dirs=None):
     """
     Parse *.dtb ot *.dts input file and return FDT object
 
     :param file_path: The path to input file
     :param file_type: File type 'dtb', 'dts' or 'auto'
+    :param include_dirs: The list of directories with files included by *.dts
     """
 
     if not os.path.exists(file_path):
@@ -47,7 +49,7 @@ def parse_fdt(file_path: str, file_type: str):
             obj = fdt.parse_dtb(f.read())
     else:
         with open(file_path, 'r') as f:
-            obj = fdt.parse_dts(f.read(), os.path.dirname(file_path))
+            obj = fdt.parse_dts(f.read(), os.path.dirname(file_path), include_dirs)
 
     return obj
 
@@ -55,7 +57,8 @@ def parse_fdt(file_path: str, file_type: str):
 ########################################################################################################################
 # Commands Functions
 ########################################################################################################################
-def pack(in_file: str, out_file: str, version: int, lc_version: int, cpu_id: int, update_phandles: bool):
+def pack(in_file: str, out_file: str, version: int, lc_version: int, cpu_id: int, update_phandles: bool,
+         include_dirs=None):
     """
     The implementation of pack command.
 
@@ -65,12 +68,13 @@ def pack(in_file: str, out_file: str, version: int, lc_version: int, cpu_id: int
     :param lc_version: DTB Last Compatible Version
     :param cpu_id: Boot CPU ID
     :param update_phandles: If True phandles will be updated
+    :param include_dirs: The list of directories with included files
     """
 
     if version is not None and version > fdt.Header.MAX_VERSION:
         raise Exception("DTB Version must be lover or equal {} !".format(fdt.Header.MAX_VERSION))
 
-    fdt_obj = parse_fdt(in_file, 'dts')
+    fdt_obj = parse_fdt(in_file, 'dts', include_dirs)
     if update_phandles:
         fdt_obj.update_phandles()
     raw_data = fdt_obj.to_dtb(version, lc_version, cpu_id)
@@ -158,6 +162,75 @@ def diff(in_file1: str, in_file2: str, file_type: str, out_dir: str):
     print(" Diff output saved into: {}".format(out_dir))
 
 
+def stats(in_file: str, file_type: str):
+    """
+    The implementation of stats command.
+
+    :param in_file: Input File Path
+    :param file_type: The type of input file
+    """
+    fdt_obj = parse_fdt(in_file, file_type)
+    info = fdt_obj.stats()
+
+    print(" Nodes:             {}".format(info['nodes']))
+    print(" Properties:        {}".format(info['props']))
+    for type_name, count in sorted(info['props_by_type'].items()):
+        print("   {:<16} {}".format(type_name + ':', count))
+    print(" Max Depth:         {}".format(info['max_depth']))
+    print(" Payload Size:      {} B".format(info['payload_size']))
+    print(" Strings Size:      {} B".format(info['strings_size']))
+    print(" DTB Size (est.):   {} B".format(info['dtb_size']))
+    print(" Heap Size (est.):  {} B".format(info['heap_size']))
+
+
+def check(in_files: list):
+    """
+    The implementation of check command. Return True if all files are valid DTB.
+
+    :param in_files: Input Files Path
+    """
+    valid = True
+    for in_file in in_files:
+        if not os.path.exists(in_file):
+            raise Exception('File doesnt exist: {}'.format(in_file))
+        with open(in_file, 'rb') as f:
+            errors = fdt.check_dtb(f.read())
+        if not errors:
+            print(" OK: {}".format(in_file))
+            continue
+        valid = False
+        print(" FAILED: {}".format(in_file))
+        for error in errors:
+            print("   0x{:08X} [{}] {}".format(error.offset, error.code, error.message))
+    return valid
+
+
+def validate(schema_paths: list, in_files: list, jobs: int):
+    """
+    The implementation of validate command. Return True if all files match the schemas.
+
+    :param schema_paths: The paths to schema files or directories
+    :param in_files: Input Files Path
+    :param jobs: The count of worker processes
+    """
+    schemas = []
+    for schema_path in schema_paths:
+        if not os.path.exists(schema_path):
+            raise Exception('File doesnt exist: {}'.format(schema_path))
+        schemas += fdt.load_schemas(schema_path)
+
+    valid = True
+    for in_file, errors in fdt.validate_files(in_files, schemas, jobs):
+        if not errors:
+            print(" OK: {}".format(in_file))
+            continue
+        valid = False
+        print(" FAILED: {}".format(in_file))
+        for error in errors:
+            print("   {} [{}] {}".format(error.path, error.schema, error.message))
+    return valid
+
+
 ########################################################################################################################
 # Main
 ########################################################################################################################
@@ -167,6 +240,9 @@ def main():
         prog="pydtc",
         description="Flat Device Tree (FDT) tool for manipulation with *.dtb and *.dts files")
     parser.add_argument('-v', '--version', action='version', version=fdt.__version__)
+    parser.add_argument('--profile', action='store_true', help='Print time spent in processing stages')
+    parser.add_argument('--profile-out', dest='profile_out', type=str,
+                        help='Save cProfile statistics into file (implies --profile)')
     subparsers = parser.add_subparsers(dest='command')
 
     # pack command
@@ -176,6 +252,7 @@ def main():
     pack_parser.add_argument('-l', dest='lc_version', type=int, help='DTB Last Compatible Version')
     pack_parser.add_argument('-c', dest='cpu_id', type=int, help='Boot CPU ID')
     pack_parser.add_argument('-p', dest='phandles', action='store_true', help='Update phandles')
+    pack_parser.add_argument('-i', dest='include_dirs', action='append', help='Include directory (can be repeated)')
     pack_parser.add_argument('-o', dest='dtb_file', type=str, help='Output path with file name (*.dtb)')
 
     # unpack command
@@ -198,8 +275,35 @@ def main():
     diff_parser.add_argument('-t', dest='type', type=str, choices=['auto', 'dts', 'dtb'], help='Input file type')
     diff_parser.add_argument('-o', dest='out_dir', type=str, help='Output directory')
 
+    # stats command
+    stats_parser = subparsers.add_parser('stats', help='Print statistics of *.dtb or *.dts file')
+    stats_parser.add_argument('in_file', nargs=1, help='Path to dts or dtb file')
+    stats_parser.add_argument('-t', dest='type', type=str, default='auto', choices=['auto', 'dts', 'dtb'],
+                              help='Input file type')
+
+    # check command
+    check_parser = subparsers.add_parser('check', help='Validate *.dtb files without parsing them')
+    check_parser.add_argument('in_files', nargs='+', help='Path to dtb files')
+
+    # validate command
+    validate_parser = subparsers.add_parser('validate', help='Validate *.dtb or *.dts files against binding schemas')
+    validate_parser.add_argument('in_files', nargs='+', help='Path to dtb or dts files')
+    validate_parser.add_argument('-s', dest='schemas', action='append', required=True,
+                                 help='Schema file (*.yaml or *.json) or directory (can be repeated)')
+    validate_parser.add_argument('-j', dest='jobs', type=int, default=1,
+                                 help='Count of parallel processes, 0 for count of CPUs')
+
     args = parser.parse_args()
 
+    cprofile = None
+    if args.profile or args.profile_out:
+        profiler.enable()
+        if args.profile_out:
+            import cProfile
+            cprofile = cProfile.Profile()
+            cprofile.enable()
+
+    exit_code = 0
     try:
         if args.command == 'pack':
             in_file = args.dts_file[0]
@@ -207,7 +311,7 @@ def main():
                 out_file = os.path.splitext(os.path.basename(in_file))[0] + ".dtb"
             else:
                 out_file = args.dtb_file.lstrip()
-            pack(in_file, out_file, args.version, args.lc_version, args.cpu_id, args.phandles)
+            pack(in_file, out_file, args.version, args.lc_version, args.cpu_id, args.phandles, args.include_dirs)
 
         elif args.command == 'unpack':
             in_file = args.dtb_file[0]
@@ -224,6 +328,17 @@ def main():
             out_dir = args.out_dir if args.out_dir else os.path.join(os.getcwd(), 'diff_out')
             diff(args.in_file1[0], args.in_file2[0], args.type, out_dir.lstrip())
 
+        elif args.command == 'stats':
+            stats(args.in_file[0], args.type)
+
+        elif args.command == 'check':
+            if not check(args.in_files):
+                exit_code = 2
+
+        elif args.command == 'validate':
+            if not validate(args.schemas, args.in_files, args.jobs):
+                exit_code = 2
+
         else:
             parser.print_help()
 
@@ -232,6 +347,17 @@ def main():
         print(str(e) if str(e) else "Unknown Error", file=sys.stderr)
         sys.exit(1)
 
+    if profiler.enabled:
+        if cprofile is not None:
+            cprofile.disable()
+            cprofile.dump_stats(args.profile_out)
+            print(" cProfile statistics saved as: {}".format(args.profile_out))
+        print()
+        print(profiler.report())
+
+    if exit_code:
+        sys.exit(exit_code)
+
 
 if __name__ == '__main__':
     main()
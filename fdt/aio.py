@@ -0,0 +1,139 @@
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Asyncio API for loading and saving device trees.
+
+The file I/O runs in the default executor of the event loop and the parsing/serialization in configurable executor
+(default executor of the event loop if not specified), so the event loop is never blocked. Usage:
+
+    import fdt.aio
+
+    fdt_obj = await fdt.aio.load_dtb('board.dtb')
+    await fdt.aio.save_dtb(fdt_obj, 'board_new.dtb', version=17)
+    fdt_objs = await fdt.aio.load_many(['board1.dtb', 'board2.dts'], concurrency=4)
+"""
+
+import os
+import asyncio
+from functools import partial
+
+from . import FDT, parse_dtb, parse_dts
+
+_executor = None
+
+
+########################################################################################################################
+# Helper Functions
+########################################################################################################################
+
+def set_executor(executor):
+    """
+    Set default executor used for parsing and serialization.
+
+    :param executor: The instance of concurrent.futures.Executor or None for default executor of event loop
+    """
+    global _executor
+    _executor = executor
+
+
+def get_executor():
+    """ Get default executor used for parsing and serialization """
+    return _executor
+
+
+def _read_file(path: str, binary: bool):
+    with open(path, 'rb' if binary else 'r') as f:
+        return f.read()
+
+
+def _write_file(path: str, data: bytes):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _to_dtb(fdt_obj: FDT, kwargs: dict):
+    return fdt_obj.to_dtb(**kwargs)
+
+
+async def _run(executor, func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args))
+
+
+########################################################################################################################
+# Public API
+########################################################################################################################
+
+async def load_dtb(path: str, executor=None) -> FDT:
+    """
+    Load and parse *.dtb file
+
+    :param path: The path to *.dtb file
+    :param executor: The executor used for parsing, if None the executor set by set_executor() is used
+    """
+    data = await _run(None, _read_file, path, True)
+    return await _run(executor or _executor, parse_dtb, data)
+
+
+async def load_dts(path: str, executor=None, include_dirs=None) -> FDT:
+    """
+    Load and parse *.dts file, the /incbin/ and /include/ files are searched relative to the file directory
+
+    :param path: The path to *.dts file
+    :param executor: The executor used for parsing, if None the executor set by set_executor() is used
+    :param include_dirs: The list of directories with included files
+    """
+    text = await _run(None, _read_file, path, False)
+    return await _run(executor or _executor, parse_dts, text, os.path.dirname(path), include_dirs)
+
+
+async def save_dtb(fdt_obj: FDT, path: str, executor=None, **kwargs):
+    """
+    Serialize FDT object and save it as *.dtb file
+
+    :param fdt_obj: The FDT object
+    :param path: The path to output *.dtb file
+    :param executor: The executor used for serialization, if None the executor set by set_executor() is used
+    :param kwargs: The arguments of FDT.to_dtb() method: version, last_comp_version, boot_cpuid_phys, ...
+    """
+    assert isinstance(fdt_obj, FDT), "Invalid argument type"
+    data = await _run(executor or _executor, _to_dtb, fdt_obj, kwargs)
+    await _run(None, _write_file, path, data)
+
+
+async def load_many(paths, concurrency: int = 4, executor=None, include_dirs=None) -> list:
+    """
+    Load and parse more *.dtb or *.dts files concurrently, the file type is selected by its extension.
+    Return list of FDT objects in the same order as paths.
+
+    :param paths: The list of paths to *.dtb or *.dts files
+    :param concurrency: The max count of files processed at once
+    :param executor: The executor used for parsing, if None the executor set by set_executor() is used
+    :param include_dirs: The list of directories with files included by *.dts files
+    """
+    assert concurrency > 0, "The concurrency must be > 0"
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(path):
+        if path.endswith('.dtb'):
+            loader = partial(load_dtb, path, executor)
+        elif path.endswith('.dts'):
+            loader = partial(load_dts, path, executor, include_dirs)
+        else:
+            raise ValueError('Not supported file extension: {}'.format(path))
+        async with semaphore:
+            return await loader()
+
+    return list(await asyncio.gather(*[load(path) for path in paths]))
@@ -0,0 +1,204 @@
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .items import _value_property, NameIndex, Property, Node
+from .profiler import profiler
+
+
+def _split_path(path: str) -> tuple:
+    """ Return the node path as tuple of names, the root node path is empty tuple """
+    assert isinstance(path, str), "Node path must be a string type !"
+    path = path.lstrip('/')
+    return tuple(path.split('/')) if path else ()
+
+
+########################################################################################################################
+# Batch Class
+########################################################################################################################
+
+class Batch:
+    """
+    Batch of FDT modifications created by FDT.batch(). The operations are queued and coalesced per node (the last
+    operation with the same item wins) and applied at commit in one pass, where every node path is resolved once.
+    The name index (and phandles if requested) is rebuilt once after all operations. If any operation fails, the
+    already applied operations are rolled back and the tree stays unchanged. Usage:
+
+        with fdt_obj.batch() as tx:
+            tx.set_property('status', 'okay', path='/soc/uart@30860000')
+            tx.remove_node('uart@30890000', path='/soc')
+
+    The batch is committed at the end of "with" block, or discarded if the block raises an exception.
+    """
+
+    def __init__(self, fdt_obj, update_phandles: bool = False):
+        """
+        Batch constructor, use FDT.batch() instead
+
+        :param fdt_obj: The FDT object
+        :param update_phandles: Update phandles after commit
+        """
+        self._fdt = fdt_obj
+        self._update_phandles = update_phandles
+        # node path -> {(item type, item name): (operation, item)}
+        self._ops = {}
+        # the paths of nodes which can be created
+        self._create = set()
+
+    def __len__(self):
+        """ Get the count of queued operations """
+        return sum(len(ops) for ops in self._ops.values())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+        return False
+
+    def _queue(self, path: str, create: bool, key: tuple, operation: str, item):
+        path = _split_path(path)
+        if create:
+            self._create.update(path[:i] for i in range(1, len(path) + 1))
+        ops = self._ops.setdefault(path, {})
+        previous = ops.get(key)
+        if previous is not None and previous[0] == 'remove' and operation == 'add':
+            # the item removed and added again is replaced
+            operation = 'set'
+        ops[key] = (operation, item)
+        if key[0] is Node and operation == 'remove':
+            # the queued operations inside removed node are discarded
+            sub_path = path + (key[1],)
+            for ops_path in [p for p in self._ops if p[:len(sub_path)] == sub_path]:
+                del self._ops[ops_path]
+            self._create = set(p for p in self._create if p[:len(sub_path)] != sub_path)
+
+    def set_property(self, name: str, value, path: str = '', create: bool = True):
+        """
+        Queue set of property value
+
+        :param name: Property name
+        :param value: Property value
+        :param path: Path to subnode
+        :param create: If True, not existing nodes will be created
+        """
+        self._queue(path, create, (Property, name), 'set', _value_property(name, value))
+
+    def add_item(self, obj, path: str = '', create: bool = True):
+        """
+        Queue add of sub-node or property
+
+        :param obj: The node or property object
+        :param path: The path to subnode
+        :param create: If True, not existing nodes will be created
+        """
+        assert isinstance(obj, (Node, Property)), "Invalid object type, use \"Node\" or \"Property\""
+        self._queue(path, create, (Node if isinstance(obj, Node) else Property, obj.name), 'add', obj)
+
+    def remove_node(self, name: str, path: str = ''):
+        """
+        Queue remove of node
+
+        :param name: Node name
+        :param path: Path to sub-node
+        """
+        self._queue(path, False, (Node, name), 'remove', None)
+
+    def remove_property(self, name: str, path: str = ''):
+        """
+        Queue remove of property
+
+        :param name: Property name
+        :param path: Path to subnode
+        """
+        self._queue(path, False, (Property, name), 'remove', None)
+
+    def discard(self):
+        """ Discard all queued operations """
+        self._ops.clear()
+        self._create.clear()
+
+    @profiler.timed('batch.commit')
+    def commit(self):
+        """ Apply all queued operations, raise exception and roll back if any operation fails """
+        root = self._fdt.root
+        index = root._index
+        # the index is not updated by every operation, but rebuilt once at the end
+        root._index = None
+        undo = []
+        try:
+            nodes = {(): root}
+            # the sorted paths start with parent path before sub-nodes paths
+            for path in sorted(set(p[:i] for p in self._ops for i in range(len(p) + 1))):
+                node = nodes.get(path)
+                if node is None:
+                    parent = nodes[path[:-1]]
+                    node = parent.get_subnode(path[-1])
+                    if node is None:
+                        if path not in self._create:
+                            raise ValueError("Path \"{}\" doesn't exists".format('/'.join(path)))
+                        node = Node(path[-1])
+                        self._replace(parent, None, node, undo)
+                    nodes[path] = node
+                for (item_type, name), (operation, item) in self._ops.get(path, {}).items():
+                    old_item = node.get_property(name) if item_type is Property else node.get_subnode(name)
+                    if operation == 'add' and old_item is not None:
+                        raise Exception("{}: \"{}\" {} already exists".format(
+                            node, name, 'property' if item_type is Property else 'node'))
+                    if old_item is not None or item is not None:
+                        self._replace(node, old_item, item, undo)
+        except Exception:
+            for node, items, pos, old_item, new_item in reversed(undo):
+                if new_item is not None:
+                    new_item._parent = None
+                if old_item is None:
+                    del items[pos]
+                elif new_item is None:
+                    items.insert(pos, old_item)
+                else:
+                    items[pos] = old_item
+                if old_item is not None:
+                    old_item._parent = node
+            root._index = index
+            raise
+        finally:
+            self.discard()
+
+        if index is not None:
+            root._index = NameIndex(root)
+        if self._update_phandles:
+            self._fdt.update_phandles()
+
+    @staticmethod
+    def _replace(node: Node, old_item, new_item, undo: list):
+        """ Replace, add (old_item is None) or remove (new_item is None) item of node and record it into undo log """
+        if new_item is node:
+            raise Exception("{}: append the same node {}".format(node, new_item.name))
+        items = node._nodes if isinstance(new_item if old_item is None else old_item, Node) else node._props
+        if old_item is None:
+            pos = len(items)
+            items.append(new_item)
+        else:
+            # the items are found by identity, not by (deep) equality
+            pos = next(i for i, item in enumerate(items) if item is old_item)
+            if new_item is None:
+                del items[pos]
+            else:
+                items[pos] = new_item
+            old_item._parent = None
+        if new_item is not None:
+            new_item._parent = node
+        undo.append((node, items, pos, old_item, new_item))
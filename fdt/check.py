@@ -0,0 +1,201 @@
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+from struct import unpack_from
+
+from .header import Header, DTB_BEGIN_NODE, DTB_END_NODE, DTB_PROP, DTB_NOP, DTB_END
+from .misc import PRINTABLE_CHARS
+from .profiler import profiler
+
+
+# The DTB error: code (short identifier), offset (in buffer) and message (human readable description)
+DtbError = namedtuple('DtbError', ('code', 'offset', 'message'))
+
+# The chars allowed in node and property names
+NAME_BYTES = bytes(sorted(ord(c) for c in PRINTABLE_CHARS if not c.isspace()))
+
+
+def _find_nul(data, start: int, end: int) -> int:
+    """ Return index of the first zero byte in <start, end) or -1 """
+    if not isinstance(data, memoryview):
+        return data.find(b'\0', start, end)
+    # memoryview has not find(), copy just small chunks
+    for pos in range(start, end, 64):
+        index = bytes(data[pos:min(pos + 64, end)]).find(b'\0')
+        if index >= 0:
+            return pos + index
+    return -1
+
+
+def _check_name(data, start: int, end: int) -> bool:
+    """ Check that name is not empty and contains just allowed chars """
+    return start < end and not bytes(data[start:end]).translate(None, NAME_BYTES)
+
+
+########################################################################################################################
+# DTB Validator
+########################################################################################################################
+
+@profiler.timed('check_dtb')
+def check_dtb(data, offset: int = 0, max_errors: int = 100) -> list:
+    """
+    Validate DTB without creating its object tree. Return list of DtbError, the empty list means valid DTB.
+
+    The check covers header (magic, version, offsets and sizes of blocks), memory reserve map termination, structure
+    block tag stream (nesting, alignment, node names, property sizes and name offsets) and strings block bounds.
+
+    :param data: The DTB as bytes, bytearray, mmap or memoryview
+    :param offset: The offset of DTB in data
+    :param max_errors: The max count of reported errors
+    """
+    errors = []
+
+    def error(code, pos, message):
+        errors.append(DtbError(code, pos, message))
+        return len(errors) >= max_errors
+
+    # header
+    if len(data) < offset + Header.MIN_SIZE:
+        error('header_truncated', offset, "Data size {} too small for header".format(len(data) - offset))
+        return errors
+    (magic, total_size, off_struct, off_strings, off_rsvmap, version, last_comp_version) = \
+        unpack_from('>7I', data, offset)
+    if magic != Header.MAGIC_NUMBER:
+        error('bad_magic', offset, "Invalid magic number 0x{:08X}".format(magic))
+        return errors
+    if version < 1 or last_comp_version > Header.MAX_VERSION:
+        error('bad_version', offset + 20, "Not supported version {} (last compatible {})".format(
+            version, last_comp_version))
+        return errors
+    header_size = Header.MIN_SIZE + 4 * ((version >= 2) + (version >= 3) + (version >= 17))
+    if len(data) < offset + header_size:
+        error('header_truncated', offset, "Data size {} too small for header".format(len(data) - offset))
+        return errors
+    size_strings = unpack_from('>I', data, offset + 32)[0] if version >= 3 else None
+    size_struct = unpack_from('>I', data, offset + 36)[0] if version >= 17 else None
+    if total_size > len(data) - offset:
+        if error('bad_total_size', offset + 4, "Total size {} exceeds data size {}".format(
+                total_size, len(data) - offset)):
+            return errors
+        total_size = len(data) - offset
+    if total_size < header_size:
+        error('bad_total_size', offset + 4, "Total size {} smaller than header".format(total_size))
+        return errors
+
+    # blocks bounds
+    struct_end = total_size if size_struct is None else off_struct + size_struct
+    strings_end = total_size if size_strings is None else off_strings + size_strings
+    for code, pos, start, end, align in (('bad_rsvmap_offset', 16, off_rsvmap, off_rsvmap, 8),
+                                         ('bad_struct_offset', 8, off_struct, struct_end, 4),
+                                         ('bad_strings_offset', 12, off_strings, strings_end, 1)):
+        if start < header_size or end > total_size or start % align:
+            error(code, offset + pos, "Block <0x{:X}, 0x{:X}> out of DTB or not aligned to {}".format(
+                start, end, align))
+            return errors
+    if size_struct and size_strings and off_struct < strings_end and off_strings < struct_end:
+        if error('blocks_overlap', offset + 8, "Structure and strings blocks overlap"):
+            return errors
+
+    # memory reserve map
+    pos = off_rsvmap
+    while True:
+        if pos + 16 > total_size:
+            if error('rsvmap_unterminated', offset + off_rsvmap, "Memory reserve map is not terminated"):
+                return errors
+            break
+        address, size = unpack_from('>QQ', data, offset + pos)
+        pos += 16
+        if address == 0 and size == 0:
+            break
+
+    # structure block
+    pos = off_struct
+    depth = 0
+    root_seen = False
+    names = {}
+    while True:
+        if pos + 4 > struct_end:
+            error('struct_unterminated', offset + pos, "Structure block is not terminated by END tag")
+            break
+        tag = unpack_from('>I', data, offset + pos)[0]
+        tag_pos = offset + pos
+        pos += 4
+        if tag == DTB_BEGIN_NODE:
+            name_end = _find_nul(data, offset + pos, offset + struct_end)
+            if name_end < 0:
+                error('name_unterminated', tag_pos, "Node name is not terminated")
+                break
+            name_end -= offset
+            if depth == 0:
+                if root_seen:
+                    if error('multiple_roots', tag_pos, "More than one root node"):
+                        break
+                elif name_end != pos:
+                    if error('bad_root_name', tag_pos, "Root node name must be empty"):
+                        break
+                root_seen = True
+            elif not _check_name(data, offset + pos, offset + name_end):
+                if error('bad_node_name', tag_pos, "Empty or invalid node name"):
+                    break
+            pos = (name_end + 4) & ~3
+            depth += 1
+        elif tag == DTB_END_NODE:
+            if depth == 0:
+                error('unbalanced_end_node', tag_pos, "END_NODE tag without BEGIN_NODE")
+                break
+            depth -= 1
+        elif tag == DTB_PROP:
+            if pos + 8 > struct_end:
+                error('prop_truncated', tag_pos, "Property header out of structure block")
+                break
+            size, name_offset = unpack_from('>II', data, offset + pos)
+            pos += 8
+            if version < 16 and size >= 8:
+                pos = (pos + 7) & ~7
+            if pos + size > struct_end:
+                error('prop_truncated', tag_pos, "Property value (size {}) out of structure block".format(size))
+                break
+            if depth == 0 and error('prop_outside_node', tag_pos, "Property outside of node"):
+                break
+            # every name in strings block is checked only once
+            if name_offset not in names:
+                name_pos = off_strings + name_offset
+                name_end = -1
+                if name_pos < strings_end:
+                    name_end = _find_nul(data, offset + name_pos, offset + strings_end)
+                if name_end < 0:
+                    names[name_offset] = False
+                    if error('bad_name_offset', tag_pos + 8, "Property name offset {} out of strings block".format(
+                            name_offset)):
+                        break
+                else:
+                    names[name_offset] = _check_name(data, offset + name_pos, name_end)
+                    if not names[name_offset] and error('bad_prop_name', tag_pos + 8,
+                                                        "Empty or invalid property name"):
+                        break
+            pos = (pos + size + 3) & ~3
+        elif tag == DTB_NOP:
+            continue
+        elif tag == DTB_END:
+            if depth != 0:
+                error('unbalanced_begin_node', tag_pos, "{} node(s) not closed by END_NODE tag".format(depth))
+            elif not root_seen:
+                error('missing_root', tag_pos, "Structure block has no root node")
+            break
+        else:
+            error('bad_tag', tag_pos, "Unknown tag 0x{:08X}".format(tag))
+            break
+
+    return errors
@@ -0,0 +1,299 @@
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import zlib
+import mmap
+import hashlib
+from struct import unpack_from
+
+from .header import Header, DTB_BEGIN_NODE, DTB_END_NODE, DTB_PROP, DTB_NOP, DTB_END
+from .items import new_property
+
+
+########################################################################################################################
+# Helper Functions
+########################################################################################################################
+
+def _find_nul(data, start: int) -> int:
+    """ Return index of the first zero byte from start position """
+    if not isinstance(data, memoryview):
+        index = data.find(b'\0', start)
+        if index < 0:
+            raise ValueError("String terminator not found")
+        return index
+    # memoryview has not find(), copy just small chunks
+    pos = start
+    while pos < len(data):
+        index = bytes(data[pos:pos + 64]).find(b'\0')
+        if index >= 0:
+            return pos + index
+        pos += 64
+    raise ValueError("String terminator not found")
+
+
+def _parse_struct(data, offset: int, header: Header) -> dict:
+    """
+    Parse structure block of FDT without copying property values.
+    Return dictionary: node path -> {property name: (value offset, value size)}
+
+    :param data: The FDT data
+    :param offset: The offset of FDT in data
+    :param header: The FDT header
+    """
+    nodes = {}
+    path = []
+    props = None
+    names = {}
+    index = offset + header.off_dt_struct
+    while True:
+        if len(data) < index + 4:
+            raise ValueError("Index out of range !")
+        tag = unpack_from(">I", data, index)[0]
+        index += 4
+        if tag == DTB_BEGIN_NODE:
+            end = _find_nul(data, index)
+            name = bytes(data[index:end]).decode('ascii')
+            index = offset + ((end + 1 - offset + 3) & ~3)
+            path.append(name)
+            props = nodes.setdefault('/'.join(path) or '/', {})
+        elif tag == DTB_END_NODE:
+            if not path:
+                raise ValueError("Invalid FIT structure")
+            path.pop()
+            props = nodes.get('/'.join(path) or '/') if path else None
+        elif tag == DTB_PROP:
+            size, name_offset = unpack_from(">II", data, index)
+            start = index + 8
+            if header.version < 16 and size >= 8:
+                start = offset + ((start - offset + 7) & ~7)
+            name = names.get(name_offset)
+            if name is None:
+                name_start = offset + header.off_dt_strings + name_offset
+                name = bytes(data[name_start:_find_nul(data, name_start)]).decode('ascii')
+                names[name_offset] = name
+            if start + size > len(data):
+                raise ValueError("Property \"{}\" out of range !".format(name))
+            if props is None:
+                raise ValueError("Invalid FIT structure")
+            props[name] = (start, size)
+            index = offset + ((start + size - offset + 3) & ~3)
+        elif tag == DTB_NOP:
+            continue
+        elif tag == DTB_END:
+            break
+        else:
+            raise ValueError("Unknown Tag: {}".format(tag))
+    return nodes
+
+
+########################################################################################################################
+# FIT Class
+########################################################################################################################
+
+class FIT:
+    """
+    U-Boot Flattened Image Tree (*.itb) with lazy and zero-copy access to images data.
+
+    The images data (embedded "data" property or external data addressed by "data-offset"/"data-position" and
+    "data-size" properties) are never copied, image_data() returns memoryview into the source buffer. The memory
+    mapped file can't be closed while such memoryview exists, release it (or use it in "with" block) before close.
+    """
+
+    IMAGES_PATH = '/images'
+    CONFIGS_PATH = '/configurations'
+
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, data, offset: int = 0):
+        """
+        FIT constructor
+
+        :param data: FIT image as bytes, bytearray, mmap or memoryview
+        :param offset: The offset of FIT image in data
+        """
+        self._data = data
+        self._view = memoryview(data)
+        self._offset = offset
+        self._file = None
+        self.header = Header.parse(data, offset)
+        self._nodes = _parse_struct(data, offset, self.header)
+
+    @classmethod
+    def from_file(cls, file_path: str, offset: int = 0):
+        """
+        Open FIT image file, the file is memory mapped and its content is loaded only when accessed
+
+        :param file_path: The path to FIT image file
+        :param offset: The offset of FIT image in file
+        """
+        with open(file_path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        fit = cls(data, offset)
+        fit._file = data
+        return fit
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Release the memory mapped file (if opened by from_file). Raises BufferError if any memoryview returned by
+        image_data() is not released, the close can be repeated after releasing it.
+        """
+        if self._file is not None:
+            # the mmap can't be closed while own view exists, the view is restored if image data views are alive
+            self._view.release()
+            try:
+                self._file.close()
+            except BufferError:
+                self._view = memoryview(self._data)
+                raise
+            self._file = None
+
+    def _get_props(self, path: str) -> dict:
+        props = self._nodes.get(path)
+        if props is None:
+            raise ValueError("Path \"{}\" doesn't exists".format(path))
+        return props
+
+    def _get_value(self, path: str, name: str):
+        props = self._get_props(path)
+        if name not in props:
+            return None
+        start, size = props[name]
+        return new_property(name, bytes(self._view[start:start + size]))
+
+    def _get_subnodes(self, path: str) -> list:
+        prefix = path.rstrip('/') + '/'
+        return [key[len(prefix):] for key in self._nodes if key.startswith(prefix) and '/' not in key[len(prefix):]]
+
+    @property
+    def description(self):
+        prop = self._get_value('/', 'description')
+        return None if prop is None else prop.value
+
+    @property
+    def default_configuration(self):
+        if self.CONFIGS_PATH not in self._nodes:
+            return None
+        prop = self._get_value(self.CONFIGS_PATH, 'default')
+        return None if prop is None else prop.value
+
+    def images(self) -> list:
+        """ Return list of image names """
+        return self._get_subnodes(self.IMAGES_PATH) if self.IMAGES_PATH in self._nodes else []
+
+    def configurations(self) -> list:
+        """ Return list of configuration names """
+        return self._get_subnodes(self.CONFIGS_PATH) if self.CONFIGS_PATH in self._nodes else []
+
+    def image(self, name: str) -> dict:
+        """
+        Return image properties (except data) as dictionary: property name -> property object
+
+        :param name: The image name
+        """
+        path = self.IMAGES_PATH + '/' + name
+        return {key: self._get_value(path, key) for key in self._get_props(path) if key != 'data'}
+
+    def configuration(self, name: str) -> dict:
+        """
+        Return configuration properties as dictionary: property name -> property object
+
+        :param name: The configuration name
+        """
+        path = self.CONFIGS_PATH + '/' + name
+        return {key: self._get_value(path, key) for key in self._get_props(path)}
+
+    def image_data(self, name: str) -> memoryview:
+        """
+        Return image data as memoryview into the source buffer (without copying), the memoryview must be released
+        before close() of FIT opened by from_file()
+
+        :param name: The image name
+        """
+        path = self.IMAGES_PATH + '/' + name
+        props = self._get_props(path)
+        if 'data' in props:
+            start, size = props['data']
+        else:
+            size = self._get_value(path, 'data-size')
+            if size is None:
+                raise ValueError("Image \"{}\" has no data".format(name))
+            size = size.value
+            if 'data-position' in props:
+                start = self._offset + self._get_value(path, 'data-position').value
+            elif 'data-offset' in props:
+                # the external data starts after FDT aligned to 4 bytes
+                start = self._offset + ((self.header.total_size + 3) & ~3) + self._get_value(path, 'data-offset').value
+            else:
+                raise ValueError("Image \"{}\" has no data".format(name))
+            if start + size > len(self._view):
+                raise ValueError("Image \"{}\" data out of range !".format(name))
+        return self._view[start:start + size]
+
+    def hashes(self, name: str) -> list:
+        """
+        Return list of image hashes as tuples: (hash node name, algorithm, value)
+
+        :param name: The image name
+        """
+        path = self.IMAGES_PATH + '/' + name
+        hashes = []
+        for node_name in self._get_subnodes(path):
+            if node_name.startswith('hash'):
+                hash_path = path + '/' + node_name
+                algo = self._get_value(hash_path, 'algo')
+                props = self._get_props(hash_path)
+                if algo is not None and 'value' in props:
+                    start, size = props['value']
+                    hashes.append((node_name, algo.value, bytes(self._view[start:start + size])))
+        return hashes
+
+    def verify(self, name: str, chunk_size: int = HASH_CHUNK_SIZE) -> bool:
+        """
+        Verify image data against all its hash nodes, the data are hashed in chunks.
+        Return True if all hashes match, False if any doesn't match. Raises ValueError if image has no hash node.
+
+        :param name: The image name
+        :param chunk_size: The size of hashed chunk in bytes
+        """
+        hashes = self.hashes(name)
+        if not hashes:
+            raise ValueError("Image \"{}\" has no hash node".format(name))
+        with self.image_data(name) as data:
+            return self._verify(data, hashes, chunk_size)
+
+    @staticmethod
+    def _verify(data: memoryview, hashes: list, chunk_size: int) -> bool:
+        for node_name, algo, value in hashes:
+            if algo == 'crc32':
+                crc = 0
+                for pos in range(0, len(data), chunk_size):
+                    crc = zlib.crc32(data[pos:pos + chunk_size], crc)
+                digest = crc.to_bytes(4, 'big')
+            else:
+                try:
+                    hash_obj = hashlib.new(algo)
+                except ValueError:
+                    raise ValueError("Not supported hash algorithm: {}".format(algo))
+                for pos in range(0, len(data), chunk_size):
+                    hash_obj.update(data[pos:pos + chunk_size])
+                digest = hash_obj.digest()
+            if digest != value:
+                return False
+        return True
@@ -0,0 +1,447 @@
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Immutable snapshots of FDT objects created by FDT.freeze().
+
+The snapshot is a deep copy of tree with tuple backed sub-nodes and properties, immutable property values (tuple or
+bytes), cached hashes and eagerly built indexes (path -> node, name -> items). Nothing is modified after creation, so
+the snapshot can be shared by more threads without locks. Any modification raises TypeError, FrozenFDT.thaw() returns
+mutable copy.
+"""
+
+from array import array
+from types import MappingProxyType
+
+from .header import Header
+from .items import _walk, WORD_TYPECODES, NameIndex, Property, PropStrings, PropWords, PropBytes, PropIncBin, Node
+from .profiler import profiler
+from . import FDT
+
+
+def _frozen_error(obj):
+    raise TypeError("{} is frozen, use thaw() or copy() to get modifiable object".format(type(obj).__name__))
+
+
+def _set(obj, **attrs):
+    """ Set attributes of frozen object """
+    for name, value in attrs.items():
+        object.__setattr__(obj, name, value)
+
+
+class ReadOnly:
+    """ Base of frozen classes, the attributes can't be modified after creation """
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        _frozen_error(self)
+
+    def __delattr__(self, name):
+        _frozen_error(self)
+
+
+class FrozenHeader(ReadOnly, Header):
+    """ Read only copy of FDT header """
+
+    def __init__(self, header: Header):
+        _set(self, **vars(header))
+
+    def thaw(self) -> Header:
+        """ Return modifiable copy of header """
+        header = Header()
+        vars(header).update(vars(self))
+        return header
+
+
+########################################################################################################################
+# Frozen Items
+########################################################################################################################
+
+class FrozenItem(ReadOnly):
+    """ Frozen node or property, all methods which modify the item raise TypeError """
+
+    __slots__ = ()
+
+    def __hash__(self):
+        return self._hash
+
+    def set_name(self, value: str):
+        _frozen_error(self)
+
+    def set_label(self, value: str):
+        _frozen_error(self)
+
+    def set_parent(self, value):
+        _frozen_error(self)
+
+    def append(self, item):
+        _frozen_error(self)
+
+    def pop(self, index: int):
+        _frozen_error(self)
+
+    def clear(self):
+        _frozen_error(self)
+
+
+class FrozenProperty(FrozenItem, Property):
+    __slots__ = ('_hash',)
+
+
+class FrozenPropStrings(FrozenItem, PropStrings):
+    __slots__ = ('_hash',)
+
+
+class FrozenPropWords(FrozenItem, PropWords):
+    __slots__ = ('_hash',)
+
+    def copy(self):
+        """ Create modifiable copy of object """
+        data = list(self.data) if self.word_size == 32 else array(WORD_TYPECODES[self.word_size], self.data)
+        return PropWords._new(self.name, data, self.word_size)
+
+
+class FrozenPropBytes(FrozenItem, PropBytes):
+    __slots__ = ('_hash',)
+
+
+class FrozenPropIncBin(FrozenItem, PropIncBin):
+    __slots__ = ('_hash',)
+
+    @property
+    def data(self):
+        """ The included data, not loaded data are read from file at every access (and not cached) """
+        if self.loaded:
+            return self._data_slot
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.offset)
+            return f.read(len(self))
+
+
+# The frozen class of every property class
+FROZEN_PROP_CLASSES = {
+    Property: FrozenProperty,
+    PropStrings: FrozenPropStrings,
+    PropWords: FrozenPropWords,
+    PropBytes: FrozenPropBytes,
+    PropIncBin: FrozenPropIncBin,
+}
+
+
+def _freeze_prop(prop: Property, parent):
+    """ Return frozen copy of property """
+    frozen_class = FROZEN_PROP_CLASSES.get(type(prop))
+    if frozen_class is None:
+        raise TypeError("Not supported property type: {}".format(type(prop).__name__))
+    obj = frozen_class.__new__(frozen_class)
+    _set(obj, _name=prop.name, _label=prop.label, _parent=parent)
+    if isinstance(prop, PropIncBin):
+        # the size of rest of file is fixed at freeze, the size specified in source is kept for to_dts
+        _set(obj, file_name=prop.file_name, relative_path=prop.relative_path, file_path=prop.file_path,
+             offset=prop.offset, _size=prop._size, _file_size=len(prop))
+        if prop.loaded:
+            _set(obj, _data_slot=bytes(prop.data))
+        # the equal PropIncBin objects can have loaded or not loaded data
+        _set(obj, _hash=hash((frozen_class, prop.name, prop.file_name, prop.relative_path)))
+        return obj
+    if isinstance(prop, PropBytes):
+        data = bytes(prop.data)
+    elif isinstance(prop, PropWords):
+        data = tuple(prop.data)
+        _set(obj, word_size=prop.word_size)
+    elif isinstance(prop, PropStrings):
+        data = tuple(prop.data)
+    else:
+        data = None
+    if data is not None:
+        _set(obj, data=data)
+    _set(obj, _hash=hash((frozen_class, prop.name, data)))
+    return obj
+
+
+class FrozenNode(FrozenItem, Node):
+    """ Frozen node with tuple backed properties and sub-nodes and name lookup tables """
+
+    __slots__ = ('_hash', '_prop_map', '_node_map', '_names')
+
+    def __eq__(self, node):
+        """ Check node equality, the frozen nodes with different hash are not compared """
+        if isinstance(node, FrozenNode) and self._hash != node._hash:
+            return False
+        return Node.__eq__(self, node)
+
+    __hash__ = FrozenItem.__hash__
+
+    def get_property(self, name):
+        """
+        Get property object by its name
+
+        :param name: Property name
+        """
+        return self._prop_map.get(name)
+
+    def get_subnode(self, name: str):
+        """
+        Get subnode object by name
+
+        :param name: Subnode name
+        """
+        return self._node_map.get(name)
+
+    def _name_paths(self) -> dict:
+        """ Return name -> list of (relative path of node as tuple of names, True for property), built once """
+        if self._names is None:
+            names = {}
+            stack = [(self, ())]
+            while stack:
+                node, path = stack.pop()
+                for prop in node._props:
+                    names.setdefault(prop._name, []).append((path, True))
+                for sub_node in reversed(node._nodes):
+                    sub_path = path + (sub_node._name,)
+                    names.setdefault(sub_node._name, []).append((sub_path, False))
+                    stack.append((sub_node, sub_path))
+            _set(self, _names=names)
+        return self._names
+
+    def set_property(self, name, value):
+        _frozen_error(self)
+
+    def remove_property(self, name: str):
+        _frozen_error(self)
+
+    def remove_subnode(self, name: str):
+        _frozen_error(self)
+
+    def merge(self, node_obj, replace: bool = True):
+        _frozen_error(self)
+
+    def _append(self, item):
+        _frozen_error(self)
+
+
+def freeze_node(node: Node, paths: dict = None) -> FrozenNode:
+    """
+    Return frozen copy of node with all its sub-nodes
+
+    :param node: The node object
+    :param paths: The dictionary filled with path -> frozen node (optional)
+    """
+    # the tree is copied by explicit stack, every node is completed (and hashed) after its sub-nodes
+    stack = []
+    for item, _, enter in _walk(node, True):
+        if enter:
+            parent = stack[-1][0] if stack else None
+            frozen = FrozenNode.__new__(FrozenNode)
+            props = tuple(_freeze_prop(prop, frozen) for prop in item.props)
+            _set(frozen, _name=item.name, _label=item.label, _parent=parent, _index=None, _names=None,
+                 _props=props, _prop_map={prop.name: prop for prop in props})
+            if paths is not None:
+                path = '/' if parent is None else stack[-1][2].rstrip('/') + '/' + item.name
+                paths[path] = frozen
+            else:
+                path = None
+            stack.append((frozen, [], path))
+            continue
+        frozen, nodes, _ = stack.pop()
+        nodes = tuple(nodes)
+        _set(frozen, _nodes=nodes, _node_map={sub_node.name: sub_node for sub_node in nodes},
+             _hash=hash((frozen.name, frozenset(prop._hash for prop in frozen.props),
+                         frozenset(sub_node._hash for sub_node in nodes))))
+        if stack:
+            stack[-1][1].append(frozen)
+    return frozen
+
+
+########################################################################################################################
+# Copy-on-write Node
+########################################################################################################################
+
+class CowNode(Node):
+    """
+    Copy-on-write node created by Node.copy(cow=True). The node shares its content with frozen node (source) until
+    its properties or sub-nodes are accessed. Then the properties are copied and the sub-nodes are created as
+    copy-on-write nodes of the source sub-nodes, so only the path from root to accessed items is materialized.
+    """
+
+    __slots__ = ('_source',)
+
+    # the slots of Node class, used as storage for materialized properties and sub-nodes
+    _props_slot = Node._props
+    _nodes_slot = Node._nodes
+
+    @classmethod
+    def share(cls, node: Node, parent: Node = None):
+        """
+        Create copy-on-write copy of frozen or not materialized copy-on-write node
+
+        :param node: The node object
+        :param parent: The parent of created node
+        """
+        if node._source is not None:
+            node = node._source
+        elif not isinstance(node, FrozenNode):
+            raise ValueError("{}: copy-on-write copy requires frozen node, use FDT.freeze() or freeze_node()".format(
+                node.name))
+        obj = cls._new(node.name, node.label)
+        obj._parent = parent
+        obj._source = node
+        return obj
+
+    @classmethod
+    def _new(cls, name: str, label: str = None):
+        obj = cls.__new__(cls)
+        obj._name = name
+        obj._label = label
+        obj._parent = None
+        obj._index = None
+        obj._source = None
+        obj._props_slot = []
+        obj._nodes_slot = []
+        return obj
+
+    def _materialize(self):
+        source = self._source
+        self._source = None
+        props = [prop.copy() for prop in source.props]
+        for prop in props:
+            prop._parent = self
+        self._props_slot = props
+        self._nodes_slot = [CowNode.share(node, self) for node in source.nodes]
+        index = self._get_index()
+        if index is not None:
+            index.materialize(self)
+
+    @property
+    def materialized(self) -> bool:
+        """ True if the properties and sub-nodes are not shared """
+        return self._source is None
+
+    @property
+    def _props(self):
+        if self._source is not None:
+            self._materialize()
+        return self._props_slot
+
+    @property
+    def _nodes(self):
+        if self._source is not None:
+            self._materialize()
+        return self._nodes_slot
+
+
+########################################################################################################################
+# Frozen FDT Class
+########################################################################################################################
+
+class FrozenFDT(ReadOnly, FDT):
+    """
+    Immutable snapshot of FDT object, safe for concurrent readers. The read methods (get_node, get_property, search,
+    walk, to_dts, to_dtb, ...) work as for FDT object, the methods which modify the tree raise TypeError.
+    """
+
+    @profiler.timed('freeze')
+    def __init__(self, fdt_obj: FDT):
+        """
+        FrozenFDT constructor, use FDT.freeze() instead
+
+        :param fdt_obj: The FDT object
+        """
+        paths = {}
+        root = None if fdt_obj.root is None else freeze_node(fdt_obj.root, paths)
+        if root is not None:
+            _set(root, _index=NameIndex(root))
+        _set(self, header=FrozenHeader(fdt_obj.header),
+             entries=tuple(MappingProxyType(dict(entry)) for entry in fdt_obj.entries),
+             root=root,
+             last_handle=fdt_obj.last_handle,
+             label_to_handle=MappingProxyType(dict(fdt_obj.label_to_handle)),
+             handle_to_label=MappingProxyType(dict(fdt_obj.handle_to_label)),
+             references=(),
+             _paths=paths,
+             _hash=hash(root))
+
+    def __hash__(self):
+        return self._hash
+
+    def freeze(self):
+        """ Return self, the object is already frozen """
+        return self
+
+    def thaw(self, cow: bool = False) -> FDT:
+        """
+        Return modifiable copy of FDT object
+
+        :param cow: If True, the nodes are copied at first access (see Node.copy), so the thaw takes O(1)
+        """
+        fdt_obj = FDT(self.header.thaw(), [dict(entry) for entry in self.entries])
+        fdt_obj.root = None if self.root is None else self.root.copy(cow)
+        fdt_obj.last_handle = self.last_handle
+        fdt_obj.label_to_handle = dict(self.label_to_handle)
+        fdt_obj.handle_to_label = dict(self.handle_to_label)
+        return fdt_obj
+
+    def get_node(self, path: str, create: bool = False) -> Node:
+        """
+        Get node object from specified path
+
+        :param path: Path as string
+        :param create: Must be False, the nodes can't be created
+        """
+        assert isinstance(path, str), "Node path must be a string type !"
+        if create:
+            _frozen_error(self)
+        node = self._paths.get('/' + path.lstrip('/'))
+        if node is None:
+            raise ValueError("Path \"{}\" doesn't exists".format(path.lstrip('/')))
+        return node
+
+    def get_index(self) -> NameIndex:
+        """ Return the name index of items (built at freeze) """
+        return self.root._index
+
+    def _dtb_header(self) -> Header:
+        # the export updates offsets and sizes in header, so the snapshot header is not used
+        return self.header.thaw()
+
+    def set_property(self, name: str, value, path: str = '', create: bool = True):
+        _frozen_error(self)
+
+    def remove_node(self, name: str, path: str = ''):
+        _frozen_error(self)
+
+    def remove_property(self, name: str, path: str = ''):
+        _frozen_error(self)
+
+    def add_item(self, obj, path: str = '', create: bool = True):
+        _frozen_error(self)
+
+    def add_label(self, label):
+        _frozen_error(self)
+
+    def merge(self, fdt_obj, replace: bool = True):
+        _frozen_error(self)
+
+    def update_phandles(self):
+        _frozen_error(self)
+
+    def batch(self, update_phandles: bool = False):
+        _frozen_error(self)
+
+    def apply_properties(self, properties: dict, types: dict = None, create: bool = True):
+        _frozen_error(self)
+
+    def resolve_references(self, labels: dict = None):
+        _frozen_error(self)
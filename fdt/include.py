@@ -0,0 +1,146 @@
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import re
+import hashlib
+from threading import Lock
+
+from .misc import strip_comments, split_to_lines, is_printable
+
+
+# /include/ "file path"
+INCLUDE_PATTERN = re.compile(r'^[ \t]*/include/[ \t]+"([^"]+)"[ \t]*;?[ \t]*$', re.M)
+
+
+def split_includes(text: str) -> list:
+    """
+    Split DTS text without comments into parts: list of DTS lines or included file name
+
+    :param text: The DTS text without comments
+    """
+    parts = []
+    start = 0
+    for match in INCLUDE_PATTERN.finditer(text):
+        parts.append(split_to_lines(text[start:match.start()]))
+        parts.append(match.group(1))
+        start = match.end()
+    parts.append(split_to_lines(text[start:]))
+    return parts
+
+
+########################################################################################################################
+# Include Cache Class
+########################################################################################################################
+
+class IncludeCache:
+    """
+    Process-wide cache of preprocessed include files (*.dtsi), so the file shared by many DTS files is read and split
+    into lines only once. The entry is valid while the file has the same modification time and size, the changed file
+    with the same content (hash) is not processed again.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        # absolute file path -> (mtime_ns, size, hash, parts)
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        """ Remove all cached files """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get(self, file_path: str) -> list:
+        """
+        Return the preprocessed file: list of DTS lines or included file name (see split_includes)
+
+        :param file_path: The path to include file
+        """
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.hits += 1
+                return entry[3]
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).digest()
+        hit = entry is not None and entry[2] == digest
+        if hit:
+            parts = entry[3]
+        else:
+            text = strip_comments(data.decode('utf-8'))
+            # validate all chars at once, the items are then created over trusted path
+            assert is_printable(text), "The value must contain just printable chars !"
+            parts = split_includes(text)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._entries[file_path] = (stat.st_mtime_ns, stat.st_size, digest, parts)
+        return parts
+
+
+# The include cache instance used by parse_dts
+include_cache = IncludeCache()
+
+
+def find_include(name: str, base_dir: str, include_dirs) -> str:
+    """
+    Return the path to included file, the file is searched in directory of including file and then in include dirs
+
+    :param name: The included file name
+    :param base_dir: The directory of including file
+    :param include_dirs: The list of include directories
+    """
+    for directory in [base_dir] + list(include_dirs or ()):
+        file_path = os.path.join(directory, name)
+        if os.path.isfile(file_path):
+            return file_path
+    raise Exception("Include file not found: {}".format(name))
+
+
+def expand_includes(parts: list, base_dir: str, include_dirs=None, included=(), dirs: list = None) -> list:
+    """
+    Return DTS lines with included files expanded in place
+
+    :param parts: The preprocessed DTS text (see split_includes)
+    :param base_dir: The directory of DTS file, the included files are searched relative to it
+    :param include_dirs: The list of include directories
+    :param included: The paths of files which are being included (for cycle detection)
+    :param dirs: The list filled with (index of first line, directory of source file) for every block of lines
+    """
+    lines = []
+    _expand_includes(parts, base_dir, include_dirs, included, lines, dirs)
+    return lines
+
+
+def _expand_includes(parts: list, base_dir: str, include_dirs, included: tuple, lines: list, dirs):
+    for part in parts:
+        if isinstance(part, list):
+            if dirs is not None and part:
+                dirs.append((len(lines), base_dir))
+            lines += part
+            continue
+        file_path = os.path.abspath(find_include(part, base_dir, include_dirs))
+        if file_path in included:
+            raise Exception("Recursive include of file: {}".format(file_path))
+        _expand_includes(include_cache.get(file_path), os.path.dirname(file_path), include_dirs,
+                         included + (file_path,), lines, dirs)
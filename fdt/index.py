@@ -0,0 +1,336 @@
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mmap
+import zlib
+from array import array
+from bisect import bisect_left
+from struct import Struct, unpack_from
+
+from .header import DTB_BEGIN_NODE, DTB_END_NODE, DTB_PROP, DTB_NOP, DTB_END
+from .check import _find_nul
+from .raw import _blocks
+from .profiler import profiler
+
+
+# The sidecar file header: magic, format version, byte order mark, DTB size, DTB crc32, nodes count, properties count
+INDEX_HEADER = Struct('=4sIIIIII4x')
+INDEX_MAGIC = b'DTBI'
+INDEX_VERSION = 1
+INDEX_BOM = 0x01020304
+
+# The index tables: (name, typecode, items count: 'n' - nodes, 'n1' - nodes + 1, 'p' - properties)
+INDEX_TABLES = (
+    ('node_keys', 'Q', 'n'),
+    ('node_sorted', 'I', 'n'),
+    ('node_offsets', 'I', 'n'),
+    ('node_parents', 'i', 'n'),
+    ('node_props', 'I', 'n1'),
+    ('prop_hashes', 'I', 'p'),
+    ('prop_names', 'I', 'p'),
+    ('prop_starts', 'I', 'p'),
+    ('prop_sizes', 'I', 'p'),
+)
+
+
+def _name_hash(name: bytes) -> int:
+    return zlib.crc32(name)
+
+
+########################################################################################################################
+# DTB Index Class
+########################################################################################################################
+
+class DtbIndex:
+    """
+    Compact array backed index of DTB structure block for repeated random access without rescanning the blob.
+
+    The nodes are stored in document order (the root node has index 0) with their offsets, parent indices and ranges
+    of properties. The path is resolved by binary search in table of (parent index, name hash) keys and the property
+    by binary search in the node properties sorted by name hash, the names are then verified against the blob. The
+    index can be saved as sidecar file and loaded over memory mapping.
+    """
+
+    def __init__(self, dtb, tables: dict, dtb_crc: int):
+        self._dtb = dtb
+        self._view = memoryview(dtb)
+        self._blocks = _blocks(dtb)
+        self._file = None
+        self.dtb_crc = dtb_crc
+        for name, _, _ in INDEX_TABLES:
+            setattr(self, '_' + name, tables[name])
+
+    def __len__(self):
+        return len(self._node_offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """ Release the DTB buffer and the memory mapped index file (if loaded by load) """
+        self._view.release()
+        if self._file is not None:
+            for name, _, _ in INDEX_TABLES:
+                getattr(self, '_' + name).release()
+            self._file.close()
+            self._file = None
+
+    def _node_name(self, index: int) -> bytes:
+        off_struct, end_struct, _, version = self._blocks
+        pos = off_struct + self._node_offsets[index] + 4
+        name = bytes(self._dtb[pos:_find_nul(self._dtb, pos, end_struct)])
+        if version < 16:
+            name = name[name.rfind(b'/') + 1:]
+        return name
+
+    def _prop_name(self, index: int) -> bytes:
+        pos = self._blocks[2] + self._prop_names[index]
+        return bytes(self._dtb[pos:_find_nul(self._dtb, pos, len(self._dtb))])
+
+    def node_offset(self, index: int) -> int:
+        """
+        Return node offset relative to structure block (usable with fdt.raw functions)
+
+        :param index: The node index
+        """
+        return self._node_offsets[index]
+
+    def parent(self, index: int) -> int:
+        """
+        Return the index of parent node, -1 for root node
+
+        :param index: The node index
+        """
+        return self._node_parents[index]
+
+    def get_name(self, index: int) -> str:
+        """
+        Return the node name
+
+        :param index: The node index
+        """
+        return self._node_name(index).decode('ascii')
+
+    def get_path(self, index: int) -> str:
+        """
+        Return the node path
+
+        :param index: The node index
+        """
+        names = []
+        while index > 0:
+            names.append(self.get_name(index))
+            index = self._node_parents[index]
+        return '/' + '/'.join(reversed(names))
+
+    def subnode(self, index: int, name: str) -> int:
+        """
+        Return the index of subnode or -1 if not exists
+
+        :param index: The parent node index
+        :param name: The subnode name
+        """
+        name = name.encode('ascii')
+        key = (index << 32) | _name_hash(name)
+        keys = self._node_keys
+        pos = bisect_left(keys, key)
+        while pos < len(keys) and keys[pos] == key:
+            node = self._node_sorted[pos]
+            if self._node_name(node) == name:
+                return node
+            pos += 1
+        return -1
+
+    def find(self, path: str) -> int:
+        """
+        Return the index of node with absolute path or -1 if not exists
+
+        :param path: The node path, for example: '/cpus/cpu@0'
+        """
+        index = 0
+        for name in path.split('/'):
+            if name:
+                index = self.subnode(index, name)
+                if index < 0:
+                    break
+        return index
+
+    def path_offset(self, path: str) -> int:
+        """
+        Return the offset of node with absolute path (usable with fdt.raw functions) or -1 if not exists
+
+        :param path: The node path, for example: '/cpus/cpu@0'
+        """
+        index = self.find(path)
+        return index if index < 0 else self._node_offsets[index]
+
+    def getprop(self, index: int, name: str):
+        """
+        Return the property value as memoryview into DTB or None if the property doesn't exist
+
+        :param index: The node index
+        :param name: The property name
+        """
+        name = name.encode('ascii')
+        name_hash = _name_hash(name)
+        hashes = self._prop_hashes
+        end = self._node_props[index + 1]
+        pos = bisect_left(hashes, name_hash, self._node_props[index], end)
+        while pos < end and hashes[pos] == name_hash:
+            if self._prop_name(pos) == name:
+                start = self._prop_starts[pos]
+                return self._view[start:start + self._prop_sizes[pos]]
+            pos += 1
+        return None
+
+    def save(self, file_path: str):
+        """
+        Save the index into sidecar file
+
+        :param file_path: The path to index file
+        """
+        nodes, props = len(self._node_offsets), len(self._prop_hashes)
+        with open(file_path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, INDEX_BOM, len(self._dtb), self.dtb_crc, nodes, props))
+            for name, _, _ in INDEX_TABLES:
+                data = getattr(self, '_' + name).tobytes()
+                f.write(data)
+                # keep tables 8 bytes aligned
+                f.write(bytes(-len(data) % 8))
+
+    @classmethod
+    def load(cls, file_path: str, dtb, verify: bool = True):
+        """
+        Load the index from sidecar file over memory mapping, the tables are not copied
+
+        :param file_path: The path to index file
+        :param dtb: The indexed DTB as bytes, bytearray, mmap or memoryview
+        :param verify: Compare crc32 of DTB with the value stored in index file
+        """
+        with open(file_path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(data) < INDEX_HEADER.size:
+                raise ValueError("Index file too small")
+            magic, version, bom, dtb_size, dtb_crc, nodes, props = INDEX_HEADER.unpack_from(data)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                raise ValueError("Not supported index file format")
+            if bom != INDEX_BOM:
+                raise ValueError("Index file created on platform with different byte order")
+            if dtb_size != len(dtb) or (verify and zlib.crc32(dtb) != dtb_crc):
+                raise ValueError("Index file doesn't match the DTB")
+            counts = {'n': nodes, 'n1': nodes + 1, 'p': props}
+            layout = []
+            pos = INDEX_HEADER.size
+            for name, typecode, count in INDEX_TABLES:
+                size = counts[count] * array(typecode).itemsize
+                layout.append((name, typecode, pos, size))
+                pos += size + (-size % 8)
+            if pos > len(data):
+                raise ValueError("Index file truncated")
+        except Exception:
+            data.close()
+            raise
+        with memoryview(data) as view:
+            tables = {name: view[pos:pos + size].cast(typecode) for name, typecode, pos, size in layout}
+        index = cls(dtb, tables, dtb_crc)
+        index._file = data
+        return index
+
+
+########################################################################################################################
+# Public Functions
+########################################################################################################################
+
+@profiler.timed('build_index')
+def build_index(dtb) -> DtbIndex:
+    """
+    Scan DTB structure block once and return its index
+
+    :param dtb: The DTB as bytes, bytearray, mmap or memoryview
+    """
+    blocks = _blocks(dtb)
+    off_struct, end_struct, off_strings, version = blocks
+    tables = {name: array(typecode) for name, typecode, _ in INDEX_TABLES}
+    node_offsets, node_parents, node_props = tables['node_offsets'], tables['node_parents'], tables['node_props']
+    node_hashes = []
+    node_prop_lists = []
+    names = {}
+    stack = []
+    pos = off_struct
+    while True:
+        if pos + 4 > end_struct:
+            raise ValueError("Structure block is not terminated")
+        tag = unpack_from('>I', dtb, pos)[0]
+        tag_pos = pos
+        pos += 4
+        if tag == DTB_BEGIN_NODE:
+            end = _find_nul(dtb, pos, end_struct)
+            if end < 0:
+                raise ValueError("Node name is not terminated")
+            name = bytes(dtb[pos:end])
+            if version < 16:
+                name = name[name.rfind(b'/') + 1:]
+            node_parents.append(stack[-1] if stack else -1)
+            stack.append(len(node_offsets))
+            node_offsets.append(tag_pos - off_struct)
+            node_hashes.append(_name_hash(name))
+            node_prop_lists.append([])
+            pos = off_struct + ((end + 1 - off_struct + 3) & ~3)
+        elif tag == DTB_END_NODE:
+            if not stack:
+                raise ValueError("Unbalanced END_NODE tag")
+            stack.pop()
+        elif tag == DTB_PROP:
+            if not stack:
+                raise ValueError("Property outside of node")
+            size, name_offset = unpack_from('>II', dtb, pos)
+            pos += 8
+            if version < 16 and size >= 8:
+                pos = off_struct + ((pos - off_struct + 7) & ~7)
+            name_hash = names.get(name_offset)
+            if name_hash is None:
+                name_pos = off_strings + name_offset
+                name_hash = _name_hash(bytes(dtb[name_pos:_find_nul(dtb, name_pos, len(dtb))]))
+                names[name_offset] = name_hash
+            node_prop_lists[stack[-1]].append((name_hash, name_offset, pos, size))
+            pos = off_struct + ((pos + size - off_struct + 3) & ~3)
+        elif tag == DTB_NOP:
+            continue
+        elif tag == DTB_END:
+            break
+        else:
+            raise ValueError("Unknown tag 0x{:08X}".format(tag))
+    if stack or not node_offsets:
+        raise ValueError("Invalid structure block nesting")
+
+    # the properties of every node sorted by name hash
+    for props in node_prop_lists:
+        node_props.append(len(tables['prop_hashes']))
+        for name_hash, name_offset, start, size in sorted(props):
+            tables['prop_hashes'].append(name_hash)
+            tables['prop_names'].append(name_offset)
+            tables['prop_starts'].append(start)
+            tables['prop_sizes'].append(size)
+    node_props.append(len(tables['prop_hashes']))
+    # the nodes sorted by (parent index, name hash)
+    keys = sorted(((parent & 0xFFFFFFFF) << 32 | name_hash, index)
+                  for index, (parent, name_hash) in enumerate(zip(node_parents, node_hashes)))
+    tables['node_keys'].extend(key for key, _ in keys)
+    tables['node_sorted'].extend(index for _, index in keys)
+    profiler.count('build_index.nodes', len(node_offsets))
+    return DtbIndex(dtb, tables, zlib.crc32(dtb))
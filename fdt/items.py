@@ -12,11 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from struct import pack, Struct
-from string import printable
+import os
+import sys
+from array import array
+from struct import pack, unpack, Struct
 
 from .header import Header, DTB_PROP, DTB_BEGIN_NODE, DTB_END_NODE
-from .misc import is_string, line_offset
+from .misc import is_string, is_printable, line_offset
 
 BIGENDIAN_WORD = Struct(">I")
 
@@ -31,25 +33,271 @@ def new_property(name: str, raw_value: bytes) -> object:
     :param name: Property name
     :param raw_value: Property raw data
     """
+    assert isinstance(name, str)
+    assert is_printable(name), "The value must contain just printable chars !"
+    return _new_property(name, raw_value)
+
+
+def _new_property(name: str, raw_value: bytes) -> object:
+    """
+    Instantiate property with raw value type without name validation (trusted path for parsers)
+
+    :param name: Property name, must be already validated
+    :param raw_value: Property raw data
+    """
     if is_string(raw_value):
-        obj = PropStrings(name)
-        # Extract strings from raw value
-        for st in raw_value.decode('ascii').split('\0'):
-            if st:
-                obj.append(st)
-        return obj
+        # Extract strings from raw value, is_string() already validated all chars
+        return PropStrings._new(name, raw_value[:-1].decode('ascii').split('\0'))
 
     elif len(raw_value) and len(raw_value) % 4 == 0:
-        obj = PropWords(name)
         # Extract words from raw value
-        obj.data = [BIGENDIAN_WORD.unpack(raw_value[i:i + 4])[0] for i in range(0, len(raw_value), 4)]
-        return obj
+        return PropWords._new(name, list(unpack('>{}I'.format(len(raw_value) // 4), raw_value)))
 
     elif len(raw_value):
-        return PropBytes(name, data=raw_value)
+        return PropBytes._new(name, bytearray(raw_value))
 
     else:
+        return Property._new(name)
+
+
+def _value_property(name: str, value) -> object:
+    """
+    Instantiate property with python value type (used by set_property methods)
+
+    :param name: Property name
+    :param value: Property value: None, int, str, list of int or str, bytes or bytearray
+    """
+    if value is None:
         return Property(name)
+    elif isinstance(value, int):
+        return PropWords(name, value)
+    elif isinstance(value, str):
+        return PropStrings(name, value)
+    elif isinstance(value, list) and isinstance(value[0], int):
+        return PropWords(name, *value)
+    elif isinstance(value, list) and isinstance(value[0], str):
+        return PropStrings(name, *value)
+    elif isinstance(value, (bytes, bytearray)):
+        return PropBytes(name, data=value)
+    else:
+        raise TypeError('Value type not supported')
+
+
+def _typed_property(name: str, value, prop_class=None) -> object:
+    """
+    Instantiate property of specified class (or class inferred from value) with validation of value only, the name
+    must be already validated (used by FDT.apply_properties)
+
+    :param name: Property name, must be already validated
+    :param value: Property value: None, int, str, list or tuple of int or str, bytes or bytearray
+    :param prop_class: The property class: Property, PropWords, PropStrings or PropBytes, None for inferred class
+    """
+    if prop_class is None:
+        item = value[0] if isinstance(value, (list, tuple)) and value else value
+        if value is None:
+            prop_class = Property
+        elif isinstance(item, int):
+            prop_class = PropWords
+        elif isinstance(item, str):
+            prop_class = PropStrings
+        elif isinstance(value, (bytes, bytearray)):
+            prop_class = PropBytes
+        else:
+            raise TypeError('Value type of "{}" not supported'.format(name))
+    if prop_class is PropWords:
+        words = [value] if isinstance(value, int) else list(value)
+        for word in words:
+            assert isinstance(word, int) and 0 <= word <= 0xFFFFFFFF, "Invalid word value {}".format(word)
+        return PropWords._new(name, words)
+    if prop_class is PropStrings:
+        items = [value] if isinstance(value, str) else list(value)
+        for item in items:
+            assert isinstance(item, str) and item and is_printable(item), "Invalid strings value {}".format(item)
+        return PropStrings._new(name, items)
+    if prop_class is PropBytes:
+        # bytearray(int) would create zeroed bytes of that size
+        assert not isinstance(value, int), "Invalid bytes value {}".format(value)
+        return PropBytes._new(name, bytearray(value))
+    if prop_class is Property:
+        assert value is None, "Property without value expected for \"{}\"".format(name)
+        return Property._new(name)
+    raise TypeError('Not supported property class: {}'.format(prop_class))
+
+
+class StringsTable:
+    """ DTB strings block builder with cached name offsets """
+
+    __slots__ = ('_text', '_offsets')
+
+    def __init__(self, strings: str = ''):
+        """
+        StringsTable constructor
+
+        :param strings: The initial strings block content
+        """
+        self._text = strings
+        self._offsets = {}
+
+    def __str__(self):
+        """ Get strings block content """
+        return self._text
+
+    def __len__(self):
+        """ Get strings block size """
+        return len(self._text)
+
+    def offset(self, name: str) -> int:
+        """
+        Get offset of name in strings block, not existing name is appended
+
+        :param name: Property name
+        """
+        strpos = self._offsets.get(name)
+        if strpos is None:
+            # the name can be also suffix of other name, so the block is searched once per name
+            strpos = self._text.find(name + '\0')
+            if strpos < 0:
+                strpos = len(self._text)
+                self._text += name + '\0'
+            self._offsets[name] = strpos
+        return strpos
+
+
+# The supported sizes of PropWords words in bits
+WORD_SIZES = (8, 16, 32, 64)
+# The array typecodes for words other than 32-bit
+WORD_TYPECODES = {8: 'B', 16: 'H', 64: 'Q'}
+
+
+def _join_chunks(chunks: list) -> bytes:
+    """ Join the blob chunks (see Node._to_dtb_chunks), the not loaded /incbin/ data are read without loading """
+    return b''.join([chunk if isinstance(chunk, bytes) else b''.join(chunk.iter_chunks()) for chunk in chunks])
+
+
+def _walk(node, shared: bool = False):
+    """
+    Iterate over node and all its sub-nodes in document order by explicit stack (without recursion).
+    Yield tuple (node, depth, enter), every node is yielded before (enter=True) and after (enter=False) its sub-nodes.
+
+    :param node: The start node, its depth is 0
+    :param shared: Yield the shared source of not materialized copy-on-write nodes (for read only traversal)
+    """
+    stack = [(node, 0, True)]
+    while stack:
+        node, depth, enter = stack.pop()
+        if shared and node._source is not None:
+            node = node._source
+        yield node, depth, enter
+        if enter:
+            stack.append((node, depth, False))
+            stack += [(sub_node, depth + 1, True) for sub_node in reversed(node._nodes)]
+
+
+class NameIndex:
+    """
+    Index of tree items by name: name -> {id(item): item}, the items are in order of insertion. The content of not
+    materialized copy-on-write nodes is not indexed, the items are looked up in the shared source and the paths to
+    them are materialized at first get of their name, every name is resolved only once.
+    """
+
+    __slots__ = ('_items', '_shared', '_resolved')
+
+    def __init__(self, root=None):
+        """
+        NameIndex constructor
+
+        :param root: The root node of indexed tree
+        """
+        self._items = {}
+        # the not materialized copy-on-write nodes: id(node) -> node
+        self._shared = {}
+        # the names resolved in all shared nodes, cleared when shared node is added from outside
+        self._resolved = set()
+        if root is not None:
+            self.add(root)
+
+    def get(self, name: str) -> list:
+        """
+        Return list of items with specified name
+
+        :param name: The item name
+        """
+        if self._shared and name not in self._resolved:
+            self._resolve(name)
+            self._resolved.add(name)
+        items = self._items.get(name)
+        return list(items.values()) if items else []
+
+    def _resolve(self, name: str):
+        """ Materialize the paths to items with name inside shared nodes, the materialized items are indexed """
+        for node in list(self._shared.values()):
+            if node._source is None:
+                continue
+            for path, is_prop in node._source._name_paths().get(name, ()):
+                item = node
+                for sub_name in path:
+                    item = item.get_subnode(sub_name)
+                if is_prop:
+                    item.get_property(name)
+
+    def materialize(self, node):
+        """
+        Index the content of materialized copy-on-write node (its sub-nodes stay shared)
+
+        :param node: The copy-on-write node
+        """
+        # the content of node which was not materialized by resolving a name doesn't contain that name, so the
+        # resolved names stay valid
+        if self._shared.pop(id(node), None) is not None:
+            for item in node._props + node._nodes:
+                self._add(item)
+
+    def _items_of(self, item) -> list:
+        """ Return the item, or the node with all its properties and sub-nodes except the shared content """
+        if not isinstance(item, Node):
+            return [item]
+        items = []
+        nodes = [item]
+        while nodes:
+            node = nodes.pop()
+            items.append(node)
+            if node._source is None:
+                items += node._props
+                nodes += reversed(node._nodes)
+        return items
+
+    def add(self, item):
+        """
+        Add item into index, the node is added with all its properties and sub-nodes
+
+        :param item: The node or property object
+        """
+        if self._add(item):
+            self._resolved.clear()
+
+    def _add(self, item) -> bool:
+        """ Add item into index and return True if any shared node was added """
+        shared = False
+        for obj in self._items_of(item):
+            self._items.setdefault(obj._name, {})[id(obj)] = obj
+            if isinstance(obj, Node) and obj._source is not None:
+                self._shared[id(obj)] = obj
+                shared = True
+        return shared
+
+    def remove(self, item):
+        """
+        Remove item from index, the node is removed with all its properties and sub-nodes
+
+        :param item: The node or property object
+        """
+        for obj in self._items_of(item):
+            self._shared.pop(id(obj), None)
+            entries = self._items.get(obj._name)
+            if entries is not None:
+                entries.pop(id(obj), None)
+                if not entries:
+                    del self._items[obj._name]
 
 
 ########################################################################################################################
@@ -58,6 +306,8 @@ def new_property(name: str, raw_value: bytes) -> object:
 
 class BaseItem:
 
+    __slots__ = ('_name', '_label', '_parent')
+
     @property
     def name(self):
         return self._name
@@ -87,11 +337,25 @@ class BaseItem:
         :param name: Item name
         """
         assert isinstance(name, str)
-        assert all(c in printable for c in name), "The value must contain just printable chars !"
+        assert is_printable(name), "The value must contain just printable chars !"
         self._name = name
         self._label = None
         self._parent = None
 
+    @classmethod
+    def _new(cls, name: str, label: str = None):
+        """
+        Create item without arguments validation (trusted path used by parsers)
+
+        :param name: Item name, must be already validated
+        :param label: Item label, must be already validated
+        """
+        obj = cls.__new__(cls)
+        obj._name = name
+        obj._label = label
+        obj._parent = None
+        return obj
+
     def __str__(self):
         """ String representation """
         return "{}".format(self.name)
@@ -103,8 +367,20 @@ class BaseItem:
         :param value: The name in string format
         """
         assert isinstance(value, str)
-        assert all(c in printable for c in value), "The value must contain just printable chars !"
+        assert is_printable(value), "The value must contain just printable chars !"
+        index = self._get_index()
+        if index is not None:
+            index.remove(self)
         self._name = value
+        if index is not None:
+            index.add(self)
+
+    def _get_index(self):
+        """ Return the name index of tree which contains this item or None if the tree is not indexed """
+        root = self
+        while root._parent is not None:
+            root = root._parent
+        return root._index if isinstance(root, Node) else None
 
     def set_label(self, value: str):
         """ 
@@ -113,7 +389,7 @@ class BaseItem:
         :param value: The label in string format
         """
         assert isinstance(value, str)
-        assert all(c in printable for c in value), "The value must contain just printable chars !"
+        assert is_printable(value), "The value must contain just printable chars !"
         self._label = value
 
 
@@ -139,6 +415,8 @@ class BaseItem:
 
 class Property(BaseItem):
 
+    __slots__ = ()
+
     def __getitem__(self, value):
         """ Returns No Items """
         return None
@@ -168,17 +446,40 @@ class Property(BaseItem):
         :param pos:
         :param version:
         """
-        strpos = strings.find(self.name + '\0')
-        if strpos < 0:
-            strpos = len(strings)
-            strings += self.name + '\0'
+        strings = StringsTable(strings)
+        blob, pos = self._to_dtb(strings, pos, version)
+        return blob, str(strings), pos
+
+    def _to_dtb(self, strings: StringsTable, pos: int, version: int):
+        """
+        Get binary blob representation and the position after it
+
+        :param strings: The strings table
+        :param pos: The position of property in blob
+        :param version: The DTB version
+        """
         pos += 12
-        return pack('>III', DTB_PROP, 0, strpos), strings, pos
+        return pack('>III', DTB_PROP, 0, strings.offset(self.name)), pos
+
+    def _to_dtb_chunks(self, strings: StringsTable, pos: int, version: int, chunks: list):
+        """
+        Append blob representation into chunks and return the position after it
+
+        :param strings: The strings table
+        :param pos: The position of property in blob
+        :param version: The DTB version
+        :param chunks: The list of blob chunks
+        """
+        blob, pos = self._to_dtb(strings, pos, version)
+        chunks.append(blob)
+        return pos
 
 
 class PropStrings(Property):
     """Property with strings as value"""
 
+    __slots__ = ('data',)
+
     @property
     def value(self):
         return self.data[0] if self.data else None
@@ -195,6 +496,18 @@ class PropStrings(Property):
         for arg in args:
             self.append(arg)
 
+    @classmethod
+    def _new(cls, name: str, data: list = None):
+        """
+        Create PropStrings without arguments validation (trusted path used by parsers)
+
+        :param name: Property name
+        :param data: List of already validated strings
+        """
+        obj = super()._new(name)
+        obj.data = [] if data is None else data
+        return obj
+
     def __str__(self):
         """ String representation """
         return "{} = {}".format(self.name, self.data)
@@ -223,7 +536,7 @@ class PropStrings(Property):
     def append(self, value: str):
         assert isinstance(value, str)
         assert len(value) > 0, "Invalid strings value"
-        assert all(c in printable or c in ('\r', '\n') for c in value), "Invalid chars in strings value"
+        assert is_printable(value), "Invalid chars in strings value"
         self.data.append(value)
 
     def pop(self, index: int):
@@ -246,51 +559,68 @@ class PropStrings(Property):
         result += '";\n'
         return result
 
-    def to_dtb(self, strings: str, pos: int = 0, version: int = Header.MAX_VERSION):
+    def _to_dtb(self, strings: StringsTable, pos: int, version: int):
         """
-        Get blob representation
+        Get blob representation and the position after it
 
-        :param strings:
-        :param pos:
-        :param version:
+        :param strings: The strings table
+        :param pos: The position of property in blob
+        :param version: The DTB version
         """
-        blob = pack('')
-        for chars in self.data:
-            blob += chars.encode('ascii') + pack('b', 0)
+        blob = ''.join([chars + '\0' for chars in self.data]).encode('ascii')
         blob_len = len(blob)
         if version < 16 and (pos + 12) % 8 != 0:
-            blob = pack('b', 0) * (8 - ((pos + 12) % 8)) + blob
+            blob = bytes(8 - ((pos + 12) % 8)) + blob
         if blob_len % 4:
-            blob += pack('b', 0) * (4 - (blob_len % 4))
-        strpos = strings.find(self.name + '\0')
-        if strpos < 0:
-            strpos = len(strings)
-            strings += self.name + '\0'
-        blob = pack('>III', DTB_PROP, blob_len, strpos) + blob
+            blob += bytes(4 - (blob_len % 4))
+        blob = pack('>III', DTB_PROP, blob_len, strings.offset(self.name)) + blob
         pos += len(blob)
-        return blob, strings, pos
+        return blob, pos
 
 
 class PropWords(Property):
-    """Property with words as value"""
+    """
+    Property with words as value. The 32-bit words are stored in list, the words of other size (/bits/ 8, 16 or 64)
+    in array of matching type.
+    """
+
+    __slots__ = ('data', 'word_size')
 
     @property
     def value(self):
         return self.data[0] if self.data else None
 
-    def __init__(self, name, *args):
+    def __init__(self, name, *args, word_size: int = 32):
         """
         PropWords constructor
 
         :param name: Property name
         :param args: word1, word2, ...
+        :param word_size: Word size in bits: 8, 16, 32 or 64
         """
+        assert word_size in WORD_SIZES, "Invalid word size {}, use: 8, 16, 32 or 64".format(word_size)
         super().__init__(name)
-        self.data = []
-        self.word_size = 32
+        self.data = [] if word_size == 32 else array(WORD_TYPECODES[word_size])
+        self.word_size = word_size
         for val in args:
             self.append(val)
 
+    @classmethod
+    def _new(cls, name: str, data: list = None, word_size: int = 32):
+        """
+        Create PropWords without arguments validation (trusted path used by parsers)
+
+        :param name: Property name
+        :param data: List (or array for word size other than 32) of already validated words
+        :param word_size: Word size in bits
+        """
+        obj = super()._new(name)
+        if data is None:
+            data = [] if word_size == 32 else array(WORD_TYPECODES[word_size])
+        obj.data = data
+        obj.word_size = word_size
+        return obj
+
     def __str__(self):
         """ String representation """
         return "{} = {}".format(self.name, self.data)
@@ -307,7 +637,7 @@ class PropWords(Property):
         """ Check PropWords object equality  """
         if not isinstance(prop, PropWords):
             return False
-        if self.name != prop.name:
+        if self.name != prop.name or self.word_size != prop.word_size:
             return False
         if len(self) != len(prop):
             return False
@@ -317,7 +647,7 @@ class PropWords(Property):
         return True
 
     def copy(self):
-        return PropWords(self.name, *self.data)
+        return PropWords._new(self.name, self.data[:], self.word_size)
 
     def append(self, value):
         assert isinstance(value, int), "Invalid object type"
@@ -330,7 +660,7 @@ class PropWords(Property):
         return self.data.pop(index)
 
     def clear(self):
-        self.data.clear()
+        del self.data[:]
 
     def to_dts(self, tabsize: int = 4, depth: int = 0):
         """
@@ -340,32 +670,39 @@ class PropWords(Property):
         :param depth: Start depth for line
         """
         result  = line_offset(tabsize, depth, self.name)
-        result += ' = <'
+        result += ' = <' if self.word_size == 32 else ' = /bits/ {} <'.format(self.word_size)
         result += ' '.join(["0x{:X}".format(word) for word in self.data])
         result += ">;\n"
         return result
 
-    def to_dtb(self, strings: str, pos: int = 0, version: int = Header.MAX_VERSION):
+    def _to_dtb(self, strings: StringsTable, pos: int, version: int):
         """
-        Get blob representation
+        Get blob representation and the position after it
 
-        :param strings:
-        :param pos:
-        :param version:
+        :param strings: The strings table
+        :param pos: The position of property in blob
+        :param version: The DTB version
         """
-        strpos = strings.find(self.name + '\0')
-        if strpos < 0:
-            strpos = len(strings)
-            strings += self.name + '\0'
-        blob = pack('>III', DTB_PROP, len(self.data) * 4, strpos)
-        blob += bytes().join([BIGENDIAN_WORD.pack(word) for word in self.data])
+        count = len(self.data)
+        if self.word_size == 32:
+            blob = pack('>III{}I'.format(count), DTB_PROP, count * 4, strings.offset(self.name), *self.data)
+        else:
+            # the words are encoded in bulk
+            words = array(WORD_TYPECODES[self.word_size], self.data)
+            if sys.byteorder == 'little':
+                words.byteswap()
+            blob = pack('>III', DTB_PROP, count * words.itemsize, strings.offset(self.name)) + words.tobytes()
+            if len(blob) % 4:
+                blob += bytes(4 - (len(blob) % 4))
         pos += len(blob)
-        return blob, strings, pos
+        return blob, pos
 
 
 class PropBytes(Property):
     """Property with bytes as value"""
 
+    __slots__ = ('data',)
+
     def __init__(self, name, *args, data=None):
         """ 
         PropBytes constructor
@@ -380,6 +717,18 @@ class PropBytes(Property):
             assert isinstance(data, (list, bytes, bytearray))
             self.data += bytearray(data)
 
+    @classmethod
+    def _new(cls, name: str, data: bytearray = None):
+        """
+        Create PropBytes without arguments validation (trusted path used by parsers)
+
+        :param name: Property name
+        :param data: Data as bytearray
+        """
+        obj = super()._new(name)
+        obj.data = bytearray() if data is None else data
+        return obj
+
     def __str__(self):
         """ String representation """
         return "{} = {}".format(self.name, self.data)
@@ -434,30 +783,38 @@ class PropBytes(Property):
         result += '];\n'
         return result
 
-    def to_dtb(self, strings: str, pos: int = 0, version: int = Header.MAX_VERSION):
+    def _to_dtb(self, strings: StringsTable, pos: int, version: int):
         """
-        Get blob representation
+        Get blob representation and the position after it
 
-        :param strings:
-        :param pos:
-        :param version:
+        :param strings: The strings table
+        :param pos: The position of property in blob
+        :param version: The DTB version
         """
-        strpos = strings.find(self.name + '\0')
-        if strpos < 0:
-            strpos = len(strings)
-            strings += self.name + '\0'
-        blob  = pack('>III', DTB_PROP, len(self.data), strpos)
+        blob  = pack('>III', DTB_PROP, len(self.data), strings.offset(self.name))
         blob += bytes(self.data)
         if len(blob) % 4:
-            blob += bytes([0] * (4 - (len(blob) % 4)))
+            blob += bytes(4 - (len(blob) % 4))
         pos += len(blob)
-        return blob, strings, pos
+        return blob, pos
 
 
 class PropIncBin(PropBytes):
-    """Property with bytes as value"""
+    """
+    Property with bytes as value included from file.
 
-    def __init__(self, name, data=None, file_name=None, rpath=None):
+    If created with file_path (and without data), only the path, offset and size are kept and the file content is
+    loaded at first access of data. The DTB writer (FDT.write_dtb) copies the not loaded content straight from file.
+    """
+
+    __slots__ = ('file_name', 'relative_path', 'file_path', 'offset', '_size', '_file_size')
+
+    # the data slot of PropBytes, used as storage for lazy loaded data
+    _data_slot = PropBytes.data
+
+    COPY_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, name, data=None, file_name=None, rpath=None, file_path=None, offset=0, size=None):
         """
         PropIncBin constructor
 
@@ -465,10 +822,58 @@ class PropIncBin(PropBytes):
         :param data: Data as list, bytes or bytearray
         :param file_name: File name
         :param rpath: Relative path
+        :param file_path: The path to included file, used for lazy loading if data are not specified
+        :param offset: The offset of data in included file
+        :param size: The size of data in included file, None for the rest of file
         """
-        super().__init__(name, data=data)
+        assert offset >= 0, "The offset must be >= 0"
+        assert size is None or size >= 0, "The size must be >= 0"
         self.file_name = file_name
         self.relative_path = rpath
+        self.file_path = file_path
+        self.offset = offset
+        # the size specified in source (None for the rest of file), the size of rest of file is cached separately
+        self._size = size
+        self._file_size = None
+        if data is not None or file_path is None:
+            super().__init__(name, data=data)
+        else:
+            Property.__init__(self, name)
+
+    @property
+    def data(self):
+        """ The included data, loaded from file at first access """
+        try:
+            return self._data_slot
+        except AttributeError:
+            with open(self.file_path, 'rb') as f:
+                f.seek(self.offset)
+                data = bytearray(f.read() if self._size is None else f.read(self._size))
+            self._data_slot = data
+            return data
+
+    @data.setter
+    def data(self, value):
+        self._data_slot = value
+
+    @property
+    def loaded(self) -> bool:
+        """ True if the data are in memory """
+        try:
+            self._data_slot
+        except AttributeError:
+            return False
+        return True
+
+    def __len__(self):
+        """ Get bytes count (without loading data) """
+        if self.loaded:
+            return len(self._data_slot)
+        if self._size is not None:
+            return self._size
+        if self._file_size is None:
+            self._file_size = max(os.path.getsize(self.file_path) - self.offset, 0)
+        return self._file_size
 
     def __eq__(self, prop):
         """ Check PropIncBin object equality  """
@@ -480,13 +885,39 @@ class PropIncBin(PropBytes):
             return False
         if self.relative_path != prop.relative_path:
             return False
+        if not (self.loaded or prop.loaded) and (self.file_path, self.offset, len(self)) == \
+                (prop.file_path, prop.offset, len(prop)):
+            return True
         if self.data != prop.data:
             return False
         return True
 
     def copy(self):
-        """ Create a copy of object """
-        return PropIncBin(self.name, self.data, self.file_name, self.relative_path)
+        """ Create a copy of object, not loaded data stay not loaded """
+        if self.loaded:
+            return PropIncBin(self.name, self.data, self.file_name, self.relative_path)
+        return PropIncBin(self.name, None, self.file_name, self.relative_path, self.file_path, self.offset, self._size)
+
+    def iter_chunks(self, chunk_size: int = COPY_CHUNK_SIZE):
+        """
+        Iterate over data in chunks, not loaded data are read from file without loading them whole into memory
+
+        :param chunk_size: The max size of chunk in bytes
+        """
+        if self.loaded:
+            data = self._data_slot
+            for pos in range(0, len(data), chunk_size):
+                yield bytes(data[pos:pos + chunk_size])
+            return
+        size = len(self)
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.offset)
+            while size > 0:
+                chunk = f.read(min(size, chunk_size))
+                if not chunk:
+                    raise Exception("Unexpected end of file: {}".format(self.file_path))
+                size -= len(chunk)
+                yield chunk
 
     def to_dts(self, tabsize: int = 4, depth: int = 0):
         """
@@ -499,9 +930,30 @@ class PropIncBin(PropBytes):
         if self.relative_path is not None:
             file_path = "{}/{}".format(self.relative_path, self.file_name)
         result  = line_offset(tabsize, depth, self.name)
-        result += " = /incbin/(\"{}\");\n".format(file_path)
+        if self.offset or self._size is not None:
+            result += " = /incbin/(\"{}\", {}, {});\n".format(file_path, self.offset, len(self))
+        else:
+            result += " = /incbin/(\"{}\");\n".format(file_path)
         return result
 
+    def _to_dtb_chunks(self, strings: StringsTable, pos: int, version: int, chunks: list):
+        """
+        Append blob representation into chunks, not loaded data are appended as this object
+
+        :param strings: The strings table
+        :param pos: The position of property in blob
+        :param version: The DTB version
+        :param chunks: The list of blob chunks
+        """
+        if self.loaded:
+            return super()._to_dtb_chunks(strings, pos, version, chunks)
+        size = len(self)
+        chunks.append(pack('>III', DTB_PROP, size, strings.offset(self.name)))
+        chunks.append(self)
+        if size % 4:
+            chunks.append(bytes(4 - (size % 4)))
+        return pos + 12 + ((size + 3) & ~3)
+
 
 ########################################################################################################################
 # Node Class
@@ -510,6 +962,11 @@ class PropIncBin(PropBytes):
 class Node(BaseItem):
     """Node representation"""
 
+    __slots__ = ('_props', '_nodes', '_index')
+
+    # the shared content of copy-on-write node (see CowNode in frozen module)
+    _source = None
+
     @property
     def props(self):
         return self._props
@@ -532,9 +989,24 @@ class Node(BaseItem):
         super().__init__(name)
         self._props = []
         self._nodes = []
+        self._index = None
         for item in args:
             self.append(item)
 
+    @classmethod
+    def _new(cls, name: str, label: str = None):
+        """
+        Create Node without arguments validation (trusted path used by parsers)
+
+        :param name: Node name, must be already validated
+        :param label: Node label, must be already validated
+        """
+        obj = super()._new(name, label)
+        obj._props = []
+        obj._nodes = []
+        obj._index = None
+        return obj
+
     def __str__(self):
         """ String representation """
         return "< {}: {} props, {} nodes >".format(self.name, len(self.props), len(self.nodes))
@@ -543,25 +1015,55 @@ class Node(BaseItem):
         """ Check node equality """
         if not isinstance(node, Node):
             return False
-        if self.name != node.name or \
-           len(self.props) != len(node.props) or \
-           len(self.nodes) != len(node.nodes):
-            return False
-        for p in self.props:
-            if p not in node.props:
-                return False
-        for n in self.nodes:
-            if n not in node.nodes:
+        # the sub-nodes are compared by explicit stack, so the depth is not limited by recursion limit
+        stack = [(self, node)]
+        while stack:
+            node_a, node_b = stack.pop()
+            # the not materialized copy-on-write nodes are compared by their shared content
+            if node_a._source is not None:
+                node_a = node_a._source
+            if node_b._source is not None:
+                node_b = node_b._source
+            if node_a is node_b:
+                continue
+            if node_a.name != node_b.name or \
+               len(node_a.props) != len(node_b.props) or \
+               len(node_a.nodes) != len(node_b.nodes):
                 return False
+            # the names are unique in node, so the items can be paired by name
+            props = {p.name: p for p in node_b.props}
+            for p in node_a.props:
+                if p.name not in props or p != props[p.name]:
+                    return False
+            nodes = {n.name: n for n in node_b.nodes}
+            for n in node_a.nodes:
+                if n.name not in nodes:
+                    return False
+                stack.append((n, nodes[n.name]))
         return True
 
-    def copy(self):
-        """ Create a copy of Node object """
-        node = Node(self.name)
-        for p in self.props:
-            node.append(p.copy())
-        for n in self.nodes:
-            node.append(n.copy())
+    def copy(self, cow: bool = False):
+        """
+        Create a copy of Node object
+
+        :param cow: If True, create copy-on-write copy of frozen node (see FDT.freeze) or not yet accessed
+                    copy-on-write node in O(1): the copy shares content with the frozen node and its properties and
+                    sub-nodes are materialized at first access, so only the accessed part of tree occupies memory.
+        """
+        if cow:
+            from .frozen import CowNode
+            return CowNode.share(self)
+        copies = []
+        for node, _, enter in _walk(self, True):
+            if not enter:
+                node = copies.pop()
+                continue
+            new_node = Node._new(node.name)
+            for p in node.props:
+                new_node._append(p.copy())
+            if copies:
+                copies[-1]._append(new_node)
+            copies.append(new_node)
         return node
 
     def get_property(self, name):
@@ -582,20 +1084,7 @@ class Node(BaseItem):
         :param name: Property name
         :param value: Property value
         """
-        if value is None:
-            new_prop = Property(name)
-        elif isinstance(value, int):
-            new_prop = PropWords(name, value)
-        elif isinstance(value, str):
-            new_prop = PropStrings(name, value)
-        elif isinstance(value, list) and isinstance(value[0], int):
-            new_prop = PropWords(name, *value)
-        elif isinstance(value, list) and isinstance(value[0], str):
-            new_prop = PropStrings(name, *value)
-        elif isinstance(value, (bytes, bytearray)):
-            new_prop = PropBytes(name, data=value)
-        else:
-            raise TypeError('Value type not supported')
+        new_prop = _value_property(name, value)
         new_prop.set_parent(self)
         old_prop = self.get_property(name)
         if old_prop is None:
@@ -603,6 +1092,8 @@ class Node(BaseItem):
         else:
             index = self.props.index(old_prop)
             self.props[index] = new_prop
+            old_prop._parent = None
+        self._update_index(old_prop, new_prop)
 
     def get_subnode(self, name: str):
         """ 
@@ -640,6 +1131,8 @@ class Node(BaseItem):
         item = self.get_property(name)
         if item is not None:
             self.props.remove(item)
+            self._update_index(item, None)
+            item._parent = None
 
     def remove_subnode(self, name: str):
         """ 
@@ -650,6 +1143,8 @@ class Node(BaseItem):
         item = self.get_subnode(name)
         if item is not None:
             self.nodes.remove(item)
+            self._update_index(item, None)
+            item._parent = None
 
     def append(self, item):
         """ 
@@ -673,6 +1168,45 @@ class Node(BaseItem):
             item.set_parent(self)
             self.nodes.append(item)
 
+        self._update_index(None, item)
+
+    def _update_index(self, old_item, new_item):
+        """
+        Update the name index of tree (if the tree is indexed)
+
+        :param old_item: The removed item or None
+        :param new_item: The added item or None
+        """
+        index = self._get_index()
+        if index is not None:
+            if old_item is not None:
+                index.remove(old_item)
+            if new_item is not None:
+                index.add(new_item)
+
+    def _append(self, item):
+        """
+        Append node or property without validation (trusted path used by parsers). The names uniqueness should be
+        checked by _check_names() once the node is complete.
+
+        :param item: The node or property object
+        """
+        item._parent = self
+        if isinstance(item, Node):
+            self._nodes.append(item)
+        else:
+            self._props.append(item)
+
+    def _check_names(self):
+        """ Check that the names of properties and sub-nodes are unique, raise Exception if not """
+        for items, kind in ((self._props, 'property'), (self._nodes, 'node')):
+            if len(items) > 1 and len(set(item.name for item in items)) != len(items):
+                names = set()
+                for item in items:
+                    if item.name in names:
+                        raise Exception("{}: \"{}\" {} already exists".format(self, item.name, kind))
+                    names.add(item.name)
+
     def merge(self, node_obj, replace: bool = True):
         """ 
         Merge two nodes
@@ -682,39 +1216,29 @@ class Node(BaseItem):
         """
         assert isinstance(node_obj, Node), "Invalid object type"
 
-        def get_property_index(name):
-            for i, p in enumerate(self.props):
-                if p.name == name:
-                    return i
-            return None
-
-        def get_subnode_index(name):
-            for i, n in enumerate(self.nodes):
-                if n.name == name:
-                    return i
-            return None
-
-        for prop in node_obj.props:
-            index = get_property_index(prop.name)
-            if index is None:
-                self.append(prop.copy())
-            elif prop in self._props:
-                continue
-            elif replace:
-                new_prop = prop.copy()
-                new_prop.set_parent(self)
-                self._props[index] = new_prop
-            else:
-                pass
-
-        for sub_node in node_obj.nodes:
-            index = get_subnode_index(sub_node.name)
-            if index is None:
-                self.append(sub_node.copy())
-            elif sub_node in self._nodes:
-                continue
-            else:
-                self._nodes[index].merge(sub_node, replace)
+        # the sub-nodes are merged by explicit stack, so the depth is not limited by recursion limit
+        stack = [(self, node_obj)]
+        while stack:
+            dst_node, src_node = stack.pop()
+            props = {p.name: i for i, p in enumerate(dst_node.props)}
+            for prop in src_node.props:
+                index = props.get(prop.name)
+                if index is None:
+                    dst_node.append(prop.copy())
+                elif replace and prop != dst_node.props[index]:
+                    new_prop = prop.copy()
+                    new_prop.set_parent(dst_node)
+                    old_prop = dst_node.props[index]
+                    dst_node.props[index] = new_prop
+                    old_prop._parent = None
+                    dst_node._update_index(old_prop, new_prop)
+
+            nodes = {n.name: n for n in dst_node.nodes}
+            for sub_node in src_node.nodes:
+                if sub_node.name not in nodes:
+                    dst_node.append(sub_node.copy())
+                else:
+                    stack.append((nodes[sub_node.name], sub_node))
 
     def to_dts(self, tabsize: int = 4, depth: int = 0) -> str:
         """ 
@@ -723,19 +1247,18 @@ class Node(BaseItem):
         :param tabsize: Tabulator size in count of spaces
         :param depth: Start depth for line
         """
-        if self._label is not None:
-            dts  = line_offset(tabsize, depth, self._label + ': ' + self.name + ' {\n')
-        else:
-            dts  = line_offset(tabsize, depth, self.name + ' {\n')
-        # phantom properties which maintain reference state info
-        # have names ending with _with_references
-        # don't write those out to dts file
-        dts += ''.join(
-            prop.to_dts(tabsize, depth + 1) 
-            for prop in self._props if prop.name.endswith('_with_references') is False)
-        dts += ''.join(node.to_dts(tabsize, depth + 1) for node in self._nodes)
-        dts += line_offset(tabsize, depth, "};\n")
-        return dts
+        dts = []
+        for node, node_depth, enter in _walk(self, True):
+            node_depth += depth
+            if not enter:
+                dts.append(line_offset(tabsize, node_depth, "};\n"))
+                continue
+            if node._label is not None:
+                dts.append(line_offset(tabsize, node_depth, node._label + ': ' + node.name + ' {\n'))
+            else:
+                dts.append(line_offset(tabsize, node_depth, node.name + ' {\n'))
+            dts += [prop.to_dts(tabsize, node_depth + 1) for prop in node._props]
+        return ''.join(dts)
 
     def to_dtb(self, strings: str, pos: int = 0, version: int = Header.MAX_VERSION) -> tuple:
         """ 
@@ -745,23 +1268,37 @@ class Node(BaseItem):
         :param pos:
         :param version:
         """
-        if self.name == '/':
-            blob = pack('>II', DTB_BEGIN_NODE, 0)
-        else:
-            blob = pack('>I', DTB_BEGIN_NODE)
-            blob += self.name.encode('ascii') + b'\0'
-        if len(blob) % 4:
-            blob += pack('b', 0) * (4 - (len(blob) % 4))
-        pos += len(blob)
-        for prop in self._props:
-            # phantom property too maintain reference state should
-            # not write out to dtb file
-            if prop.name.endswith('_with_references') is False:
-                (data, strings, pos) = prop.to_dtb(strings, pos, version)
-                blob += data
-        for node in self._nodes:
-            (data, strings, pos) = node.to_dtb(strings, pos, version)
-            blob += data
-        pos += 4
-        blob += pack('>I', DTB_END_NODE)
-        return blob, strings, pos
+        strings = StringsTable(strings)
+        chunks = []
+        pos = self._to_dtb_chunks(strings, pos, version, chunks)
+        blob = _join_chunks(chunks)
+        return blob, str(strings), pos
+
+    def _to_dtb_chunks(self, strings: StringsTable, pos: int, version: int, chunks: list):
+        """
+        Append NODE blob representation into chunks and return the position after it, the not loaded
+        PropIncBin data are appended as PropIncBin object
+
+        :param strings: The strings table
+        :param pos: The position of node in blob
+        :param version: The DTB version
+        :param chunks: The list of blob chunks
+        """
+        end_node = pack('>I', DTB_END_NODE)
+        for node, _, enter in _walk(self, True):
+            if not enter:
+                pos += 4
+                chunks.append(end_node)
+                continue
+            if node.name == '/':
+                blob = pack('>II', DTB_BEGIN_NODE, 0)
+            else:
+                blob = pack('>I', DTB_BEGIN_NODE)
+                blob += node.name.encode('ascii') + b'\0'
+            if len(blob) % 4:
+                blob += bytes(4 - (len(blob) % 4))
+            pos += len(blob)
+            chunks.append(blob)
+            for prop in node._props:
+                pos = prop._to_dtb_chunks(strings, pos, version, chunks)
+        return pos
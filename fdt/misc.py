@@ -16,31 +16,31 @@ import re
 from string import printable
 
 
+# Printable chars accepted in item names and string values
+PRINTABLE_CHARS = frozenset(printable)
+# Bytes accepted in string property raw value (printable chars without CR and LF, plus string terminator)
+STRING_BYTES = bytes(c for c in printable.encode() if c not in (ord('\r'), ord('\n'))) + b'\0'
+
+
+def is_printable(text):
+    """ Check if text contains just printable chars """
+    return PRINTABLE_CHARS.issuperset(text)
+
+
 def is_string(data):
     """ Check property string validity """
     if not len(data):
         return None
-    if data[-1] != 0:
+    if data[-1] != 0 or data[0] == 0 or b'\0\0' in data:
+        return None
+    if data.translate(None, STRING_BYTES):
         return None
-    pos = 0
-    while pos < len(data):
-        posi = pos
-        while pos < len(data) and \
-              data[pos] != 0 and \
-              data[pos] in printable.encode() and \
-              data[pos] not in (ord('\r'), ord('\n')):
-            pos += 1
-        if data[pos] != 0 or pos == posi:
-            return None
-        pos += 1
     return True
 
 
 def extract_string(data, offset=0):
     """ Extract string """
-    str_end = offset
-    while data[str_end] != 0:
-        str_end += 1
+    str_end = data.index(b'\0', offset)
     return data[offset:str_end].decode("ascii")
 
 
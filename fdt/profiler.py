@@ -0,0 +1,143 @@
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from time import perf_counter
+from functools import wraps
+
+
+########################################################################################################################
+# Helper Classes
+########################################################################################################################
+
+class _NullStage:
+    """ Stage context used when profiler is disabled, does nothing """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class _Stage:
+    """ Stage context measuring the time spent inside it """
+
+    __slots__ = ('_record', '_start')
+
+    def __init__(self, record):
+        self._record = record
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._record[0] += 1
+        self._record[1] += perf_counter() - self._start
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+########################################################################################################################
+# Profiler Class
+########################################################################################################################
+
+class Profiler:
+    """ Registry of stage timers and counters, the stages report into it only when enabled """
+
+    def __init__(self):
+        self.enabled = False
+        # stage name -> [calls, total time in seconds]
+        self.stages = {}
+        # counter name -> value
+        self.counters = {}
+
+    def enable(self):
+        """ Start collecting of stage times and counters """
+        self.enabled = True
+
+    def disable(self):
+        """ Stop collecting of stage times and counters """
+        self.enabled = False
+
+    def reset(self):
+        """ Clear collected data """
+        self.stages.clear()
+        self.counters.clear()
+
+    def stage(self, name: str):
+        """
+        Return context manager measuring the time of stage. Usage:
+
+            with profiler.stage('parse_dts.strip_comments'):
+                text = strip_comments(text)
+
+        :param name: The stage name, the sub-stages use dot notation: <stage>.<sub-stage>
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        record = self.stages.get(name)
+        if record is None:
+            record = self.stages[name] = [0, 0.0]
+        return _Stage(record)
+
+    def timed(self, name: str):
+        """
+        Return decorator measuring the time of decorated function as stage
+
+        :param name: The stage name
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name: str, value: int = 1):
+        """
+        Increment counter
+
+        :param name: The counter name
+        :param value: The increment
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> str:
+        """ Return collected stage times and counters as table in human readable format """
+        lines = [" {:<36} {:>8} {:>12} {:>12}".format('Stage', 'Calls', 'Total [ms]', 'Avg [ms]')]
+        # the stages are in order of the first call, so the parent stage is always before its sub-stages
+        for name, (calls, total) in self.stages.items():
+            depth = name.count('.')
+            title = '  ' * depth + name.rsplit('.', 1)[-1]
+            lines.append(" {:<36} {:>8} {:>12.3f} {:>12.3f}".format(title, calls, total * 1000, total * 1000 / calls))
+        if self.counters:
+            lines.append('')
+            lines.append(" {:<36} {:>8}".format('Counter', 'Value'))
+            for name, value in self.counters.items():
+                lines.append(" {:<36} {:>8}".format(name, value))
+        return '\n'.join(lines) + '\n'
+
+
+# The profiler instance used by this module
+profiler = Profiler()
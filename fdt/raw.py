@@ -0,0 +1,339 @@
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offset based low-level API over raw DTB (libfdt style).
+
+The functions work directly over the DTB in bytes, bytearray, mmap or memoryview without creating the object tree.
+The node is addressed by its offset (the offset of BEGIN_NODE tag relative to the structure block, the root node
+has offset 0), the property values are returned as memoryview into the source buffer. Usage:
+
+    from fdt import raw
+
+    node = raw.path_offset(data, '/soc/aips-bus@30000000')
+    reg = raw.getprop(data, node, 'reg')
+    child = raw.first_subnode(data, node)
+    while child >= 0:
+        print(raw.get_name(data, child))
+        child = raw.next_subnode(data, child)
+
+The lookup functions return -1 if the node is not found, the invalid DTB or node offset raises ValueError.
+"""
+
+from struct import unpack_from
+
+from .header import Header, DTB_BEGIN_NODE, DTB_END_NODE, DTB_PROP, DTB_NOP, DTB_END
+from .check import _find_nul
+
+
+########################################################################################################################
+# Helper Functions
+########################################################################################################################
+
+def _blocks(fdt) -> tuple:
+    """ Return (offset of structure block, end of structure block, offset of strings block, version) """
+    if len(fdt) < Header.MIN_SIZE:
+        raise ValueError('Data size too small !')
+    magic, total_size, off_struct, off_strings, _, version, _ = unpack_from('>7I', fdt)
+    if magic != Header.MAGIC_NUMBER:
+        raise ValueError('Invalid Magic Number')
+    end_struct = off_struct + unpack_from('>I', fdt, 36)[0] if version >= 17 else min(total_size, len(fdt))
+    return off_struct, end_struct, off_strings, version
+
+
+def _next_tag(fdt, blocks: tuple, offset: int) -> tuple:
+    """ Return (tag, offset of next tag) for the tag at offset """
+    off_struct, end_struct, _, version = blocks
+    pos = off_struct + offset
+    if offset < 0 or offset % 4 or pos + 4 > end_struct:
+        raise ValueError("Invalid offset {}".format(offset))
+    tag = unpack_from('>I', fdt, pos)[0]
+    pos += 4
+    if tag == DTB_BEGIN_NODE:
+        end = _find_nul(fdt, pos, end_struct)
+        if end < 0:
+            raise ValueError("Node name at offset {} is not terminated".format(offset))
+        pos = end + 1
+    elif tag == DTB_PROP:
+        if pos + 8 > end_struct:
+            raise ValueError("Property at offset {} is truncated".format(offset))
+        size = unpack_from('>I', fdt, pos)[0]
+        pos += 8
+        if version < 16 and size >= 8:
+            pos = off_struct + ((pos - off_struct + 7) & ~7)
+        pos += size
+        if pos > end_struct:
+            raise ValueError("Property at offset {} is truncated".format(offset))
+    elif tag not in (DTB_END_NODE, DTB_NOP, DTB_END):
+        raise ValueError("Unknown tag 0x{:08X} at offset {}".format(tag, offset))
+    return tag, (pos - off_struct + 3) & ~3
+
+
+def _check_node(fdt, blocks: tuple, offset: int) -> int:
+    """ Return offset of the first tag after node name, raise ValueError if offset doesn't point to node """
+    tag, next_offset = _next_tag(fdt, blocks, offset)
+    if tag != DTB_BEGIN_NODE:
+        raise ValueError("Offset {} doesn't point to node".format(offset))
+    return next_offset
+
+
+def _node_name(fdt, blocks: tuple, offset: int) -> bytes:
+    """ Return the node name as bytes, the DTB version < 16 contains full path in the name """
+    pos = blocks[0] + offset + 4
+    name = bytes(fdt[pos:_find_nul(fdt, pos, blocks[1])])
+    if blocks[3] < 16:
+        name = name[name.rfind(b'/') + 1:]
+    return name
+
+
+def _next_node(fdt, blocks: tuple, offset: int, depth: int) -> tuple:
+    """ Return (offset, depth) of the next node in document order, offset is -1 if there is no next node """
+    tag, offset = _next_tag(fdt, blocks, offset)
+    if tag != DTB_BEGIN_NODE:
+        raise ValueError("Offset doesn't point to node")
+    while True:
+        tag, next_offset = _next_tag(fdt, blocks, offset)
+        if tag == DTB_BEGIN_NODE:
+            return offset, depth + 1
+        if tag == DTB_END_NODE:
+            depth -= 1
+        elif tag == DTB_END:
+            return -1, depth
+        offset = next_offset
+
+
+def _iter_props(fdt, blocks: tuple, offset: int):
+    """ Yield (name offset, value start, value size) of node properties """
+    off_struct, _, _, version = blocks
+    offset = _check_node(fdt, blocks, offset)
+    while True:
+        tag, next_offset = _next_tag(fdt, blocks, offset)
+        if tag == DTB_PROP:
+            pos = off_struct + offset + 4
+            size, name_offset = unpack_from('>II', fdt, pos)
+            pos += 8
+            if version < 16 and size >= 8:
+                pos = off_struct + ((pos - off_struct + 7) & ~7)
+            yield name_offset, pos, size
+        elif tag != DTB_NOP:
+            return
+        offset = next_offset
+
+
+def _getprop(fdt, blocks: tuple, offset: int, name: bytes):
+    """ Return (value start, value size) of property or None if not exists """
+    off_strings = blocks[2]
+    size = len(name)
+    for name_offset, start, value_size in _iter_props(fdt, blocks, offset):
+        pos = off_strings + name_offset
+        if fdt[pos:pos + size] == name and fdt[pos + size] == 0:
+            return start, value_size
+    return None
+
+
+########################################################################################################################
+# Public API
+########################################################################################################################
+
+def get_name(fdt, offset: int) -> str:
+    """
+    Return the node name
+
+    :param fdt: The DTB as bytes, bytearray, mmap or memoryview
+    :param offset: The node offset
+    """
+    blocks = _blocks(fdt)
+    _check_node(fdt, blocks, offset)
+    return _node_name(fdt, blocks, offset).decode('ascii')
+
+
+def next_node(fdt, offset: int, depth: int = 0) -> tuple:
+    """
+    Return (offset, depth) of the next node in document order, the offset is -1 after the last node
+
+    :param fdt: The DTB as bytes, bytearray, mmap or memoryview
+    :param offset: The node offset
+    :param depth: The depth of node at offset, the returned depth is relative to it
+    """
+    return _next_node(fdt, _blocks(fdt), offset, depth)
+
+
+def first_subnode(fdt, offset: int) -> int:
+    """
+    Return the offset of the first subnode or -1 if the node has no subnodes
+
+    :param fdt: The DTB as bytes, bytearray, mmap or memoryview
+    :param offset: The parent node offset
+    """
+    offset, depth = _next_node(fdt, _blocks(fdt), offset, 0)
+    return offset if depth == 1 else -1
+
+
+def next_subnode(fdt, offset: int) -> int:
+    """
+    Return the offset of the next sibling node or -1 if the node is the last one
+
+    :param fdt: The DTB as bytes, bytearray, mmap or memoryview
+    :param offset: The node offset
+    """
+    blocks = _blocks(fdt)
+    depth = 1
+    while True:
+        offset, depth = _next_node(fdt, blocks, offset, depth)
+        if offset < 0 or depth < 1:
+            return -1
+        if depth == 1:
+            return offset
+
+
+def subnode_offset(fdt, offset: int, name: str) -> int:
+    """
+    Return the offset of subnode or -1 if not exists. The name without unit address matches also the subnode with it.
+
+    :param fdt: The DTB as bytes, bytearray, mmap or memoryview
+    :param offset: The parent node offset
+    :param name: The subnode name
+    """
+    return _subnode_offset(fdt, _blocks(fdt), offset, name.encode('ascii'))
+
+
+def _subnode_offset(fdt, blocks: tuple, offset: int, name: bytes) -> int:
+    offset, depth = _next_node(fdt, blocks, offset, 0)
+    while offset >= 0 and depth >= 1:
+        if depth == 1:
+            node_name = _node_name(fdt, blocks, offset)
+            if node_name == name or (b'@' not in name and node_name.split(b'@', 1)[0] == name):
+                return offset
+        offset, depth = _next_node(fdt, blocks, offset, depth)
+    return -1
+
+
+def path_offset(fdt, path: str) -> int:
+    """
+    Return the offset of node with absolute path or -1 if not exists
+
+    :param fdt: The DTB as bytes, bytearray, mmap or memoryview
+    :param path: The node path, for example: '/cpus/cpu@0'
+    """
+    blocks = _blocks(fdt)
+    offset = 0
+    # skip NOPs before root node
+    while True:
+        tag, next_offset = _next_tag(fdt, blocks, offset)
+        if tag != DTB_NOP:
+            break
+        offset = next_offset
+    if tag != DTB_BEGIN_NODE:
+        raise ValueError("Root node not found")
+    for name in path.encode('ascii').split(b'/'):
+        if name:
+            offset = _subnode_offset(fdt, blocks, offset, name)
+            if offset < 0:
+                return -1
+    return offset
+
+
+def getprop(fdt, offset: int, name: str):
+    """
+    Return the property value as memoryview into fdt or None if the property doesn't exist
+
+    :param fdt: The DTB as bytes, bytearray, mmap or memoryview
+    :param offset: The node offset
+    :param name: The property name
+    """
+    value = _getprop(fdt, _blocks(fdt), offset, name.encode('ascii'))
+    if value is None:
+        return None
+    start, size = value
+    return memoryview(fdt)[start:start + size]
+
+
+def properties(fdt, offset: int):
+    """
+    Yield node properties as tuples: (name, value as memoryview into fdt)
+
+    :param fdt: The DTB as bytes, bytearray, mmap or memoryview
+    :param offset: The node offset
+    """
+    blocks = _blocks(fdt)
+    view = memoryview(fdt)
+    names = {}
+    for name_offset, start, size in _iter_props(fdt, blocks, offset):
+        name = names.get(name_offset)
+        if name is None:
+            pos = blocks[2] + name_offset
+            name = bytes(fdt[pos:_find_nul(fdt, pos, len(fdt))]).decode('ascii')
+            names[name_offset] = name
+        yield name, view[start:start + size]
+
+
+def get_phandle(fdt, offset: int) -> int:
+    """
+    Return the node phandle or 0 if the node has no phandle
+
+    :param fdt: The DTB as bytes, bytearray, mmap or memoryview
+    :param offset: The node offset
+    """
+    return _get_phandle(fdt, _blocks(fdt), offset)
+
+
+def _get_phandle(fdt, blocks: tuple, offset: int) -> int:
+    for name in (b'phandle', b'linux,phandle'):
+        value = _getprop(fdt, blocks, offset, name)
+        if value is not None and value[1] == 4:
+            return unpack_from('>I', fdt, value[0])[0]
+    return 0
+
+
+def node_offset_by_phandle(fdt, phandle: int) -> int:
+    """
+    Return the offset of node with phandle or -1 if not exists
+
+    :param fdt: The DTB as bytes, bytearray, mmap or memoryview
+    :param phandle: The phandle value
+    """
+    if phandle in (0, 0xFFFFFFFF):
+        raise ValueError("Invalid phandle {}".format(phandle))
+    blocks = _blocks(fdt)
+    offset, depth = path_offset(fdt, '/'), 0
+    while offset >= 0:
+        if _get_phandle(fdt, blocks, offset) == phandle:
+            return offset
+        offset, depth = _next_node(fdt, blocks, offset, depth)
+    return -1
+
+
+def node_offset_by_compatible(fdt, start_offset: int, compatible: str) -> int:
+    """
+    Return the offset of the first node after start_offset with compatible string or -1 if not exists
+
+    :param fdt: The DTB as bytes, bytearray, mmap or memoryview
+    :param start_offset: The node offset to start search after, -1 for search from root node
+    :param compatible: The compatible string, for example: 'fsl,imx7d-uart'
+    """
+    blocks = _blocks(fdt)
+    name = compatible.encode('ascii')
+    if start_offset < 0:
+        offset, depth = path_offset(fdt, '/'), 0
+    else:
+        offset, depth = _next_node(fdt, blocks, start_offset, 0)
+    while offset >= 0:
+        value = _getprop(fdt, blocks, offset, b'compatible')
+        if value is not None:
+            start, size = value
+            # the value is list of zero terminated strings
+            if name in bytes(fdt[start:start + size]).split(b'\0'):
+                return offset
+        offset, depth = _next_node(fdt, blocks, offset, depth)
+    return -1
@@ -0,0 +1,334 @@
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Validation of device tree against binding schemas.
+
+The schema is a dictionary (loaded from YAML or JSON file by load_schemas) in the following format:
+
+    compatible: [fsl,imx7d-uart, fsl,imx6q-uart]    # the schema is applied on nodes with any of these strings
+    required: [reg, interrupts, clocks]              # the properties which must be present
+    properties:                                      # the checks of properties (if present)
+      reg: {type: words, multiple: reg}              # cells count multiple of parent #address-cells + #size-cells
+      interrupts: {type: words, count: 3}
+      clock-names: {type: strings, min: 1, max: 2, enum: [ipg, per]}
+      mac-address: {type: bytes, count: 6}
+      dma-coherent: {type: empty}
+
+The property type is one of: 'words' (PropWords), 'strings' (PropStrings), 'bytes' (PropBytes) or 'empty' (Property
+without value). The DTB doesn't keep the property types, so the 'bytes' type accepts also value parsed as words. The
+'count', 'min', 'max' and 'multiple' limit the count of items: cells of words, strings or bytes (for 'bytes' type
+also the bytes of value parsed as words). Usage:
+
+    errors = fdt.validate(fdt_obj, fdt.load_schemas('bindings.yaml'))
+    for error in errors:
+        print(error.path, error.schema, error.message)
+"""
+
+import os
+import json
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .items import _walk, Property, PropBytes, PropWords, PropStrings
+from .profiler import profiler
+
+
+SchemaError = namedtuple('SchemaError', ['path', 'schema', 'message'])
+
+PROP_TYPES = {
+    'words': (PropWords,),
+    'strings': (PropStrings,),
+    'bytes': (PropBytes, PropWords),
+    'empty': (Property,),
+}
+
+# the property classes with value, the empty property is instance of none of them
+VALUE_TYPES = (PropWords, PropStrings, PropBytes)
+
+PROP_KEYS = ('type', 'count', 'min', 'max', 'multiple', 'enum')
+SCHEMA_KEYS = ('name', 'compatible', 'required', 'properties')
+
+
+########################################################################################################################
+# Helper Functions
+########################################################################################################################
+
+def _count(prop, type_name: str = None) -> int:
+    """ Return the count of property items: cells of words, strings or bytes (also of words for 'bytes' type) """
+    if type_name == 'bytes' and isinstance(prop, PropWords):
+        return len(prop.data) * prop.word_size // 8
+    return len(prop.data) if isinstance(prop, VALUE_TYPES) else 0
+
+
+def _reg_cells(parent) -> int:
+    """ Return the count of cells in one entry of reg property of the parent sub-nodes """
+    cells = 0
+    for name, default in (('#address-cells', 2), ('#size-cells', 1)):
+        prop = parent.get_property(name) if parent is not None else None
+        cells += prop.data[0] if isinstance(prop, PropWords) and prop.data else default
+    return cells
+
+
+def _compile_property(schema_name: str, name: str, spec: dict):
+    """ Return the check function: check(prop, parent) -> error message or None """
+    if not isinstance(spec, dict):
+        raise ValueError("Schema {}: property \"{}\" must be a dictionary".format(schema_name, name))
+    unknown = set(spec) - set(PROP_KEYS)
+    if unknown:
+        raise ValueError("Schema {}: property \"{}\" has unknown keys: {}".format(
+            schema_name, name, ', '.join(sorted(unknown))))
+    type_name = spec.get('type')
+    if type_name is not None and type_name not in PROP_TYPES:
+        raise ValueError("Schema {}: property \"{}\" has unknown type: {}".format(schema_name, name, type_name))
+    prop_types = PROP_TYPES.get(type_name)
+    exact, low, high = spec.get('count'), spec.get('min'), spec.get('max')
+    multiple = spec.get('multiple')
+    if multiple is not None and multiple != 'reg' and not (isinstance(multiple, int) and multiple > 0):
+        raise ValueError("Schema {}: property \"{}\" has invalid multiple: {}".format(schema_name, name, multiple))
+    enum = frozenset(spec['enum']) if 'enum' in spec else None
+    counted = exact is not None or low is not None or high is not None or multiple is not None
+
+    def check(prop, parent):
+        if prop_types is not None:
+            if not isinstance(prop, prop_types) or (type_name == 'empty' and isinstance(prop, VALUE_TYPES)):
+                return "Property \"{}\" must be {}".format(name, type_name)
+        if counted:
+            count = _count(prop, type_name)
+            if exact is not None and count != exact:
+                return "Property \"{}\" has {} items, expected {}".format(name, count, exact)
+            if low is not None and count < low:
+                return "Property \"{}\" has {} items, expected at least {}".format(name, count, low)
+            if high is not None and count > high:
+                return "Property \"{}\" has {} items, expected at most {}".format(name, count, high)
+            if multiple is not None:
+                size = _reg_cells(parent) if multiple == 'reg' else multiple
+                if size and count % size:
+                    return "Property \"{}\" has {} items, expected multiple of {}".format(name, count, size)
+        if enum is not None and isinstance(prop, (PropWords, PropStrings)):
+            for value in prop.data:
+                if value not in enum:
+                    return "Property \"{}\" has not allowed value: {}".format(name, value)
+        return None
+
+    return check
+
+
+########################################################################################################################
+# Schemas Class
+########################################################################################################################
+
+class Matcher:
+    """ The compiled schema: the name, the required properties and the checks of properties """
+
+    __slots__ = ('name', 'required', 'checks')
+
+    def __init__(self, schema: dict):
+        """
+        Matcher constructor, use compile_schemas() instead
+
+        :param schema: The schema dictionary
+        """
+        if not isinstance(schema, dict):
+            raise ValueError("Schema must be a dictionary, not {}".format(type(schema).__name__))
+        compatible = schema.get('compatible')
+        if isinstance(compatible, str):
+            compatible = [compatible]
+        if not compatible:
+            raise ValueError("Schema without compatible strings: {}".format(schema))
+        self.name = str(schema.get('name', compatible[0]))
+        unknown = set(schema) - set(SCHEMA_KEYS)
+        if unknown:
+            raise ValueError("Schema {}: unknown keys: {}".format(self.name, ', '.join(sorted(unknown))))
+        self.required = tuple(schema.get('required', ()))
+        self.checks = tuple((name, _compile_property(self.name, name, spec))
+                            for name, spec in (schema.get('properties') or {}).items())
+
+    def match(self, node, parent) -> list:
+        """
+        Check the node and return list of error messages
+
+        :param node: The node object
+        :param parent: The parent node or None for root node
+        """
+        props = {prop.name: prop for prop in node.props}
+        errors = ["Missing required property \"{}\"".format(name) for name in self.required if name not in props]
+        for name, check in self.checks:
+            prop = props.get(name)
+            if prop is not None:
+                message = check(prop, parent)
+                if message is not None:
+                    errors.append(message)
+        return errors
+
+
+class Schemas:
+    """ The schemas compiled into matchers keyed by compatible string """
+
+    def __init__(self, schemas):
+        """
+        Schemas constructor, use compile_schemas() instead
+
+        :param schemas: The list of schema dictionaries
+        """
+        self.sources = list(schemas)
+        self.matchers = {}
+        for schema in self.sources:
+            matcher = Matcher(schema)
+            compatible = schema['compatible']
+            for name in [compatible] if isinstance(compatible, str) else compatible:
+                self.matchers.setdefault(name, []).append(matcher)
+
+    def __len__(self):
+        return len(self.sources)
+
+    def lookup(self, compatible) -> list:
+        """
+        Return the matchers for list of compatible strings, every matcher is returned only once
+
+        :param compatible: The list of compatible strings
+        """
+        matchers = []
+        for name in compatible:
+            for matcher in self.matchers.get(name, ()):
+                if matcher not in matchers:
+                    matchers.append(matcher)
+        return matchers
+
+
+########################################################################################################################
+# Public Functions
+########################################################################################################################
+
+def load_schemas(file_path: str) -> list:
+    """
+    Load the schemas from YAML (requires PyYAML) or JSON file, or from all such files in directory
+
+    :param file_path: The path to schema file or directory
+    """
+    if os.path.isdir(file_path):
+        schemas = []
+        for name in sorted(os.listdir(file_path)):
+            if name.endswith(('.yaml', '.yml', '.json')):
+                schemas += load_schemas(os.path.join(file_path, name))
+        return schemas
+
+    with open(file_path, 'r') as f:
+        if file_path.endswith('.json'):
+            documents = [json.load(f)]
+        else:
+            try:
+                import yaml
+            except ImportError:
+                raise Exception("The YAML schemas require PyYAML, install it by: pip install pyyaml")
+            documents = list(yaml.safe_load_all(f))
+
+    schemas = []
+    for document in documents:
+        if isinstance(document, list):
+            schemas += document
+        elif document is not None:
+            schemas.append(document)
+    return schemas
+
+
+def compile_schemas(schemas) -> Schemas:
+    """
+    Compile the schemas into matchers keyed by compatible string
+
+    :param schemas: The schema dictionary or list of schema dictionaries
+    """
+    if isinstance(schemas, Schemas):
+        return schemas
+    return Schemas([schemas] if isinstance(schemas, dict) else schemas)
+
+
+@profiler.timed('validate')
+def validate(tree, schemas) -> list:
+    """
+    Validate the device tree against schemas in one traversal and return list of SchemaError(path, schema, message)
+
+    :param tree: The FDT object
+    :param schemas: The compiled schemas, schema dictionary or list of schema dictionaries
+    """
+    schemas = compile_schemas(schemas)
+    errors = []
+    # the stack of (node, path) from root to current node
+    stack = []
+    for node, _, enter in _walk(tree.root, shared=True):
+        if not enter:
+            stack.pop()
+            continue
+        if stack:
+            parent_path = stack[-1][1]
+            path = parent_path + node.name if parent_path == '/' else parent_path + '/' + node.name
+        else:
+            path = '/'
+        stack.append((node, path))
+        compatible = node.get_property('compatible')
+        if not isinstance(compatible, PropStrings):
+            continue
+        parent = stack[-2][0] if len(stack) > 1 else None
+        for matcher in schemas.lookup(compatible.data):
+            errors += [SchemaError(path, matcher.name, message) for message in matcher.match(node, parent)]
+    profiler.count('validate.errors', len(errors))
+    return errors
+
+
+def _validate_files(args) -> list:
+    """ Validate chunk of files in worker process, the schemas are compiled once per chunk """
+    schemas, file_paths = args
+    schemas = compile_schemas(schemas)
+    return [validate(_load_tree(file_path), schemas) for file_path in file_paths]
+
+
+def _load_tree(file_path: str):
+    """ Parse *.dtb or *.dts file """
+    from . import parse_dtb, parse_dts
+
+    if not os.path.exists(file_path):
+        raise Exception('File doesnt exist: {}'.format(file_path))
+    if file_path.endswith('.dts'):
+        with open(file_path, 'r') as f:
+            return parse_dts(f.read(), os.path.dirname(file_path))
+    with open(file_path, 'rb') as f:
+        return parse_dtb(f.read())
+
+
+def validate_files(file_paths: list, schemas, jobs: int = 1) -> list:
+    """
+    Validate *.dtb or *.dts files and return list of (file path, errors) in order of files
+
+    :param file_paths: The list of paths to dtb or dts files
+    :param schemas: The schema dictionary or list of schema dictionaries
+    :param jobs: The count of worker processes, 0 for count of CPUs, 1 for validation in current process
+    """
+    if isinstance(schemas, Schemas):
+        schemas = schemas.sources
+    elif isinstance(schemas, dict):
+        schemas = [schemas]
+    # compile in current process first to report invalid schemas early
+    compiled = compile_schemas(schemas)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(file_paths) < 2:
+        return [(file_path, validate(_load_tree(file_path), compiled)) for file_path in file_paths]
+
+    # the files are split into chunks, more than workers for balancing of load
+    size = max(1, -(-len(file_paths) // (jobs * 4)))
+    chunks = [file_paths[i:i + size] for i in range(0, len(file_paths), size)]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as executor:
+        results = []
+        for chunk_errors in executor.map(_validate_files, [(schemas, chunk) for chunk in chunks]):
+            results += chunk_errors
+    return list(zip(file_paths, results))
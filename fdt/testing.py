@@ -0,0 +1,158 @@
+# Copyright 2017 Martin Olejar
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from random import Random
+
+from .items import Node, Property, PropBytes, PropStrings, PropWords
+
+
+########################################################################################################################
+# Synthetic Device Tree Generator
+########################################################################################################################
+
+# Device types used for generated node names and compatible strings
+DEVICE_TYPES = ('serial', 'i2c', 'spi', 'gpio', 'timer', 'usb', 'ethernet', 'mmc', 'pwm', 'watchdog', 'dma-controller',
+                'adc', 'can', 'pcie', 'display', 'audio-codec', 'sram', 'crypto')
+
+# Vendors used for compatible strings
+VENDORS = ('acme', 'fsl', 'nxp', 'arm', 'ti', 'st', 'rockchip', 'generic')
+
+
+def _device_props(rng: Random, node: Node, dev_type: str, address: int, size: int, count: int):
+    """
+    Append <count> properties into device node in order typical for real device trees
+
+    :param rng: The random generator
+    :param node: The device node
+    :param dev_type: The device type
+    :param address: The device address
+    :param size: The device address space size
+    :param count: The count of properties
+    """
+    vendor = rng.choice(VENDORS)
+    generators = (
+        lambda: PropStrings('compatible', '{},{}-v{}'.format(vendor, dev_type, rng.randint(1, 4)),
+                            '{},{}'.format(vendor, dev_type)),
+        lambda: PropWords('reg', address, size),
+        lambda: PropWords('interrupts', 0, rng.randint(32, 255), rng.choice((1, 4))),
+        lambda: PropStrings('status', rng.choice(('okay', 'okay', 'disabled'))),
+        lambda: PropWords('clock-frequency', rng.choice((24000000, 66000000, 100000000, 133000000))),
+        lambda: PropStrings('clock-names', 'ipg', 'per'),
+        lambda: PropWords('{},fifo-depth'.format(vendor), rng.choice((16, 32, 64, 128))),
+        lambda: PropBytes('local-mac-address', *[rng.getrandbits(8) for _ in range(6)]),
+    )
+    for index in range(count):
+        if index < len(generators):
+            node.append(generators[index]())
+        else:
+            node.append(PropWords('{},param-{}'.format(vendor, index), rng.getrandbits(32)))
+
+
+def generate_tree(nodes: int = 100, props_per_node: int = 4, depth: int = 4, blob_sizes=(),
+                  phandle_density: float = 0.1, seed: int = 0, output: str = 'fdt', version: int = 17):
+    """
+    Generate deterministic synthetic device tree for benchmarks and scaling tests.
+
+    The tree contains interrupt controller and hierarchy of simple-bus nodes (with ranges) and device nodes
+    (with compatible, reg, interrupts, status, ...). The nodes with phandle are referenced by "clocks" property
+    of other devices.
+
+    :param nodes: The count of nodes (excluding root node)
+    :param props_per_node: The count of properties in every device node
+    :param depth: The max depth of nodes (root node has depth 0)
+    :param blob_sizes: The sizes of binary properties ("firmware" of randomly selected devices)
+    :param phandle_density: The ratio of device nodes with phandle <0.0 - 1.0>
+    :param seed: The seed of random generator, the same arguments and seed generate the same tree
+    :param output: The output format: 'fdt' for FDT object, 'dts' for string or 'dtb' for bytes
+    :param version: The DTB version, used for 'dtb' output
+    """
+    from . import FDT
+
+    assert nodes >= 1, "The count of nodes must be >= 1"
+    assert depth >= 1, "The depth must be >= 1"
+    assert 0.0 <= phandle_density <= 1.0, "The phandle density must be in range <0.0 - 1.0>"
+    assert output in ('fdt', 'dts', 'dtb'), "Not supported output: {}".format(output)
+
+    rng = Random(seed)
+    fdt_obj = FDT()
+    fdt_obj.header.version = version
+    root = fdt_obj.root
+    root.append(PropStrings('model', 'Generated Board {}'.format(seed)))
+    root.append(PropStrings('compatible', 'fdt,generated-board', 'fdt,generated'))
+    root.append(PropWords('#address-cells', 1))
+    root.append(PropWords('#size-cells', 1))
+    root.append(PropWords('interrupt-parent', 1))
+
+    # the interrupt controller has always phandle 1
+    intc = Node('interrupt-controller@100000')
+    intc.set_label('intc')
+    intc.append(PropStrings('compatible', 'arm,gic-400'))
+    intc.append(PropWords('reg', 0x100000, 0x1000))
+    intc.append(Property('interrupt-controller'))
+    intc.append(PropWords('#interrupt-cells', 3))
+    intc.append(PropWords('phandle', 1))
+    root.append(intc)
+
+    # (node, depth, next free address)
+    buses = [[root, 0, 0x10000000]]
+    devices = []
+    for index in range(1, nodes):
+        bus = rng.choice(buses) if len(buses) < 2 or rng.random() < 0.5 else buses[-1]
+        bus_node, bus_depth, address = bus
+        size = 0x1000 * rng.choice((1, 1, 2, 4, 16))
+        bus[2] += size
+        if bus_depth + 1 < depth and rng.random() < 0.15:
+            node = Node('bus@{:x}'.format(address))
+            node.append(PropStrings('compatible', 'simple-bus'))
+            node.append(PropWords('#address-cells', 1))
+            node.append(PropWords('#size-cells', 1))
+            node.append(PropWords('ranges', 0, address, size))
+            # the child addresses are relative to the bus
+            buses.append([node, bus_depth + 1, 0])
+        else:
+            dev_type = rng.choice(DEVICE_TYPES)
+            node = Node('{}@{:x}'.format(dev_type, address))
+            _device_props(rng, node, dev_type, address, size, props_per_node)
+            devices.append(node)
+        bus_node.append(node)
+
+    # assign phandles and labels
+    targets = []
+    for index, node in enumerate(devices):
+        if rng.random() < phandle_density:
+            node.set_label('dev{}'.format(index))
+            node.append(PropWords('phandle', len(targets) + 2))
+            targets.append(node)
+
+    # reference the nodes with phandle
+    if targets:
+        for node in devices:
+            if rng.random() < 0.5:
+                refs = []
+                for _ in range(rng.randint(1, 2)):
+                    target = rng.randrange(len(targets))
+                    refs += [target + 2, rng.randint(0, 127)]
+                node.append(PropWords('clocks', *refs))
+
+    # binary blobs
+    for index, blob_size in enumerate(blob_sizes):
+        node = rng.choice(devices) if devices else root
+        data = rng.getrandbits(8 * blob_size).to_bytes(blob_size, 'little') if blob_size else b''
+        node.append(PropBytes('firmware-{}'.format(index), data=data))
+
+    if output == 'dts':
+        return fdt_obj.to_dts()
+    if output == 'dtb':
+        return fdt_obj.to_dtb()
+    return fdt_obj
@@ -0,0 +1,55 @@
+import os
+import fdt
+import fdt.aio
+import asyncio
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_load_save(data_dir, temp_dir):
+    dtb_file = os.path.join(data_dir, 'imx7d-sdb.dtb')
+    dts_file = os.path.join(data_dir, 'addresses.dts')
+    out_file = os.path.join(temp_dir, 'aio.dtb')
+
+    async def run():
+        fdt_dtb = await fdt.aio.load_dtb(dtb_file)
+        fdt_dts = await fdt.aio.load_dts(dts_file)
+        await fdt.aio.save_dtb(fdt_dts, out_file, version=17)
+        return fdt_dtb, fdt_dts
+
+    fdt_dtb, fdt_dts = asyncio.run(run())
+
+    with open(dtb_file, 'rb') as f:
+        assert fdt_dtb.to_dtb() == f.read()
+    with open(out_file, 'rb') as f:
+        assert fdt.parse_dtb(f.read()).to_dts() == fdt_dts.to_dts()
+
+
+def test_load_many(data_dir):
+    paths = [os.path.join(data_dir, name) for name in ('imx7d-sdb.dtb', 'addresses.dts', 'comments.dts')]
+
+    with ThreadPoolExecutor(2) as executor:
+        fdt.aio.set_executor(executor)
+        try:
+            fdt_objs = asyncio.run(fdt.aio.load_many(paths, concurrency=2))
+        finally:
+            fdt.aio.set_executor(None)
+
+    assert len(fdt_objs) == 3
+    assert fdt_objs[1].get_property('compatible').value == "test_addresses"
+
+    with pytest.raises(ValueError):
+        _ = asyncio.run(fdt.aio.load_many(['test.txt']))
+
+
+def test_load_many_include_dirs(temp_dir):
+    include_dir = os.path.join(temp_dir, 'aio_include')
+    os.makedirs(include_dir, exist_ok=True)
+    with open(os.path.join(include_dir, 'aio-soc.dtsi'), 'w') as f:
+        f.write('/ {\n    soc {\n        compatible = "test,soc";\n    };\n};\n')
+    dts_file = os.path.join(temp_dir, 'aio-board.dts')
+    with open(dts_file, 'w') as f:
+        f.write('/dts-v1/;\n/include/ "aio-soc.dtsi"\n/ {\n    model = "board";\n};\n')
+
+    fdt_objs = asyncio.run(fdt.aio.load_many([dts_file], include_dirs=[include_dir]))
+    assert fdt_objs[0].get_property('compatible', '/soc').value == 'test,soc'
@@ -0,0 +1,64 @@
+import os
+import fdt
+from struct import pack_into
+
+from fdt.header import DTB_END_NODE, DTB_NOP
+
+
+def load_dtb(data_dir):
+    with open(os.path.join(data_dir, 'imx7d-sdb.dtb'), 'rb') as f:
+        return bytearray(f.read())
+
+
+def codes(errors):
+    return [error.code for error in errors]
+
+
+def test_check_valid(data_dir):
+    data = load_dtb(data_dir)
+
+    assert fdt.check_dtb(data) == []
+    assert fdt.check_dtb(memoryview(data)) == []
+    assert fdt.check_dtb(b'\0' * 8 + data, offset=8) == []
+    for version in (1, 2, 3, 16, 17):
+        assert fdt.check_dtb(fdt.FDT().to_dtb(version=version)) == []
+
+
+def test_check_header(data_dir):
+    data = load_dtb(data_dir)
+
+    assert codes(fdt.check_dtb(data[:20])) == ['header_truncated']
+    assert codes(fdt.check_dtb(b'\0' * 64)) == ['bad_magic']
+    assert 'bad_total_size' in codes(fdt.check_dtb(data[:-100]))
+
+    bad = bytearray(data)
+    pack_into('>I', bad, 8, len(data) + 4)
+    assert codes(fdt.check_dtb(bad)) == ['bad_struct_offset']
+
+
+def test_check_struct(data_dir):
+    data = load_dtb(data_dir)
+    header = fdt.Header.parse(data)
+
+    bad = bytearray(data)
+    pack_into('>I', bad, header.off_dt_struct, DTB_END_NODE)
+    errors = fdt.check_dtb(bad)
+    assert codes(errors) == ['unbalanced_end_node']
+    assert errors[0].offset == header.off_dt_struct
+
+    bad = bytearray(data)
+    pack_into('>I', bad, header.off_dt_struct, 0x12345678)
+    assert codes(fdt.check_dtb(bad)) == ['bad_tag']
+
+    # the first property of root node: tag, name, padding, prop tag, len, name offset
+    bad = bytearray(data)
+    pack_into('>I', bad, header.off_dt_struct + 16, 0xFFFF)
+    assert codes(fdt.check_dtb(bad)) == ['bad_name_offset']
+
+    bad = bytearray(data)
+    pack_into('>I', bad, header.off_dt_struct + 12, 0xFFFFFF)
+    assert codes(fdt.check_dtb(bad)) == ['prop_truncated']
+
+    bad = bytearray(data)
+    pack_into('>I', bad, header.off_dt_struct + header.size_dt_struct - 4, DTB_NOP)
+    assert codes(fdt.check_dtb(bad)) == ['struct_unterminated']
@@ -50,3 +50,73 @@ def test_pydtc_diff(script_runner, data_dir, temp_dir):
     ret = script_runner.run('pydtc', 'diff', '-o ' + out_dir, in1_file, in2_file)
     assert ret.success
     assert ret.stderr == ''
+
+
+@pytest.mark.script_launch_mode('subprocess')
+def test_pydtc_profile(script_runner, data_dir, temp_dir):
+    src_file = os.path.join(data_dir, 'imx7d-sdb.dts')
+    out_file = os.path.join(temp_dir, 'imx7d-sdb.dtb')
+    prof_file = os.path.join(temp_dir, 'pack.prof')
+
+    ret = script_runner.run('pydtc', '--profile', '--profile-out', prof_file, 'pack', '-p', '-o ' + out_file, src_file)
+    assert ret.success
+    assert ret.stderr == ''
+    assert 'parse_dts' in ret.stdout
+    assert 'to_dtb' in ret.stdout
+    assert os.path.exists(prof_file)
+
+
+@pytest.mark.script_launch_mode('subprocess')
+def test_pydtc_stats(script_runner, data_dir):
+    src_file = os.path.join(data_dir, 'imx7d-sdb.dtb')
+
+    ret = script_runner.run('pydtc', 'stats', src_file)
+    assert ret.success
+    assert ret.stderr == ''
+    assert 'Nodes:             277' in ret.stdout
+
+
+@pytest.mark.script_launch_mode('subprocess')
+def test_pydtc_check(script_runner, data_dir, temp_dir):
+    src_file = os.path.join(data_dir, 'imx7d-sdb.dtb')
+    bad_file = os.path.join(temp_dir, 'bad.dtb')
+    with open(src_file, 'rb') as f:
+        data = f.read()
+    with open(bad_file, 'wb') as f:
+        f.write(data[:-100])
+
+    ret = script_runner.run('pydtc', 'check', src_file)
+    assert ret.success
+    assert ret.stderr == ''
+    assert 'OK' in ret.stdout
+
+    ret = script_runner.run('pydtc', 'check', src_file, bad_file)
+    assert not ret.success
+    assert '[bad_total_size]' in ret.stdout
+
+
+@pytest.mark.script_launch_mode('subprocess')
+def test_pydtc_validate(script_runner, data_dir, temp_dir):
+    src_file = os.path.join(data_dir, 'imx7d-sdb.dtb')
+    schema_file = os.path.join(temp_dir, 'i2c.json')
+    with open(schema_file, 'w') as f:
+        f.write('{"compatible": ["fsl,imx7d-i2c"], "required": ["reg", "clocks"], '
+                '"properties": {"interrupts": {"type": "words", "count": 3}}}')
+
+    ret = script_runner.run('pydtc', 'validate', '-s', schema_file, src_file)
+    assert ret.success
+    assert ret.stderr == ''
+    assert 'OK' in ret.stdout
+
+    with open(schema_file, 'w') as f:
+        f.write('{"compatible": ["fsl,imx7d-i2c"], "required": ["dmas"]}')
+    ret = script_runner.run('pydtc', 'validate', '-j', '2', '-s', schema_file, src_file, src_file)
+    assert not ret.success
+    assert ret.stdout.count('FAILED') == 2
+    assert '[fsl,imx7d-i2c] Missing required property "dmas"' in ret.stdout
+
+    # the profile is printed also for failed validation
+    ret = script_runner.run('pydtc', '--profile', 'validate', '-s', schema_file, src_file)
+    assert not ret.success
+    assert 'FAILED' in ret.stdout
+    assert 'validate' in ret.stdout
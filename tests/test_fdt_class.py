@@ -1,6 +1,8 @@
 import os
+import sys
 import fdt
 import pytest
+import tracemalloc
 
 
 def test_fdt_constructor():
@@ -52,3 +54,305 @@ def test_fdt_methods():
     fdt_obj.remove_node("node1")
 
     assert len(fdt_obj.search("prop")) == 0
+
+
+def test_fdt_stats():
+    fdt_obj = fdt.FDT()
+    fdt_obj.set_property('model', 'test')
+    fdt_obj.set_property('reg', [0x10, 0x20], path='/node1')
+    fdt_obj.set_property('data', b'\x01\x02\x03', path='/node1/node2')
+    fdt_obj.add_item(fdt.Property('empty'), path='/node1/node2')
+
+    stats = fdt_obj.stats()
+    assert stats['nodes'] == 3
+    assert stats['props'] == 4
+    assert stats['props_by_type'] == {'PropStrings': 1, 'PropWords': 1, 'PropBytes': 1, 'Property': 1}
+    assert stats['max_depth'] == 2
+    assert stats['payload_size'] == 5 + 8 + 3
+    assert stats['strings_size'] == len('model\0reg\0data\0empty\0')
+    assert stats['dtb_size'] == len(fdt_obj.to_dtb(17))
+    assert stats['heap_size'] > 0
+
+    # the words in array are counted by size of array only, the result is stable
+    words = fdt.PropWords('bits64', *range(0x100000000, 0x100000010), word_size=64)
+    fdt_obj.add_item(words, path='/node1')
+    heap_size = fdt_obj.stats()['heap_size']
+    assert heap_size == stats['heap_size'] + sys.getsizeof(words) + sys.getsizeof(words.data) + sys.getsizeof('bits64')
+    assert fdt_obj.stats()['heap_size'] == heap_size
+
+
+def test_fdt_walk():
+    fdt_obj = fdt.FDT()
+    fdt_obj.add_item(fdt.Property('prop'), '/a/a1')
+    fdt_obj.add_item(fdt.Property('prop'), '/a/a2')
+    fdt_obj.add_item(fdt.Property('prop'), '/b/a/a1')
+
+    paths = [path for path, _, _ in fdt_obj.walk()]
+    assert paths == ['/', '/a', '/a/a1', '/a/a2', '/b', '/b/a', '/b/a/a1']
+
+    paths = [path for path, _, _ in fdt_obj.walk(order='bfs')]
+    assert paths == ['/', '/a', '/b', '/a/a1', '/a/a2', '/b/a', '/b/a/a1']
+
+    # the prefix of relative path is removed only at beginning
+    paths = [path for path, _, _ in fdt_obj.walk('/b', relative=True)]
+    assert paths == ['', 'a', 'a/a1']
+    # the paths are absolute without path argument
+    paths = [path for path, _, _ in fdt_obj.walk(relative=True)]
+    assert paths == ['/', '/a', '/a/a1', '/a/a2', '/b', '/b/a', '/b/a/a1']
+    paths = [path for path, _, _ in fdt_obj.walk('/b/a')]
+    assert paths == ['/b/a', '/b/a/a1']
+
+    paths = [path for path, _, _ in fdt_obj.walk(max_depth=1)]
+    assert paths == ['/', '/a', '/b']
+    paths = [path for path, _, _ in fdt_obj.walk(prune=lambda node: node.name == 'a')]
+    assert paths == ['/', '/a', '/b', '/b/a']
+
+
+def test_fdt_search_index():
+    fdt_obj = fdt.FDT()
+    fdt_obj.add_item(fdt.PropWords('reg', 1), '/a/b')
+    fdt_obj.add_item(fdt.PropStrings('reg', 'x'), '/c')
+
+    assert len(fdt_obj.search('reg')) == 2
+    assert len(fdt_obj.search('reg', itype=fdt.ItemType.PROP_WORDS)) == 1
+    assert len(fdt_obj.search('reg', path='/a')) == 1
+    assert fdt_obj.search('b', itype=fdt.ItemType.NODE) == [fdt_obj.get_node('/a/b')]
+
+    # the index is updated by node methods
+    node = fdt_obj.get_node('/c')
+    node.append(fdt.Node('b', fdt.PropWords('reg', 2)))
+    assert len(fdt_obj.search('reg')) == 3
+    assert len(fdt_obj.search('b', itype=fdt.ItemType.NODE)) == 2
+
+    node.set_property('reg', 5)
+    assert [prop.value for prop in fdt_obj.search('reg', path='/c', recursive=True)
+            if prop.parent is node] == [5]
+    assert len(fdt_obj.search('reg', itype=fdt.ItemType.PROP_STRINGS)) == 0
+
+    node.remove_subnode('b')
+    fdt_obj.remove_property('reg', '/a/b')
+    assert len(fdt_obj.search('reg')) == 1
+    assert len(fdt_obj.search('b', itype=fdt.ItemType.NODE)) == 1
+
+    fdt_obj.get_node('/a/b').set_name('d')
+    assert len(fdt_obj.search('b')) == 0
+    assert len(fdt_obj.search('d')) == 1
+
+
+def test_fdt_update_phandles():
+    dts = "/dts-v1/;\n" \
+          "/ {\n" \
+          "    a: node-a {\n" \
+          "        clocks = <&b 1>, <&{/node-c} 2>;\n" \
+          "    };\n" \
+          "    b: node-b {\n" \
+          "        reg = <0>;\n" \
+          "    };\n" \
+          "    node-c {\n" \
+          "        phandle = <1>;\n" \
+          "    };\n" \
+          "    node-d {\n" \
+          "    };\n" \
+          "};\n"
+    fdt_obj = fdt.parse_dts(dts)
+    fdt_obj.update_phandles()
+
+    phandles = [prop.value for prop in fdt_obj.search('phandle')]
+    assert len(phandles) == 4
+    assert len(set(phandles)) == 4
+    # the explicit phandle is kept, references are resolved to the final phandles
+    assert fdt_obj.get_property('phandle', '/node-c').value == 1
+    phandle_b = fdt_obj.get_property('phandle', '/node-b').value
+    assert fdt_obj.get_property('clocks', '/node-a').data == [phandle_b, 1, 1, 2]
+
+    # the duplicated phandles are not silently reallocated
+    fdt_obj.set_property('phandle', 1, path='/node-d')
+    data = fdt_obj.to_dtb(17)
+    with pytest.raises(ValueError, match='node-d'):
+        fdt_obj.update_phandles()
+    assert fdt_obj.to_dtb(17) == data
+
+
+def test_fdt_freeze(data_dir):
+    with open(os.path.join(data_dir, 'imx7d-sdb.dtb'), 'rb') as f:
+        data = f.read()
+    fdt_obj = fdt.parse_dtb(data)
+    fdt_obj.set_property('bits', [1, 2], path='/test')
+    fdt_obj.add_item(fdt.PropWords('bits64', 0x100000000, word_size=64), path='/test')
+    frozen = fdt_obj.freeze()
+
+    assert frozen.freeze() is frozen
+    assert frozen.root == fdt_obj.root
+    assert hash(frozen) == hash(fdt_obj.freeze())
+    assert frozen.to_dts() == fdt_obj.to_dts()
+    assert frozen.to_dtb(17) == fdt_obj.to_dtb(17)
+    assert frozen.get_node('/soc/aips-bus@30000000').parent is frozen.get_node('soc')
+    assert len(frozen.search('reg')) == len(fdt_obj.search('reg'))
+    assert [path for path, _, _ in frozen.walk()] == [path for path, _, _ in fdt_obj.walk()]
+    assert not frozen.exist_node('/not-exists')
+
+    node = frozen.get_node('/test')
+    with pytest.raises(TypeError):
+        frozen.set_property('prop', 1)
+    with pytest.raises(TypeError):
+        frozen.root = None
+    with pytest.raises(TypeError):
+        node.append(fdt.Node('node'))
+    with pytest.raises(TypeError):
+        node.get_property('bits').append(3)
+    with pytest.raises(TypeError):
+        frozen.header.version = 16
+    with pytest.raises(AttributeError):
+        node.props.append(fdt.Property('prop'))
+
+    # the modifications of source object or thawed copy don't change snapshot
+    fdt_obj.set_property('bits', 3, path='/test')
+    thawed = frozen.thaw()
+    thawed.get_node('/test').get_property('bits').append(3)
+    thawed.get_node('/test').get_property('bits64').append(4)
+    assert node.get_property('bits').data == (1, 2)
+    assert frozen.to_dtb(17) != thawed.to_dtb(17)
+
+
+def test_fdt_thaw_cow(data_dir):
+    with open(os.path.join(data_dir, 'imx7d-sdb.dtb'), 'rb') as f:
+        fdt_obj = fdt.parse_dtb(f.read())
+    snapshot = fdt_obj.freeze()
+
+    # the copies share the snapshot content and cost a fraction of deep copy
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        copies = [snapshot.thaw() for _ in range(10)]
+        deep_size = tracemalloc.get_traced_memory()[0] - start
+        del copies
+        start = tracemalloc.get_traced_memory()[0]
+        variants = [snapshot.thaw(cow=True) for _ in range(10)]
+        cow_size = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    assert all(dt.root._source is snapshot.root for dt in variants)
+    assert cow_size * 50 < deep_size
+
+    # the name index and walk don't materialize the whole tree
+    dt = variants[0]
+    memory = dt.search('memory')
+    assert len(memory) == 1 and memory[0].parent is dt.root
+    assert dt.root.materialized
+    assert not dt.get_node('/soc').materialized
+    assert [path for path, _, _ in dt.walk()] == [path for path, _, _ in fdt_obj.walk()]
+    assert not dt.get_node('/soc').materialized
+    # the name is resolved in shared nodes only once
+    assert 'memory' in dt.root._index._resolved
+    assert dt.search('memory') == memory
+
+    # the found items are materialized and modifiable
+    status = dt.search('status', itype=fdt.ItemType.PROP, path='/soc')
+    assert len(status) == len(fdt_obj.search('status', itype=fdt.ItemType.PROP, path='/soc'))
+    status[0].data[0] = 'disabled'
+    assert dt.search('status')[0] is status[0]
+    dt.get_node('/soc').remove_subnode('aips-bus@30000000')
+    assert len(dt.search('status')) < len(fdt_obj.search('status'))
+    # the added shared node is searched for already resolved names
+    dt.add_item(variants[1].get_node('/soc'), path='/new')
+    assert len(dt.search('memory')) == 1
+    assert dt.search('status')[-1].path.startswith('/new/soc')
+    assert snapshot.to_dtb() == fdt_obj.to_dtb()
+
+
+def test_fdt_batch(data_dir):
+    with open(os.path.join(data_dir, 'imx7d-sdb.dtb'), 'rb') as f:
+        fdt_obj = fdt.parse_dtb(f.read())
+    # build name index
+    assert len(fdt_obj.search('memory')) == 1
+
+    with fdt_obj.batch() as tx:
+        tx.set_property('status', 'disabled', path='/soc/aips-bus@30000000')
+        tx.set_property('status', 'okay', path='/soc/aips-bus@30000000')
+        tx.set_property('cells', [1, 2], path='/new/node')
+        tx.add_item(fdt.Node('sub-node'), path='/new')
+        tx.remove_property('model')
+        tx.set_property('reg', 0, path='/memory')
+        tx.remove_node('memory')
+        # the operations are coalesced, the operations inside removed node discarded
+        assert len(tx) == 5
+        # nothing is applied before commit
+        assert not fdt_obj.exist_node('/new')
+
+    assert fdt_obj.get_property('status', '/soc/aips-bus@30000000').value == 'okay'
+    assert fdt_obj.get_property('cells', '/new/node').data == [1, 2]
+    assert fdt_obj.get_node('/new/sub-node').parent is fdt_obj.get_node('/new')
+    assert not fdt_obj.exist_property('model')
+    assert not fdt_obj.exist_node('/memory')
+    assert len(fdt_obj.search('memory')) == 0
+    assert len(fdt_obj.search('cells')) == 1
+
+    # the failed batch is rolled back
+    data = fdt_obj.to_dtb(17)
+    with pytest.raises(Exception, match="already exists"):
+        with fdt_obj.batch() as tx:
+            tx.set_property('status', 'disabled', path='/soc/aips-bus@30000000')
+            tx.remove_node('chosen')
+            tx.set_property('prop', 1, path='/other/node')
+            tx.add_item(fdt.Property('compatible'))
+    with pytest.raises(ValueError):
+        with fdt_obj.batch() as tx:
+            tx.remove_node('chosen')
+            tx.set_property('prop', 1, path='/not-exists', create=False)
+    assert fdt_obj.to_dtb(17) == data
+    assert fdt_obj.get_node('/chosen').parent is fdt_obj.root
+    assert len(fdt_obj.search('prop')) == 0
+
+    # the batch is discarded on exception in "with" block
+    with pytest.raises(KeyError):
+        with fdt_obj.batch() as tx:
+            tx.remove_node('chosen')
+            raise KeyError()
+    assert fdt_obj.exist_node('/chosen')
+
+
+def test_fdt_apply_properties():
+    fdt_obj = fdt.FDT()
+    fdt_obj.set_property('reg', [0, 1], path='/node')
+    fdt_obj.set_property('status', 'okay', path='/node')
+    assert len(fdt_obj.search('reg')) == 1
+
+    fdt_obj.apply_properties({
+        '/node': {'reg': [2, 3], 'name': 'test', 'empty': None},
+        'node/sub-node': {'reg': 4, 'mac-address': [0, 1, 2, 3, 4, 5], 'data': b'\x01\x02'},
+        '/': {'compatible': ['vendor,board', 'vendor,soc']},
+    }, types={'mac-address': fdt.PropBytes})
+
+    node = fdt_obj.get_node('/node')
+    # the existing property is replaced in place
+    assert [prop.name for prop in node.props] == ['reg', 'status', 'name', 'empty']
+    assert node.get_property('reg').data == [2, 3]
+    assert type(node.get_property('empty')) is fdt.Property
+    assert fdt_obj.get_property('reg', '/node/sub-node').data == [4]
+    assert fdt_obj.get_property('mac-address', '/node/sub-node').data == bytearray(range(6))
+    assert type(fdt_obj.get_property('data', '/node/sub-node')) is fdt.PropBytes
+    assert fdt_obj.get_property('compatible').data == ['vendor,board', 'vendor,soc']
+    assert len(fdt_obj.search('reg')) == 2
+    assert fdt_obj.get_node('/node/sub-node').parent is node
+
+    # the invalid values don't modify the tree
+    data = fdt_obj.to_dtb(17)
+    with pytest.raises(AssertionError):
+        fdt_obj.apply_properties({'/node': {'reg': 5}, '/node2': {'reg': 0x100000000}})
+    with pytest.raises(ValueError):
+        fdt_obj.apply_properties({'/node2': {'reg': 5}}, create=False)
+    with pytest.raises(AssertionError):
+        fdt_obj.apply_properties({'/node': {'data': 5}}, types={'data': fdt.PropBytes})
+    # the missing node of second path doesn't leave the nodes of first path created
+    with pytest.raises(ValueError):
+        fdt_obj.apply_properties({'/node/sub-node': {'reg': 5}, '/node3/sub-node': {'reg': 5}}, create=False)
+    with pytest.raises(AssertionError):
+        fdt_obj.apply_properties({'/node4': {'reg': 5}, '/node5/sub node\x01': {'reg': 5}})
+    assert fdt_obj.to_dtb(17) == data
+    assert not fdt_obj.exist_node('/node4')
+    assert len(fdt_obj.search('reg')) == 2
+
+    frozen = fdt_obj.freeze()
+    with pytest.raises(TypeError):
+        frozen.apply_properties({'/node': {'reg': 5}})
+    assert frozen.to_dtb(17) == data
@@ -47,3 +47,204 @@ def test_04(data_dir):
     with pytest.raises(AssertionError):
         _ = fdt.parse_dts(data)
 
+
+def test_05(data_dir):
+    for file_name in ("dup-propname.dts", "dup-nodename.dts"):
+        with open(os.path.join(data_dir, file_name)) as f:
+            data = f.read()
+
+        with pytest.raises(Exception, match="already exists"):
+            _ = fdt.parse_dts(data)
+
+
+def test_06():
+    fdt_obj = fdt.FDT()
+    fdt_obj.set_property('prop', 'test', path='/node')
+    data = fdt_obj.to_dtb(17)
+
+    # not printable char in node name must be detected also by trusted parser path
+    with pytest.raises(AssertionError):
+        _ = fdt.parse_dtb(data.replace(b'node\0', b'no\x01e\0'))
+
+    # duplicated node name must be detected also by trusted parser path
+    fdt_obj = fdt.FDT()
+    fdt_obj.add_item(fdt.Node('node0'))
+    fdt_obj.add_item(fdt.Node('node1'))
+    data = fdt_obj.to_dtb(17)
+    with pytest.raises(Exception, match="already exists"):
+        _ = fdt.parse_dtb(data.replace(b'node1\0', b'node0\0'))
+
+
+def test_07(temp_dir):
+    blob = bytes(range(256)) * 5
+    with open(os.path.join(temp_dir, "incbin.bin"), 'wb') as f:
+        f.write(blob)
+
+    dts = '/dts-v1/;\n/ {\n    full = /incbin/("incbin.bin");\n    part = /incbin/("incbin.bin", 0x10, 7);\n};\n'
+    fdt_obj = fdt.parse_dts(dts, temp_dir)
+
+    # the included files are not loaded by parser
+    full = fdt_obj.get_property('full')
+    part = fdt_obj.get_property('part')
+    assert not full.loaded and not part.loaded
+    dts_text = fdt_obj.root.to_dts()
+    assert len(full) == len(blob) and len(part) == 7
+    assert 'incbin.bin", 16, 7' in dts_text
+    assert '/incbin/("incbin.bin");' in dts_text
+    assert not full.loaded and not part.loaded
+
+    # streamed DTB is the same as DTB from loaded data
+    dtb_file = os.path.join(temp_dir, "incbin.dtb")
+    size = fdt_obj.write_dtb(dtb_file, 17)
+    assert not full.loaded and not part.loaded
+    with open(dtb_file, 'rb') as f:
+        data = f.read()
+    assert size == len(data)
+    assert data == fdt_obj.to_dtb(17)
+    assert not full.loaded and not part.loaded
+    # the DTS output doesn't depend on previously called methods
+    assert fdt_obj.root.to_dts() == dts_text
+    assert fdt_obj.freeze().root.to_dts() == dts_text
+
+    fdt_obj = fdt.parse_dtb(data)
+    assert fdt_obj.get_property('part').data == blob[0x10:0x17]
+
+
+def test_08():
+    dts = "/dts-v1/;\n" \
+          "/ {\n" \
+          "    aliases {\n" \
+          "        serial0 = &uart;\n" \
+          "        i2c = \"x\", &{/soc/i2c@1};\n" \
+          "    };\n" \
+          "    soc {\n" \
+          "        uart: serial@0 {\n" \
+          "            clocks = <&clk 1 &{/soc/i2c@1}>;\n" \
+          "        };\n" \
+          "        i2c@1 {\n" \
+          "            phandle = <1>;\n" \
+          "        };\n" \
+          "    };\n" \
+          "    clk: clock {\n" \
+          "    };\n" \
+          "};\n"
+    fdt_obj = fdt.parse_dts(dts)
+
+    # the references are resolved after parsing, the phandle is allocated only for referenced node without it
+    assert fdt_obj.get_property('clocks', '/soc/serial@0').data == [2, 1, 1]
+    assert fdt_obj.get_property('phandle', '/clock').value == 2
+    assert fdt_obj.get_property('phandle', '/soc/serial@0') is None
+    assert fdt_obj.get_property('serial0', '/aliases').value == '/soc/serial@0'
+    assert fdt_obj.get_property('i2c', '/aliases').data == ['x', '/soc/i2c@1']
+    assert '_with_references' not in fdt_obj.to_dts()
+
+    with pytest.raises(Exception, match="non-existent"):
+        _ = fdt.parse_dts("/dts-v1/;\n/ {\n    prop = <&unknown>;\n};\n")
+
+
+def test_09(temp_dir):
+    from fdt.include import include_cache
+
+    include_dir = os.path.join(temp_dir, "include")
+    os.makedirs(include_dir, exist_ok=True)
+    with open(os.path.join(include_dir, "fw.bin"), 'wb') as f:
+        f.write(b'\x01\x02\x03')
+    with open(os.path.join(include_dir, "soc.dtsi"), 'w') as f:
+        f.write("/ {\n"
+                "    soc {\n"
+                "        firmware = /incbin/(\"fw.bin\");\n"
+                "        uart1: serial@1 {\n"
+                "            status = \"disabled\";\n"
+                "            reg = <1>;\n"
+                "        };\n"
+                "        uart2: serial@2 {\n"
+                "        };\n"
+                "        i2c@3 {\n"
+                "        };\n"
+                "    };\n"
+                "};\n")
+    dts = "/dts-v1/;\n" \
+          "/include/ \"soc.dtsi\"\n" \
+          "/ {\n" \
+          "    chosen {\n" \
+          "        stdout = &uart1;\n" \
+          "    };\n" \
+          "};\n" \
+          "&uart1 {\n" \
+          "    status = \"okay\";\n" \
+          "    /delete-property/ reg;\n" \
+          "};\n" \
+          "/delete-node/ &uart2;\n" \
+          "&{/soc} {\n" \
+          "    /delete-node/ i2c@3;\n" \
+          "};\n"
+
+    include_cache.clear()
+    for _ in range(3):
+        fdt_obj = fdt.parse_dts(dts, temp_dir, [include_dir])
+    # the include file is preprocessed only once
+    assert include_cache.misses == 1
+    assert include_cache.hits == 2
+
+    assert fdt_obj.get_property('status', '/soc/serial@1').value == "okay"
+    assert fdt_obj.get_property('reg', '/soc/serial@1') is None
+    assert fdt_obj.get_property('stdout', '/chosen').value == "/soc/serial@1"
+    assert [node.name for node in fdt_obj.get_node('/soc').nodes] == ['serial@1']
+    # the /incbin/ path is relative to the included file
+    assert fdt_obj.get_property('firmware', '/soc').data == b'\x01\x02\x03'
+
+    # duplicated property in the same block is still error
+    with pytest.raises(Exception, match="already exists"):
+        _ = fdt.parse_dts(dts.replace("/delete-property/ reg", "status = \"okay\""), temp_dir, [include_dir])
+    with pytest.raises(Exception, match="not found"):
+        _ = fdt.parse_dts(dts, temp_dir)
+
+
+def test_10():
+    dts = "/dts-v1/;\n" \
+          "/ {\n" \
+          "    ddr = /bits/ 64 <0x80000000 0x100000000>;\n" \
+          "    cal = /bits/ 16 <1 0xFFFF>;\n" \
+          "    raw = /bits/ 8 <1 2 3>;\n" \
+          "};\n"
+    fdt_obj = fdt.parse_dts(dts)
+    assert fdt_obj.get_property('ddr').word_size == 64
+    assert list(fdt_obj.get_property('ddr').data) == [0x80000000, 0x100000000]
+    assert list(fdt_obj.get_property('cal').data) == [1, 0xFFFF]
+    assert fdt_obj.to_dts().count('/bits/') == 3
+    assert fdt.parse_dts(fdt_obj.to_dts()).root == fdt_obj.root
+
+    fdt_obj = fdt.parse_dtb(fdt_obj.to_dtb(17))
+    assert fdt_obj.get_property('ddr').data == [0, 0x80000000, 1, 0]
+    assert fdt_obj.get_property('raw').data == b'\x01\x02\x03'
+
+    with pytest.raises(AssertionError):
+        _ = fdt.parse_dts(dts.replace('<1 2 3>', '<256>'))
+    # the references are allowed only in 32-bit cells
+    dts = dts.replace('};', '    node: sub-node {\n    };\n};')
+    assert fdt.parse_dts(dts.replace('/bits/ 16 <1 0xFFFF>', '/bits/ 32 <1 &node>')).get_property('cal').word_size == 32
+    for word_size in (8, 16, 64):
+        with pytest.raises(Exception, match="Reference in {}-bit".format(word_size)):
+            _ = fdt.parse_dts(dts.replace('/bits/ 16 <1 0xFFFF>', '/bits/ {} <1 &node>'.format(word_size)))
+
+
+def test_11(data_dir, temp_dir):
+    with open(os.path.join(data_dir, 'imx7d-sdb.dtb'), 'rb') as f:
+        dtb = f.read()
+    empty = fdt.FDT().to_dtb(version=1)
+    # false magic numbers before, between and inside other data
+    image = b'\xFF' * 1000 + b'\xD0\x0D\xFE\xED' * 3 + dtb + b'\0' * 13 + empty + b'\xD0\x0D\xFE\xED\0\0\0\0'
+    file_path = os.path.join(temp_dir, 'image.bin')
+    with open(file_path, 'wb') as f:
+        f.write(image)
+
+    found = [(offset, header.total_size) for offset, header in fdt.scan_dtbs(image)]
+    assert found == [(1012, len(dtb)), (1012 + len(dtb) + 13, len(empty))]
+    assert [offset for offset, _ in fdt.scan_dtbs(file_path)] == [offset for offset, _ in found]
+    assert [offset for offset, _ in fdt.scan_dtbs(memoryview(image), check=True)] == [offset for offset, _ in found]
+    assert list(fdt.scan_dtbs(image, start=1013))[0][0] == found[1][0]
+
+    # the blob is parsed in place
+    assert fdt.parse_dtb(image, found[0][0]).to_dtb(17) == dtb
+    assert fdt.parse_dtb(memoryview(image), found[0][0]).to_dtb(17) == dtb
+    assert fdt.parse_dtb(image, found[1][0]).root == fdt.Node('/')
@@ -0,0 +1,93 @@
+import os
+import fdt
+import zlib
+import hashlib
+import pytest
+from fdt.fit import FIT
+
+
+def create_fit(kernel: bytes, external: bool = False) -> bytes:
+    fdt_obj = fdt.FDT()
+    fdt_obj.set_property('description', 'Test FIT')
+    fdt_obj.set_property('#address-cells', 1)
+    kernel_path = '/images/kernel'
+    fdt_obj.set_property('description', 'Kernel', path=kernel_path)
+    fdt_obj.set_property('type', 'kernel', path=kernel_path)
+    fdt_obj.set_property('load', 0x80008000, path=kernel_path)
+    if external:
+        fdt_obj.set_property('data-offset', 0, path=kernel_path)
+        fdt_obj.set_property('data-size', len(kernel), path=kernel_path)
+    else:
+        fdt_obj.add_item(fdt.PropBytes('data', data=kernel), path=kernel_path)
+    fdt_obj.set_property('algo', 'crc32', path=kernel_path + '/hash-1')
+    fdt_obj.set_property('value', zlib.crc32(kernel).to_bytes(4, 'big'), path=kernel_path + '/hash-1')
+    fdt_obj.set_property('algo', 'sha256', path=kernel_path + '/hash-2')
+    fdt_obj.set_property('value', hashlib.sha256(kernel).digest(), path=kernel_path + '/hash-2')
+    fdt_obj.set_property('default', 'conf-1', path='/configurations')
+    fdt_obj.set_property('kernel', 'kernel', path='/configurations/conf-1')
+    data = fdt_obj.to_dtb(17)
+    if external:
+        data += bytes((4 - len(data) % 4) % 4) + kernel
+    return data
+
+
+@pytest.mark.parametrize('external', [False, True])
+def test_fit(external):
+    kernel = bytes(range(256)) * 1000 + b'\x01\x02\x03'
+    data = create_fit(kernel, external)
+    fit = FIT(data)
+
+    assert fit.description == 'Test FIT'
+    assert fit.images() == ['kernel']
+    assert fit.configurations() == ['conf-1']
+    assert fit.default_configuration == 'conf-1'
+    assert fit.configuration('conf-1')['kernel'].value == 'kernel'
+    assert fit.image('kernel')['load'].value == 0x80008000
+    assert 'data' not in fit.image('kernel')
+
+    image = fit.image_data('kernel')
+    assert isinstance(image, memoryview)
+    assert image.obj is data
+    assert image == kernel
+    assert [h[1] for h in fit.hashes('kernel')] == ['crc32', 'sha256']
+    assert fit.verify('kernel', chunk_size=1000)
+
+    # corrupt image data
+    data = bytearray(data)
+    pos = data.find(kernel)
+    data[pos + 100] ^= 0xFF
+    assert not FIT(data).verify('kernel')
+
+    with pytest.raises(ValueError):
+        _ = fit.image_data('unknown')
+
+
+def test_fit_file(temp_dir):
+    kernel = b'\x55' * 10000
+    file_path = os.path.join(temp_dir, 'test.itb')
+    with open(file_path, 'wb') as f:
+        f.write(b'\x00' * 64 + create_fit(kernel, True))
+
+    with FIT.from_file(file_path, offset=64) as fit:
+        assert fit.verify('kernel')
+        assert fit.image_data('kernel').tobytes() == kernel
+
+    # the file can't be closed while image data view exists
+    fit = FIT.from_file(file_path, offset=64)
+    image = fit.image_data('kernel')
+    with pytest.raises(BufferError):
+        fit.close()
+    # the failed close keeps the FIT usable
+    assert fit.image_data('kernel').tobytes() == kernel
+    assert fit.verify('kernel')
+    image.release()
+    fit.close()
+
+
+def test_fit_invalid():
+    data = bytearray(create_fit(b'\x55' * 16))
+    header = fdt.Header.parse(data)
+    # replace the first BEGIN_NODE tag by END_NODE
+    data[header.off_dt_struct:header.off_dt_struct + 4] = fdt.header.DTB_END_NODE.to_bytes(4, 'big')
+    with pytest.raises(ValueError):
+        FIT(data)
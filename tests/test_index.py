@@ -0,0 +1,54 @@
+import os
+import fdt
+import mmap
+import pytest
+from fdt import raw
+from fdt.index import DtbIndex
+
+
+def test_index(data_dir, temp_dir):
+    with open(os.path.join(data_dir, 'imx7d-sdb.dtb'), 'rb') as f:
+        data = f.read()
+    fdt_obj = fdt.parse_dtb(data)
+    index_file = os.path.join(temp_dir, 'imx7d-sdb.dtb.idx')
+
+    index = fdt.build_index(data)
+    assert len(index) == 277
+    index.save(index_file)
+
+    for dtb_index in (index, DtbIndex.load(index_file, data)):
+        with dtb_index:
+            for path, nodes, props in fdt_obj.walk():
+                node_index = dtb_index.find(path)
+                assert node_index >= 0
+                assert dtb_index.get_path(node_index) == path
+                assert dtb_index.path_offset(path) == raw.path_offset(data, path)
+                for prop in props:
+                    value = dtb_index.getprop(node_index, prop.name)
+                    assert bytes(value) == bytes(raw.getprop(data, dtb_index.node_offset(node_index), prop.name))
+                assert dtb_index.getprop(node_index, 'not-exists') is None
+            assert dtb_index.find('/soc/not-exists') == -1
+            assert dtb_index.parent(0) == -1
+            assert dtb_index.parent(dtb_index.find('/soc/aips-bus@30000000')) == dtb_index.find('/soc')
+
+
+def test_index_load(data_dir, temp_dir):
+    file_path = os.path.join(data_dir, 'imx7d-sdb.dtb')
+    index_file = os.path.join(temp_dir, 'imx7d-sdb.idx')
+    with open(file_path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    fdt.build_index(data).save(index_file)
+
+    with DtbIndex.load(index_file, data) as index:
+        node = index.find('/memory')
+        assert index.get_name(node) == 'memory'
+        assert len(index.getprop(node, 'reg')) == 8
+    data.close()
+
+    # the index doesn't match other DTB
+    with pytest.raises(ValueError):
+        DtbIndex.load(index_file, fdt.FDT().to_dtb(17))
+    with open(index_file, 'r+b') as f:
+        f.write(b'XXXX')
+    with pytest.raises(ValueError):
+        DtbIndex.load(index_file, fdt.FDT().to_dtb(17))
@@ -1,7 +1,11 @@
+import os
+import sys
 import fdt
 import struct
 import pytest
 
+from fdt.frozen import freeze_node
+
 
 def test_header():
     header = fdt.Header()
@@ -219,4 +223,127 @@ def test_node_set_property():
     root_node.set_property('list_int_prop', [1, 2, 3])
 
     # validate property value
-    assert root_node.get_property('list_int_prop').data == [1, 2, 3]
\ No newline at end of file
+    assert root_node.get_property('list_int_prop').data == [1, 2, 3]
+
+
+def test_items_slots():
+    items = (
+        fdt.Property('prop'),
+        fdt.PropStrings('prop', 'test'),
+        fdt.PropWords('prop', 0x10),
+        fdt.PropBytes('prop', 0x10),
+        fdt.PropIncBin('prop', b'\x10', 'file.bin', 'data'),
+        fdt.Node('node')
+    )
+
+    for item in items:
+        assert not hasattr(item, '__dict__')
+        with pytest.raises(AttributeError):
+            item.unknown_attribute = 0
+
+    # public attributes are still accessible
+    assert items[2].word_size == 32
+    assert items[4].file_name == 'file.bin'
+    assert items[4].relative_path == 'data'
+    items[3].data = bytearray(b'\x20')
+    assert items[3].data == b'\x20'
+
+
+def test_propincbin_lazy(temp_dir):
+    file_path = os.path.join(temp_dir, "lazy.bin")
+    with open(file_path, 'wb') as f:
+        f.write(bytes(range(100)))
+
+    prop = fdt.PropIncBin('prop', None, 'lazy.bin', file_path=file_path, offset=10, size=20)
+    assert not prop.loaded
+    assert len(prop) == 20
+    assert b''.join(prop.iter_chunks(7)) == bytes(range(10, 30))
+    assert prop == prop.copy()
+    assert not prop.loaded
+
+    assert prop.data == bytearray(range(10, 30))
+    assert prop.loaded
+    assert prop.copy().loaded
+    assert prop == fdt.PropIncBin('prop', bytes(range(10, 30)), 'lazy.bin')
+
+
+def test_node_deep_tree():
+    # deeper than recursion limit
+    depth = sys.getrecursionlimit() + 100
+    root_node = fdt.Node('/')
+    node = root_node
+    for index in range(depth):
+        sub_node = fdt.Node('node{}'.format(index), fdt.PropWords('reg', index))
+        node.append(sub_node)
+        node = sub_node
+
+    copy_node = root_node.copy()
+    assert copy_node == root_node
+    node.append(fdt.Property('leaf'))
+    assert copy_node != root_node
+
+    copy_node.merge(root_node)
+    assert copy_node == root_node
+
+    dts = root_node.to_dts()
+    assert dts.count('};\n') == depth + 1
+    blob, strings, pos = root_node.to_dtb('')
+    assert len(blob) == pos
+    assert strings == 'reg\0leaf\0'
+
+
+def test_propwords_bits():
+    prop = fdt.PropWords('prop', 0x1122334455667788, 1, word_size=64)
+    assert prop.word_size == 64
+    assert prop.data.itemsize == 8
+    assert prop.to_dts() == 'prop = /bits/ 64 <0x1122334455667788 0x1>;\n'
+    blob, strings, pos = prop.to_dtb('')
+    assert blob[12:] == bytes.fromhex('1122334455667788 0000000000000001')
+    with pytest.raises(AssertionError):
+        prop.append(2**64)
+
+    prop = fdt.PropWords('prop', 1, 2, 3, word_size=16)
+    blob, strings, pos = prop.to_dtb('')
+    assert struct.unpack('>III', blob[:12])[1] == 6
+    assert blob[12:] == bytes.fromhex('000100020003 0000')
+    assert prop.copy() == prop
+    assert prop != fdt.PropWords('prop', 1, 2, 3)
+    prop.clear()
+    assert len(prop) == 0
+
+
+def test_node_copy_cow():
+    node = fdt.Node('root')
+    for i in range(3):
+        sub_node = fdt.Node('node{}'.format(i))
+        sub_node.set_property('reg', i)
+        sub_node.append(fdt.Node('leaf', fdt.PropStrings('compatible', 'test')))
+        node.append(sub_node)
+
+    with pytest.raises(ValueError):
+        node.copy(cow=True)
+
+    copy = freeze_node(node).copy(cow=True)
+    assert not copy.materialized
+    assert copy == node
+    assert copy.to_dts() == node.to_dts()
+    assert copy.to_dtb('')[0] == node.to_dtb('')[0]
+    # the read only traversal doesn't materialize nodes
+    assert not copy.materialized
+
+    # the write materializes only path from root to modified item
+    copy.get_subnode('node1').set_property('reg', 10)
+    assert copy.materialized
+    assert copy.get_subnode('node1').materialized
+    assert copy.get_subnode('node1').parent is copy
+    assert not copy.get_subnode('node0').materialized
+    assert not copy.get_subnode('node1').get_subnode('leaf').materialized
+    assert node.get_subnode('node1').get_property('reg').value == 1
+    assert copy.get_subnode('node1').get_property('reg').value == 10
+    assert copy != node
+
+    # the copy of copy-on-write node shares the same frozen content
+    copy2 = copy.get_subnode('node2').copy(cow=True)
+    copy2.remove_subnode('leaf')
+    assert copy.get_subnode('node2').exist_subnode('leaf')
+    assert node.get_subnode('node2').exist_subnode('leaf')
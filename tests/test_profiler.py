@@ -0,0 +1,48 @@
+import os
+import fdt
+from fdt.profiler import Profiler, profiler
+
+
+def test_profiler():
+    prof = Profiler()
+
+    # disabled profiler doesn't collect anything
+    with prof.stage('stage'):
+        prof.count('counter')
+    assert not prof.stages
+    assert not prof.counters
+
+    prof.enable()
+    with prof.stage('stage'):
+        with prof.stage('stage.sub'):
+            prof.count('counter', 5)
+    with prof.stage('stage'):
+        pass
+
+    assert prof.stages['stage'][0] == 2
+    assert prof.stages['stage.sub'][0] == 1
+    assert prof.stages['stage'][1] >= prof.stages['stage.sub'][1]
+    assert prof.counters['counter'] == 5
+    report = prof.report()
+    assert 'stage' in report
+    assert '  sub' in report
+
+    prof.reset()
+    assert not prof.stages
+
+
+def test_profiler_stages(data_dir):
+    with open(os.path.join(data_dir, "addresses.dts")) as f:
+        data = f.read()
+
+    profiler.reset()
+    profiler.enable()
+    try:
+        fdt_obj = fdt.parse_dts(data)
+        _ = fdt.parse_dtb(fdt_obj.to_dtb(17))
+    finally:
+        profiler.disable()
+
+    for name in ('parse_dts', 'parse_dts.strip_comments', 'parse_dts.build_tree', 'to_dtb', 'parse_dtb'):
+        assert profiler.stages[name][0] == 1
+    profiler.reset()
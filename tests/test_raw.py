@@ -0,0 +1,62 @@
+import os
+import fdt
+import mmap
+import pytest
+from fdt import raw
+
+
+@pytest.mark.parametrize('buffer_type', ['bytes', 'memoryview', 'mmap'])
+def test_raw(data_dir, buffer_type):
+    file_path = os.path.join(data_dir, 'imx7d-sdb.dtb')
+    with open(file_path, 'rb') as f:
+        data = f.read()
+        fdt_obj = fdt.parse_dtb(data)
+        if buffer_type == 'memoryview':
+            data = memoryview(data)
+        elif buffer_type == 'mmap':
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    assert raw.path_offset(data, '/') == 0
+    assert raw.path_offset(data, '/not-exists') == -1
+
+    path = '/soc/aips-bus@30000000'
+    offset = raw.path_offset(data, path)
+    assert offset > 0
+    assert raw.get_name(data, offset) == 'aips-bus@30000000'
+    # the name without unit address
+    assert raw.path_offset(data, '/soc/aips-bus') == offset
+    value = raw.getprop(data, offset, 'reg')
+    assert isinstance(value, memoryview)
+    assert bytes(value) == fdt_obj.get_property('reg', path).to_dtb('', 0)[0][12:]
+    assert raw.getprop(data, offset, 'not-exists') is None
+    assert [name for name, _ in raw.properties(data, offset)] == [prop.name for prop in fdt_obj.get_node(path).props]
+
+    names = []
+    child = raw.first_subnode(data, offset)
+    while child >= 0:
+        names.append(raw.get_name(data, child))
+        child = raw.next_subnode(data, child)
+    assert names == [node.name for node in fdt_obj.get_node(path).nodes]
+    assert raw.first_subnode(data, raw.path_offset(data, '/memory')) == -1
+
+    count = 0
+    offset = raw.node_offset_by_compatible(data, -1, 'fsl,imx7d-uart')
+    while offset >= 0:
+        assert 'fsl,imx7d-uart' in raw.getprop(data, offset, 'compatible').tobytes().decode().split('\0')
+        count += 1
+        offset = raw.node_offset_by_compatible(data, offset, 'fsl,imx7d-uart')
+    assert count == 7
+
+    for path, _, _ in fdt_obj.walk():
+        prop = fdt_obj.get_node(path).get_property('phandle')
+        if prop is not None:
+            offset = raw.node_offset_by_phandle(data, prop.value)
+            assert raw.get_name(data, offset) == fdt_obj.get_node(path).name
+            assert raw.get_phandle(data, offset) == prop.value
+    assert raw.node_offset_by_phandle(data, 0x7FFFFFFF) == -1
+
+    with pytest.raises(ValueError):
+        raw.get_name(data, 4)
+    del value
+    if buffer_type == 'mmap':
+        data.close()
@@ -0,0 +1,93 @@
+import os
+import json
+import fdt
+import pytest
+
+UART_SCHEMA = {
+    'compatible': ['fsl,imx7d-uart', 'fsl,imx6q-uart'],
+    'required': ['reg', 'interrupts', 'clocks'],
+    'properties': {
+        'reg': {'type': 'words', 'multiple': 'reg'},
+        'interrupts': {'type': 'words', 'count': 3},
+        'clock-names': {'type': 'strings', 'min': 1, 'max': 2, 'enum': ['ipg', 'per']},
+        'status': {'type': 'strings', 'enum': ['okay', 'disabled']},
+    }
+}
+
+
+def load_fdt(data_dir):
+    with open(os.path.join(data_dir, 'imx7d-sdb.dtb'), 'rb') as f:
+        return fdt.parse_dtb(f.read())
+
+
+def test_validate(data_dir):
+    fdt_obj = load_fdt(data_dir)
+
+    assert fdt.validate(fdt_obj, UART_SCHEMA) == []
+    assert fdt.validate(fdt_obj.freeze(), [UART_SCHEMA]) == []
+
+    path = '/soc/aips-bus@30800000/spba-bus@30800000/serial@30860000'
+    fdt_obj.remove_property('clocks', path)
+    fdt_obj.set_property('status', 'broken', path)
+    fdt_obj.set_property('interrupts', [0, 26], path)
+    fdt_obj.set_property('reg', [0x30860000, 0x10000, 0], path)
+    fdt_obj.set_property('clock-names', b'\x01\x02\x03', path)
+    errors = fdt.validate(fdt_obj, UART_SCHEMA)
+    assert {error.path for error in errors} == {path}
+    assert {error.schema for error in errors} == {'fsl,imx7d-uart'}
+    assert [error.message for error in errors] == [
+        'Missing required property "clocks"',
+        'Property "reg" has 3 items, expected multiple of 2',
+        'Property "interrupts" has 2 items, expected 3',
+        'Property "clock-names" must be strings',
+        'Property "status" has not allowed value: broken',
+    ]
+
+    # the schema is applied only once on node matching more compatible strings
+    errors = fdt.validate(fdt_obj, fdt.compile_schemas([UART_SCHEMA, {'name': 'empty', 'compatible': 'fsl,imx21-uart',
+                                                                      'properties': {'dma-coherent': {'type': 'empty'},
+                                                                                     'reg': {'type': 'bytes'}}}]))
+    assert len(errors) == 5
+
+
+def test_validate_bytes_dtb():
+    fdt_obj = fdt.FDT()
+    fdt_obj.set_property('compatible', 'vendor,eth', path='/eth')
+    fdt_obj.set_property('local-mac-address', bytes(range(8)), path='/eth')
+    schema = {'compatible': 'vendor,eth', 'properties': {'local-mac-address': {'type': 'bytes', 'count': 8}}}
+    assert fdt.validate(fdt_obj, schema) == []
+
+    # the DTB doesn't keep types, the 8 bytes value is parsed as words, but the count is still in bytes
+    fdt_obj = fdt.parse_dtb(fdt_obj.to_dtb(17))
+    assert type(fdt_obj.get_property('local-mac-address', '/eth')) is fdt.PropWords
+    assert fdt.validate(fdt_obj, schema) == []
+    schema['properties']['local-mac-address']['count'] = 6
+    assert [error.message for error in fdt.validate(fdt_obj, schema)] == [
+        'Property "local-mac-address" has 8 items, expected 6']
+
+
+def test_compile_schemas():
+    schemas = fdt.compile_schemas([UART_SCHEMA, {'compatible': 'fsl,imx21-uart'}])
+    assert len(schemas) == 2
+    assert len(schemas.lookup(['fsl,imx7d-uart', 'fsl,imx6q-uart', 'fsl,imx21-uart'])) == 2
+    assert schemas.lookup(['fsl,imx7d-i2c']) == []
+
+    with pytest.raises(ValueError):
+        fdt.compile_schemas({'required': ['reg']})
+    with pytest.raises(ValueError):
+        fdt.compile_schemas({'compatible': 'a', 'properties': {'reg': {'type': 'cells'}}})
+    with pytest.raises(ValueError):
+        fdt.compile_schemas({'compatible': 'a', 'properties': {'reg': {'cells': 2}}})
+
+
+def test_validate_files(data_dir, temp_dir):
+    schema_file = os.path.join(temp_dir, 'uart.json')
+    with open(schema_file, 'w') as f:
+        json.dump([UART_SCHEMA], f)
+    schemas = fdt.load_schemas(schema_file)
+    assert schemas == [UART_SCHEMA]
+
+    files = [os.path.join(data_dir, 'imx7d-sdb.dtb'), os.path.join(data_dir, 'imx7d-sdb.dts')] * 2
+    results = fdt.validate_files(files, schemas, jobs=2)
+    assert results == [(file, []) for file in files]
+    assert fdt.validate_files(files, schemas) == results
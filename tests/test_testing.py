@@ -0,0 +1,28 @@
+import fdt
+import pytest
+from fdt.testing import generate_tree
+
+
+def test_generate_tree():
+    fdt_obj = generate_tree(nodes=200, props_per_node=6, depth=3, blob_sizes=(1000, 3), phandle_density=0.2, seed=1)
+
+    assert isinstance(fdt_obj, fdt.FDT)
+    assert len(fdt_obj.search('', itype=fdt.ItemType.NODE)) == 201
+    assert len(fdt_obj.search('firmware-0')[0]) == 1000
+    assert len(fdt_obj.search('firmware-1')[0]) == 3
+    assert fdt_obj.search('phandle')
+    assert fdt_obj.search('clocks')
+    for path, nodes, props in fdt_obj.walk():
+        assert path.count('/') <= 3
+
+    # deterministic output
+    assert generate_tree(seed=5, output='dtb') == generate_tree(seed=5, output='dtb')
+    assert generate_tree(seed=5, output='dts') != generate_tree(seed=6, output='dts')
+
+    # DTS and DTB outputs describe the same tree
+    dts = generate_tree(nodes=50, seed=2, output='dts')
+    dtb = generate_tree(nodes=50, seed=2, output='dtb')
+    assert fdt.parse_dts(dts).to_dtb(17) == dtb
+
+    with pytest.raises(AssertionError):
+        _ = generate_tree(output='xml')